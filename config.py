@@ -100,6 +100,8 @@ FUNCTION_BUTTONS = [
     ("使用视频文件", "open_video"),
     ("设置ROI区域", "setup_roi_mode"),
     ("录制训练数据", "setup_recording_mode"),
+    ("录制检测会话", "toggle_session_recording"),
+    ("回放检测会话", "open_session_replay"),
 ]
 
 # 文件过滤器
@@ -121,7 +123,211 @@ ROI_CONFIG = {
     "roi_folder": "roi_configs",
     "max_roi_count": 99,
     "temp_roi_file": "temp_roi.json",
+    "temp_roi_journal": "temp_roi.journal",
     "main_config_file": "roi_config.json",
+    "index_file": "roi_index.json",
     "roi_file_pattern": "ROI_{}.json",
-    "max_points": 100
-} 
\ No newline at end of file
+    "max_points": 100,
+    "simplify_max_points": None,  # 保存ROI时用Douglas-Peucker简化到的最大顶点数，None 表示不简化
+    "legacy_reference_size": None  # 旧版ROI文件（绝对像素坐标）绘制时的分辨率 [宽, 高]，None 表示不迁移、按原像素坐标使用
+} 
+
+# 视频文件播放相关配置
+PLAYBACK_CONFIG = {
+    "mode": "realtime",         # realtime: 按帧时间戳实时播放，处理跟不上时丢帧; max_speed: 尽可能快地逐帧读取，用于分析
+    "loop": True,               # 播放到结尾后是否从头循环，False 表示播放一次后结束
+    "max_drop_per_read": 30,    # 单次读取最多丢弃的帧数，避免长时间卡顿后一次性跳过过多内容
+    "resync_gap": 0.5,          # 两次读取间隔超过该秒数（如暂停）时重新对齐时钟，而不是追帧
+    "stats_window": 1.0         # 有效帧率统计窗口（秒）
+}
+
+# 推理相关配置
+INFERENCE_CONFIG = {
+    "tiling_enabled": False,    # 切片推理：将ROI外接矩形分块后批量推理，提升高分辨率画面中小目标的召回
+    "tile_size": None,          # 切片边长(像素)，None表示使用模型输入尺寸
+    "tile_overlap": 0.2,        # 相邻切片的重叠比例
+    "tile_nms_iou": 0.5,        # 跨切片合并检测框的NMS阈值
+    "tile_nms_metric": "ios",   # 重叠度量：ios(交集/较小框)可合并被切片边界截断的框; iou为标准交并比
+    "auto_imgsz": True,         # 按ROI像素范围自动选择推理输入尺寸
+    "min_object_px": 12,        # 源画面中需要检出的最小目标(铝屑)尺寸(像素)
+    "model_min_object_px": 8,   # 模型输入分辨率下可稳定检出的最小目标尺寸(像素)
+    "min_imgsz": 160,           # 自动选择的输入尺寸下限
+    "max_imgsz": 1280,          # 自动选择的输入尺寸上限
+    "lean_inference": True,     # PyTorch模型使用精简推理路径（预分配输入、直接前向、向量化NMS）
+    "nms_iou": 0.7,             # 精简推理路径的NMS阈值（与ultralytics默认一致）
+    "max_det": 300,             # 每张图像最多保留的检测框数
+    "max_nms": 30000            # 进入NMS的候选框上限
+}
+
+# 检测结果缓存配置（视频文件回放时，调整置信度无需重新推理；默认缓存整帧结果，切换ROI也只需重新过滤）
+DETECTION_CACHE_CONFIG = {
+    "enabled": True,            # 是否对视频文件启用原始检测结果缓存
+    "floor_confidence": 0.1,    # 缓存推理使用的置信度下限（与置信度滑块最小值一致）
+    "region_inference": False,  # True: 与实时路径一致，在ROI外接矩形内按切片/按ROI推理尺寸推理（结果按外接矩形缓存，
+                                # 切换到外接矩形不同的ROI需要重新推理）; False: 整帧推理，切换ROI只重新过滤
+    "max_entries": 20000,       # 内存LRU缓存的最大帧数
+    "disk_dir": None            # 磁盘缓存目录，None表示仅使用内存缓存
+}
+
+# 持久化相关配置
+PERSISTENCE_CONFIG = {
+    "debounce_seconds": 0.5,    # 最后一次修改后延迟写盘的时间，期间对同一文件的多次修改合并为一次写入
+    "fsync": True               # 写盘后是否fsync，确保断电时配置不丢失
+}
+
+# 本地指标服务（Prometheus文本格式）
+METRICS_CONFIG = {
+    "enabled": False,           # 是否启动本地指标服务
+    "host": "127.0.0.1",        # 只监听本机
+    "port": 9108,               # 访问 http://127.0.0.1:9108/metrics
+    "latency_buckets": (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0)  # 耗时直方图桶上界（秒）
+}
+
+# ROI报警配置
+ALERT_CONFIG = {
+    "window_frames": 10,        # 滑动窗口帧数 M
+    "trigger_frames": 6,        # 窗口内至少 N 帧检测到目标时触发报警
+    "clear_frames": 10,         # 连续多少帧未检测到目标后解除报警
+    "cooldown_seconds": 5.0,    # 解除后多长时间内不再重复触发
+    "flash_interval": 200,      # 报警闪烁间隔（毫秒）
+    "max_queue": 100,           # 报警事件队列上限，满时丢弃新事件，不阻塞帧循环
+    # 报警输出，示例:
+    # {"type": "webhook", "url": "http://127.0.0.1:8080/alert"}
+    # {"type": "socket", "host": "127.0.0.1", "port": 9200, "protocol": "udp"}
+    # {"type": "sound", "sound_file": "alert.wav"}
+    # {"type": "file", "path": "alerts/alert.jsonl"}
+    "sinks": []
+}
+
+# 低精度模型配置
+QUANTIZATION_CONFIG = {
+    "precision": "fp32",        # 默认推理精度: fp32 / dynamic_int8 / static_int8 / bf16
+    "cache_dir": "model_cache", # 量化模型缓存目录，按原模型内容摘要命名
+    "calibration_frames": 200   # 静态INT8量化时从训练数据中抽取的校准帧数
+}
+
+# CPU资源预算：统一分配各线程池的线程数，避免相互抢占
+CPU_BUDGET_CONFIG = {
+    "enabled": True,
+    "total_cores": None,        # 可使用的核心数，None 表示自动检测物理核心数
+    "inference": None,          # 推理线程数，None 表示扣除其他线程池后的剩余核心
+    "opencv": 1,                # OpenCV内部线程池（缩放、颜色转换、绘制）
+    "capture": 1,               # 视频解码线程（FFmpeg）
+    "encoder": 1,               # 录制编码线程（FFmpeg）
+    "affinity": False           # True: 绑定到前 total_cores 个CPU; 也可指定CPU编号列表，如 [0, 1, 2, 3]
+}
+
+# 帧缓冲区池：采集、结果帧和叠加层按视频源分辨率预分配并逐帧复用
+FRAME_POOL_CONFIG = {
+    "enabled": True,
+    "capture_slots": 3          # 采集环形缓冲区数量，需大于同时在处理/显示中的帧数
+}
+
+# 目标跟踪：为检测到的铝屑分配稳定ID，统计时间窗口内出现的不同铝屑数量
+TRACKING_CONFIG = {
+    "enabled": False,
+    "match_iou": 0.3,           # 轨迹与检测关联的最小IoU
+    "high_threshold": 0.5,      # 高于该置信度的检测可新建轨迹，低分检测只用于延续已有轨迹
+    "min_hits": 3,              # 连续匹配多少帧后确认为新目标并分配ID
+    "max_age": 30,              # 轨迹连续多少帧未匹配后删除
+    "max_tracks": 1000,         # 每个ROI最多保留的轨迹数
+    "count_window_seconds": 60, # 统计不同目标数量的时间窗口（秒）
+    "max_events": 10000         # 每个ROI保留的目标出现记录上限
+}
+
+# 检测热力图：统计一个班次内铝屑在蒙皮上的聚集位置
+HEATMAP_CONFIG = {
+    "enabled": False,
+    "cell_size": 8,                 # 热力图网格边长（像素），1920x1080 对应 240x135 的网格
+    "weight_by_confidence": False,  # True: 按置信度加权; False: 每个检测框计1
+    "live_half_life": 30.0,         # 实时叠加热力图的衰减半衰期（秒），整班累计热力图不衰减
+    "overlay_alpha": 0.4,           # 叠加透明度
+    "overlay_refresh_frames": 10,   # 叠加用的伪彩色图每隔多少帧重新生成
+    "export_dir": "heatmaps"        # 导出目录（PNG图像 + NPZ原始数组）
+}
+
+# 检测会话录制与回放：在现场录制原始画面和逐帧时间戳，在开发机上按原始节奏重放对比
+SESSION_CONFIG = {
+    "dir": "sessions",              # 会话保存目录
+    "codec": "FFV1",                # 无损编码，保证回放画面与现场逐像素一致
+    "fallback_codec": "MJPG",       # 不支持FFV1时使用（有损）
+    "max_queue": 120,               # 待编码帧队列上限，满时丢弃并计数，不阻塞帧循环
+    "replay_mode": "original"       # 回放节奏: original 按录制时的帧间隔 / max_speed 尽可能快
+}
+
+# 智能训练数据采集设置（录制模式下只保存画面有变化的帧）
+SMART_CAPTURE_CONFIG = {
+    "method": "dhash",              # 去重方式: dhash 感知哈希 / ssim 结构相似度
+    "hash_size": 8,                 # dHash 边长，哈希位数为 hash_size^2
+    "hash_threshold": 6,            # 与最近保留帧的汉明距离不超过该值视为重复
+    "ssim_size": 64,                # SSIM 比较用的灰度缩略图边长
+    "ssim_threshold": 0.90,         # 与最近保留帧的SSIM不低于该值视为重复
+    "history": 32,                  # 参与比较的最近保留帧数量
+    "min_interval": 0.2,            # 两次采样之间的最短间隔（秒）
+    "image_format": "jpg",          # jpg / png
+    "jpeg_quality": 95,
+    "workers": 2,                   # 图像编码写入线程数
+    "max_pending": 16,              # 待写入帧上限，满时跳过该帧，不阻塞帧循环
+    "write_labels": True,           # 已加载模型时按当前检测结果预写YOLO标注文件
+    "stats_window": 60              # 保留/跳过速率的统计窗口（秒）
+}
+
+# 离线自动标注（tools/autolabel.py）设置
+AUTOLABEL_CONFIG = {
+    "output_dir": "autolabel",      # 输出目录（images/ labels/ review/ progress/）
+    "video_extensions": (".mp4", ".avi", ".mov", ".mkv"),
+    "frame_stride": 5,              # 每隔多少帧取一帧
+    "dedup": True,                  # 跳过与上一保留帧近似重复的帧（阈值见 SMART_CAPTURE_CONFIG）
+    "confidence": 0.25,             # 写入标注的最低置信度
+    "review_threshold": 0.6,        # 所有检测框都不低于该值的帧归入 confident，否则归入 uncertain
+    "workers": None,                # 进程数，None 表示按物理核心数自动计算
+    "threads_per_worker": 2,        # 每个进程的推理线程数
+    "image_format": "jpg",
+    "jpeg_quality": 95,
+    "report_interval": 2.0          # 进度汇报间隔（秒）
+}
+
+# 模型热切换：后台加载预热后在两帧之间替换，切换后试用期内推理出错自动回滚
+MODEL_SWAP_CONFIG = {
+    "warmup_runs": 3,               # 预热推理次数（空白图像）
+    "probation_frames": 30,         # 切换后的试用帧数，期间保留旧模型用于回滚
+    "poll_interval": 100            # 界面检查后台加载结果的间隔（毫秒）
+}
+
+# 模型注册表：保留多个已加载并预热的模型，切换到常驻模型无需重新读盘
+MODEL_REGISTRY_CONFIG = {
+    "enabled": True,
+    "memory_budget_mb": 1024,       # 常驻模型总内存上限（MB），超出时按最久未使用淘汰
+    "max_models": 4                 # 常驻模型数量上限
+}
+
+# 两级级联检测：候选阶段低分辨率扫描，主模型只对候选周围的裁剪窗口推理
+CASCADE_CONFIG = {
+    "enabled": False,
+    "proposer": "blob",             # blob: 形态学斑点检测（无需模型） / model: 轻量候选模型
+    "proposal_model": None,         # proposer 为 model 时的模型文件
+    "proposal_size": 320,           # 候选阶段输入长边（像素）
+    "proposal_confidence": 0.1,     # 候选模型的置信度下限（宁多勿漏）
+    "blob_kernel": 15,              # 形态学核尺寸（候选分辨率下的像素，应大于铝屑尺寸）
+    "blob_threshold": 25,           # 与局部背景的灰度差阈值
+    "blob_min_area": 2,             # 斑点面积范围（候选分辨率下的像素）
+    "blob_max_area": 2000,
+    "crop_size": 256,               # 送入主模型的裁剪窗口边长（原图像素，同时作为推理尺寸）
+    "max_crops": 8,                 # 裁剪窗口超过该数量时整块推理
+    "max_crop_coverage": 0.5,       # 裁剪窗口总面积超过区域面积的该比例时整块推理
+    "full_every": 30                # 每隔多少帧强制整块推理一次（0 表示不强制）
+}
+
+# 虚拟摄像头：在独立线程中按固定帧率实时回放视频文件或图像文件夹，模拟实时摄像头（无设备的压力测试）
+VIRTUAL_CAMERA_CONFIG = {
+    "source": None,                 # 设置为视频文件或图像文件夹时，"打开摄像头"改为打开虚拟摄像头
+    "fps": 30.0,                    # 输出帧率，None 表示使用视频文件的标称帧率
+    "loop": True,                   # 播放到结尾后从头循环，False 时结尾后视为断开
+    "read_timeout": 1.0,            # 读取等待新帧的最长时间（秒），超时返回读取失败
+    "jitter_ms": 0.0,               # 出帧时刻的随机抖动（正态分布标准差，毫秒）
+    "stall_probability": 0.0,       # 每帧发生卡顿的概率
+    "stall_duration": 0.5,          # 卡顿时长（秒），期间不出帧
+    "disconnect_probability": 0.0,  # 每帧发生断开的概率
+    "disconnect_duration": 2.0,     # 断开时长（秒），期间读取失败，之后自动恢复
+    "seed": None                    # 随机种子，多路压力测试时可按路设置以便复现
+}
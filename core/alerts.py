@@ -0,0 +1,300 @@
+import json
+import os
+import queue
+import socket
+import logging
+import platform
+import threading
+import subprocess
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import ALERT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class ROIAlertState:
+    """单个ROI的报警状态：最近 M 帧中有 N 帧检测到目标时触发，连续若干帧无目标后解除"""
+
+    __slots__ = ("history", "hits", "misses", "active", "last_cleared", "raised_count")
+
+    def __init__(self, window_frames: int):
+        self.history = deque(maxlen=window_frames)
+        self.hits = 0             # 窗口内检测到目标的帧数
+        self.misses = 0           # 连续未检测到目标的帧数
+        self.active = False
+        self.last_cleared = None  # 上次解除报警的时间
+        self.raised_count = 0
+
+    def push(self, detected: bool):
+        """加入一帧结果并维护窗口内命中数"""
+        if len(self.history) == self.history.maxlen and self.history[0]:
+            self.hits -= 1
+        self.history.append(detected)
+        if detected:
+            self.hits += 1
+            self.misses = 0
+        else:
+            self.misses += 1
+
+
+class AlertStateMachine:
+    """带滞回和冷却时间的ROI报警状态机
+
+    每帧调用 update()，只在状态变化时返回 "raised" 或 "cleared"，其余帧返回None；
+    解除后在 cooldown 秒内不会再次触发，避免目标在边缘抖动时反复报警。
+    """
+
+    def __init__(self, window_frames=None, trigger_frames=None, clear_frames=None, cooldown=None):
+        self.window_frames = window_frames or ALERT_CONFIG["window_frames"]
+        self.trigger_frames = trigger_frames or ALERT_CONFIG["trigger_frames"]
+        self.clear_frames = clear_frames or ALERT_CONFIG["clear_frames"]
+        self.cooldown = ALERT_CONFIG["cooldown_seconds"] if cooldown is None else cooldown
+        self._states: Dict[str, ROIAlertState] = {}
+
+    def get_state(self, roi_name: str) -> ROIAlertState:
+        """获取ROI的报警状态（不存在时创建）"""
+        state = self._states.get(roi_name)
+        if state is None:
+            state = ROIAlertState(self.window_frames)
+            self._states[roi_name] = state
+        return state
+
+    def update(self, roi_name: str, detected: bool, now: Optional[float] = None) -> Optional[str]:
+        """输入一帧检测结果，返回状态变化事件或None"""
+        now = time.monotonic() if now is None else now
+        state = self.get_state(roi_name)
+        state.push(detected)
+        if not state.active:
+            in_cooldown = state.last_cleared is not None and now - state.last_cleared < self.cooldown
+            if state.hits >= self.trigger_frames and not in_cooldown:
+                state.active = True
+                state.raised_count += 1
+                return "raised"
+        elif state.misses >= self.clear_frames:
+            state.active = False
+            state.last_cleared = now
+            return "cleared"
+        return None
+
+    def is_active(self, roi_name: str) -> bool:
+        """ROI当前是否处于报警状态"""
+        state = self._states.get(roi_name)
+        return bool(state and state.active)
+
+    def reset(self, roi_name: str = None):
+        """清除报警状态（ROI删除、重命名或停止检测时调用）"""
+        if roi_name is None:
+            self._states.clear()
+        else:
+            self._states.pop(roi_name, None)
+
+
+class AlertSink:
+    """报警输出基类，send() 在后台工作线程中调用，可以阻塞"""
+
+    name = "sink"
+
+    def send(self, event: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class WebhookSink(AlertSink):
+    """以JSON POST到本地HTTP接口"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, event):
+        data = json.dumps(event, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SocketSink(AlertSink):
+    """通过TCP或UDP发送一行JSON"""
+
+    name = "socket"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9200, protocol: str = "udp", timeout: float = 2.0):
+        self.address = (host, port)
+        self.protocol = protocol
+        self.timeout = timeout
+
+    def send(self, event):
+        data = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        if self.protocol == "tcp":
+            with socket.create_connection(self.address, timeout=self.timeout) as sock:
+                sock.sendall(data)
+        else:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(data, self.address)
+
+
+class SoundSink(AlertSink):
+    """报警触发时播放提示音，未配置声音文件时输出终端响铃"""
+
+    name = "sound"
+
+    def __init__(self, sound_file: str = None, only_raised: bool = True):
+        self.sound_file = sound_file
+        self.only_raised = only_raised
+
+    def send(self, event):
+        if self.only_raised and event["state"] != "raised":
+            return
+        if self.sound_file and os.path.exists(self.sound_file):
+            player = "afplay" if platform.system() == "Darwin" else "aplay"
+            subprocess.run([player, self.sound_file], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=10)
+        else:
+            print("\a", end="", flush=True)
+
+
+class FileTriggerSink(AlertSink):
+    """向触发文件追加一行JSON，供外部脚本监视"""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, event):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+SINK_TYPES = {cls.name: cls for cls in (WebhookSink, SocketSink, SoundSink, FileTriggerSink)}
+
+
+def create_sinks(sink_configs: List[Dict[str, Any]]) -> List[AlertSink]:
+    """按配置创建报警输出，配置格式: {"type": "webhook", "url": ...}"""
+    sinks = []
+    for sink_config in sink_configs:
+        options = dict(sink_config)
+        sink_type = options.pop("type", None)
+        sink_cls = SINK_TYPES.get(sink_type)
+        if sink_cls is None:
+            logger.error(f"未知的报警输出类型: {sink_type}")
+            continue
+        try:
+            sinks.append(sink_cls(**options))
+        except TypeError as e:
+            logger.error(f"报警输出配置错误 {sink_config}: {e}")
+    return sinks
+
+
+class AlertDispatcher:
+    """在后台工作线程中把报警事件分发给各输出，帧循环只做一次非阻塞入队"""
+
+    def __init__(self, sinks: List[AlertSink] = None, max_queue: int = None):
+        self.sinks = list(sinks or [])
+        self._queue = queue.Queue(maxsize=max_queue or ALERT_CONFIG["max_queue"])
+        self._thread = None
+        self.dispatched = 0
+        self.dropped = 0   # 队列满时丢弃的事件数
+        self.failed = 0
+
+    def add_sink(self, sink: AlertSink):
+        """添加报警输出"""
+        self.sinks.append(sink)
+
+    def _ensure_thread(self):
+        """按需启动工作线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="AlertDispatcher", daemon=True)
+            self._thread.start()
+
+    def dispatch(self, event: Dict[str, Any]) -> bool:
+        """事件入队，队列满时丢弃并返回False，不阻塞调用方"""
+        if not self.sinks:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self._ensure_thread()
+        return True
+
+    def _run(self):
+        """工作线程：逐个事件调用各输出，单个输出失败不影响其他输出"""
+        while True:
+            event = self._queue.get()
+            if event is None:
+                self._queue.task_done()
+                return
+            for sink in self.sinks:
+                try:
+                    sink.send(event)
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"报警输出 {sink.name} 发送失败: {e}")
+            self.dispatched += 1
+            self._queue.task_done()
+
+    def flush(self):
+        """等待队列中的事件全部发送完毕"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """停止工作线程"""
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=1.0)
+            except queue.Full:
+                return
+            self._thread.join(timeout=2.0)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取分发统计"""
+        return {"queued": self._queue.qsize(), "dispatched": self.dispatched,
+                "dropped": self.dropped, "failed": self.failed}
+
+
+class AlertManager:
+    """报警子系统：状态机 + 异步分发"""
+
+    def __init__(self, state_machine: AlertStateMachine = None, dispatcher: AlertDispatcher = None):
+        self.state_machine = state_machine or AlertStateMachine()
+        self.dispatcher = dispatcher or AlertDispatcher(create_sinks(ALERT_CONFIG["sinks"]))
+
+    def update(self, roi_name: str, detected: bool) -> Optional[str]:
+        """输入一帧检测结果，状态变化时分发事件并返回 "raised"/"cleared"，否则返回None"""
+        change = self.state_machine.update(roi_name, detected)
+        if change is not None:
+            state = self.state_machine.get_state(roi_name)
+            self.dispatcher.dispatch({
+                "roi": roi_name,
+                "state": change,
+                "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "hits": state.hits,
+                "window": self.state_machine.window_frames,
+                "count": state.raised_count,
+            })
+            logger.info(f"ROI '{roi_name}' 报警状态: {change}")
+        return change
+
+    def is_active(self, roi_name: str) -> bool:
+        """ROI当前是否处于报警状态"""
+        return self.state_machine.is_active(roi_name)
+
+    def reset(self, roi_name: str = None):
+        """清除报警状态"""
+        self.state_machine.reset(roi_name)
+
+    def close(self):
+        """退出前发送剩余事件并停止工作线程"""
+        self.dispatcher.close()
@@ -0,0 +1,160 @@
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import CASCADE_CONFIG, INFERENCE_CONFIG
+from core.detection_utils import empty_detections, nms
+
+
+class BlobProposer:
+    """经典方法候选：在低分辨率灰度图上做形态学顶帽+黑帽，找出与局部背景对比明显的小斑点
+
+    返回 N x 5 候选框 [x1, y1, x2, y2, 对比度]（输入图像坐标），不需要额外模型。
+    """
+
+    def __init__(self, config: Dict = None):
+        self.config = dict(CASCADE_CONFIG, **(config or {}))
+        size = int(self.config["blob_kernel"]) | 1
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+
+    def propose(self, image: np.ndarray) -> np.ndarray:
+        h, w = image.shape[:2]
+        scale = min(1.0, self.config["proposal_size"] / max(h, w))
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        contrast = cv2.max(cv2.morphologyEx(gray, cv2.MORPH_TOPHAT, self._kernel),
+                           cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, self._kernel))
+        _, mask = cv2.threshold(contrast, self.config["blob_threshold"], 255, cv2.THRESH_BINARY)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        if count <= 1:
+            return np.zeros((0, 5), dtype=np.float32)
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        keep = (areas >= self.config["blob_min_area"]) & (areas <= self.config["blob_max_area"])
+        if not keep.any():
+            return np.zeros((0, 5), dtype=np.float32)
+        # 每个连通域的峰值对比度作为候选分数
+        peaks = np.zeros(count, dtype=np.float32)
+        np.maximum.at(peaks, labels.ravel(), contrast.ravel().astype(np.float32))
+        stats = stats[1:][keep]
+        boxes = np.empty((len(stats), 5), dtype=np.float32)
+        boxes[:, 0] = stats[:, cv2.CC_STAT_LEFT]
+        boxes[:, 1] = stats[:, cv2.CC_STAT_TOP]
+        boxes[:, 2] = boxes[:, 0] + stats[:, cv2.CC_STAT_WIDTH]
+        boxes[:, 3] = boxes[:, 1] + stats[:, cv2.CC_STAT_HEIGHT]
+        boxes[:, :4] /= scale
+        boxes[:, 4] = peaks[1:][keep]
+        return boxes
+
+
+class ModelProposer:
+    """小模型候选：用轻量检测模型在低分辨率、低置信度下扫描，返回 N x 5 候选框"""
+
+    def __init__(self, predict: Callable[[np.ndarray, int, float], np.ndarray], config: Dict = None):
+        self.config = dict(CASCADE_CONFIG, **(config or {}))
+        self._predict = predict
+
+    def propose(self, image: np.ndarray) -> np.ndarray:
+        dets = self._predict(image, int(self.config["proposal_size"]), self.config["proposal_confidence"])
+        return dets[:, :5]
+
+
+def plan_crops(proposals: np.ndarray, width: int, height: int, crop_size: int,
+               max_crops: int, max_coverage: float) -> Optional[List[Tuple[int, int, int, int]]]:
+    """按候选框生成裁剪窗口 (x, y, w, h)；窗口过多或总面积过大、不如整块推理时返回None
+
+    候选按分数从高到低处理，已被某个窗口完整包含的候选不再单独裁剪。
+    """
+    windows: List[Tuple[int, int, int, int]] = []
+    for x1, y1, x2, y2, _ in proposals[np.argsort(-proposals[:, 4], kind="stable")]:
+        if any(wx <= x1 and wy <= y1 and x2 <= wx + ww and y2 <= wy + wh for wx, wy, ww, wh in windows):
+            continue
+        # 窗口至少 crop_size，较大的候选留出一半边距
+        cw = min(width, max(crop_size, int(math.ceil((x2 - x1) * 1.5))))
+        ch = min(height, max(crop_size, int(math.ceil((y2 - y1) * 1.5))))
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        wx = int(min(max(0, round(cx - cw / 2)), width - cw))
+        wy = int(min(max(0, round(cy - ch / 2)), height - ch))
+        windows.append((wx, wy, cw, ch))
+        if len(windows) > max_crops:
+            return None
+    if sum(w * h for _, _, w, h in windows) > max_coverage * width * height:
+        return None
+    return windows
+
+
+class CascadeDetector:
+    """两级级联检测：候选阶段在低分辨率下扫描区域，主模型只对候选周围的裁剪窗口批量推理
+
+    没有候选的帧直接返回空结果，候选过多时退回整块推理；full_every 帧强制整块推理一次，
+    限制候选阶段漏检造成的持续漏报。
+    """
+
+    def __init__(self, proposer, run_crops: Callable[[List[np.ndarray], int], List[np.ndarray]],
+                 config: Dict = None):
+        self.config = dict(CASCADE_CONFIG, **(config or {}))
+        self.proposer = proposer
+        self._run_crops = run_crops
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.empty_frames = 0
+        self.crop_frames = 0
+        self.full_frames = 0
+        self.crops = 0
+        self.last_proposals = 0
+        self.last_crops = 0
+
+    def detect(self, frame: np.ndarray, bbox: Tuple[int, int, int, int],
+               run_full: Callable[[], np.ndarray]) -> np.ndarray:
+        """检测 bbox 区域，返回原图坐标的 N x 6 结果；run_full 为整块推理的回调"""
+        x, y, w, h = bbox
+        self.frames += 1
+        self.last_crops = 0
+        full_every = self.config["full_every"]
+        if full_every and self.frames % full_every == 0:
+            self.full_frames += 1
+            return run_full()
+
+        region = frame[y:y + h, x:x + w]
+        proposals = self.proposer.propose(region)
+        self.last_proposals = len(proposals)
+        if len(proposals) == 0:
+            self.empty_frames += 1
+            return empty_detections()
+        windows = plan_crops(proposals, w, h, int(self.config["crop_size"]), self.config["max_crops"],
+                             self.config["max_crop_coverage"])
+        if windows is None:
+            self.full_frames += 1
+            return run_full()
+
+        self.crop_frames += 1
+        self.crops += len(windows)
+        self.last_crops = len(windows)
+        crops = [region[wy:wy + wh, wx:wx + ww] for wx, wy, ww, wh in windows]
+        merged = []
+        for (wx, wy, _, _), dets in zip(windows, self._run_crops(crops, int(self.config["crop_size"]))):
+            if len(dets):
+                dets = dets.copy()
+                dets[:, [0, 2]] += x + wx
+                dets[:, [1, 3]] += y + wy
+                merged.append(dets)
+        if not merged:
+            return empty_detections()
+        return nms(np.concatenate(merged), INFERENCE_CONFIG["tile_nms_iou"],
+                   metric=INFERENCE_CONFIG["tile_nms_metric"])
+
+    def get_stats(self) -> Dict[str, float]:
+        """各类帧的比例和每帧平均裁剪数"""
+        frames = max(1, self.frames)
+        return {
+            "frames": self.frames,
+            "empty_ratio": self.empty_frames / frames,
+            "crop_ratio": self.crop_frames / frames,
+            "full_ratio": self.full_frames / frames,
+            "crops_per_frame": self.crops / frames,
+        }
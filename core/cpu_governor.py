@@ -0,0 +1,147 @@
+import os
+import logging
+from typing import Dict, List, Optional
+
+import cv2
+
+from config import CPU_BUDGET_CONFIG
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，缺失时读取 /proc/cpuinfo
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+POOLS = ("inference", "opencv", "capture", "encoder")
+
+
+def detect_physical_cores() -> int:
+    """检测物理核心数（不含超线程），无法检测时返回逻辑核心数"""
+    if psutil is not None:
+        count = psutil.cpu_count(logical=False)
+        if count:
+            return count
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":")[1].strip()
+                elif line.startswith("core id"):
+                    core_id = line.split(":")[1].strip()
+                elif not line.strip():
+                    if core_id is not None:
+                        cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+def usable_cpus() -> List[int]:
+    """当前进程允许运行的逻辑CPU编号"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CPUGovernor:
+    """统一分配推理、OpenCV、采集和编码线程数的CPU预算
+
+    各线程池的线程数之和不超过物理核心数，避免在4核工控机上相互抢占导致帧时间抖动；
+    推理线程数未指定时取扣除其他线程池后的剩余核心。
+    """
+
+    def __init__(self, budget: Optional[Dict] = None):
+        self.budget = dict(CPU_BUDGET_CONFIG if budget is None else budget)
+        self.physical_cores = detect_physical_cores()
+        self.allocation: Dict[str, int] = {}
+        self.cpus: List[int] = []   # 绑定的逻辑CPU，空表示不绑定
+        self.applied: Dict[str, str] = {}  # 各设置实际生效情况
+
+    def plan(self) -> Dict[str, int]:
+        """计算各线程池的线程数"""
+        total = int(self.budget.get("total_cores") or self.physical_cores)
+        allocation = {pool: max(1, int(self.budget.get(pool) or 1)) for pool in POOLS if pool != "inference"}
+        inference = self.budget.get("inference")
+        if not inference:
+            inference = total - sum(allocation.values())
+        allocation["inference"] = max(1, int(inference))
+        self.allocation = {pool: allocation[pool] for pool in POOLS}
+        self.allocation["total"] = total
+        if sum(allocation.values()) > total:
+            logger.warning(f"CPU预算超出可用核心数: {self.allocation}")
+        return self.allocation
+
+    def _apply_affinity(self, total: int):
+        """把进程绑定到预算内的核心上，多个工位进程共用一台机器时互不干扰"""
+        affinity = self.budget.get("affinity")
+        if not affinity or not hasattr(os, "sched_setaffinity"):
+            return
+        available = usable_cpus()
+        cpus = [c for c in affinity if c in available] if isinstance(affinity, (list, tuple)) else available[:total]
+        if not cpus:
+            return
+        try:
+            os.sched_setaffinity(0, cpus)
+            self.cpus = cpus
+        except OSError as e:
+            logger.error(f"设置CPU亲和性失败: {e}")
+
+    def apply(self) -> Dict[str, int]:
+        """按预算设置各线程池（应在打开视频源和加载模型之前调用）"""
+        allocation = self.plan()
+        if not self.budget.get("enabled", True):
+            return allocation
+
+        self._apply_affinity(allocation["total"])
+
+        # OpenCV内部线程池（resize、颜色转换、绘制等）
+        cv2.setNumThreads(allocation["opencv"])
+        self.applied["opencv"] = str(cv2.getNumThreads())
+
+        # FFmpeg解码/编码线程，只对之后打开的视频源和录制文件生效
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", f"threads;{allocation['capture']}")
+        os.environ.setdefault("OPENCV_FFMPEG_WRITER_OPTIONS", f"threads;{allocation['encoder']}")
+        self.applied["capture"] = os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"]
+        self.applied["encoder"] = os.environ["OPENCV_FFMPEG_WRITER_OPTIONS"]
+
+        # 推理线程（torch算子内并行；算子间并行固定为1，避免与帧循环争抢）
+        os.environ.setdefault("OMP_NUM_THREADS", str(allocation["inference"]))
+        try:
+            import torch
+            torch.set_num_threads(allocation["inference"])
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass  # 已有并行任务运行后不能再修改
+            self.applied["inference"] = str(torch.get_num_threads())
+        except ImportError:
+            self.applied["inference"] = os.environ["OMP_NUM_THREADS"]
+
+        logger.info(f"CPU预算: {self.describe()}")
+        return allocation
+
+    def describe(self) -> str:
+        """单行描述实际分配，用于状态栏显示"""
+        if not self.allocation:
+            self.plan()
+        a = self.allocation
+        text = (f"{a['total']}核 | 推理{a['inference']} OpenCV{a['opencv']} "
+                f"采集{a['capture']} 编码{a['encoder']}")
+        if self.cpus:
+            text += f" | 绑定CPU {','.join(str(c) for c in self.cpus)}"
+        return text
+
+    def get_details(self) -> str:
+        """多行详细信息：检测到的核心数和各项实际生效值"""
+        lines = [f"物理核心: {self.physical_cores}", f"可用逻辑CPU: {len(usable_cpus())}"]
+        for pool in POOLS:
+            lines.append(f"{pool}: 分配 {self.allocation.get(pool, '-')}，生效 {self.applied.get(pool, '未设置')}")
+        return "\n".join(lines)
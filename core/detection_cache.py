@@ -0,0 +1,95 @@
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from config import DETECTION_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def compute_file_digest(path, full=False, chunk_size=1 << 20):
+    """计算文件内容摘要
+
+    full 为 False 时只读取文件大小和首尾各 chunk_size 字节，适合大视频文件的快速识别；
+    模型文件需要精确区分时使用 full=True。
+    """
+    sha1 = hashlib.sha1()
+    size = os.path.getsize(path)
+    sha1.update(str(size).encode())
+    with open(path, 'rb') as f:
+        if full or size <= 2 * chunk_size:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                sha1.update(block)
+        else:
+            sha1.update(f.read(chunk_size))
+            f.seek(-chunk_size, os.SEEK_END)
+            sha1.update(f.read(chunk_size))
+    return sha1.hexdigest()
+
+
+class DetectionCache:
+    """原始逐帧检测结果缓存：内存LRU + 可选磁盘缓存
+
+    键为 (视频内容摘要, 模型摘要, 推理参数, 帧序号)，值为 N x 6 检测数组。
+    """
+
+    def __init__(self, max_entries=None, disk_dir=None):
+        self.max_entries = max_entries or DETECTION_CACHE_CONFIG["max_entries"]
+        self.disk_dir = disk_dir if disk_dir is not None else DETECTION_CACHE_CONFIG["disk_dir"]
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        """键对应的磁盘缓存文件路径"""
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.npy")
+
+    def get(self, key):
+        """查询缓存，未命中返回None"""
+        dets = self._entries.get(key)
+        if dets is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dets
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    dets = np.load(path)
+                    self._store(key, dets)
+                    self.hits += 1
+                    return dets
+                except Exception as e:
+                    logger.error(f"读取检测缓存失败 {path}: {e}")
+        self.misses += 1
+        return None
+
+    def put(self, key, dets):
+        """写入缓存"""
+        self._store(key, dets)
+        if self.disk_dir:
+            try:
+                np.save(self._disk_path(key), dets)
+            except Exception as e:
+                logger.error(f"写入检测缓存失败: {e}")
+
+    def _store(self, key, dets):
+        """写入内存并按LRU淘汰"""
+        self._entries[key] = dets
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空内存缓存"""
+        self._entries.clear()
+
+    def get_stats(self):
+        """获取缓存命中统计"""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
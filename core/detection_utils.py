@@ -0,0 +1,216 @@
+import os
+import math
+import cv2
+import numpy as np
+
+
+# 检测结果统一使用 N x 6 的 float32 数组: [x1, y1, x2, y2, conf, cls]
+DETECTION_COLUMNS = 6
+
+
+def empty_detections():
+    """创建空检测结果数组"""
+    return np.zeros((0, DETECTION_COLUMNS), dtype=np.float32)
+
+
+def results_to_array(result):
+    """将ultralytics单张图像的Results转换为 N x 6 数组"""
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+    return np.concatenate([
+        boxes.xyxy.cpu().numpy(),
+        boxes.conf.cpu().numpy()[:, None],
+        boxes.cls.cpu().numpy()[:, None]
+    ], axis=1).astype(np.float32)
+
+
+def letterbox_params(height, width, size, stride=None):
+    """计算等比缩放并居中填充的参数: (缩放比例, 缩放后宽, 缩放后高, 左填充, 上填充, 输出宽, 输出高)
+
+    stride 为空时填充为 size x size 正方形；指定 stride 时只填充到 stride 的整数倍（矩形输入，计算量更小）。
+    """
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    if stride:
+        out_w, out_h = int(math.ceil(new_w / stride) * stride), int(math.ceil(new_h / stride) * stride)
+    else:
+        out_w = out_h = size
+    return scale, new_w, new_h, (out_w - new_w) // 2, (out_h - new_h) // 2, out_w, out_h
+
+
+def letterbox(image, size, params=None, color=(114, 114, 114)):
+    """等比缩放并填充为 size x size 的正方形图像（与YOLO训练时的预处理一致）"""
+    scale, new_w, new_h, left, top, out_w, out_h = params or letterbox_params(image.shape[0], image.shape[1], size)
+    canvas = np.full((out_h, out_w, 3), color, dtype=np.uint8)
+    if (new_w, new_h) != (image.shape[1], image.shape[0]):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas[top:top + new_h, left:left + new_w] = image
+    return canvas
+
+
+def box_area(boxes):
+    """计算框面积"""
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def box_iou(boxes_a, boxes_b, metric="iou"):
+    """计算两组框的两两重叠度矩阵
+
+    metric 为 "iou" 时返回交并比，为 "ios" 时返回交集与较小框面积之比
+    （适合合并被切片边界截断的框）。
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    lt = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    rb = np.minimum(boxes_a[:, None, 2:4], boxes_b[None, :, 2:4])
+    wh = np.clip(rb - lt, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+    area_a = box_area(boxes_a)[:, None]
+    area_b = box_area(boxes_b)[None, :]
+    if metric == "ios":
+        denom = np.minimum(area_a, area_b)
+    else:
+        denom = area_a + area_b - inter
+    return inter / np.maximum(denom, 1e-9)
+
+
+def nms(detections, iou_threshold=0.5, metric="iou", class_aware=True):
+    """对 N x 6 检测结果做非极大值抑制，返回保留的检测结果
+
+    按类别偏移坐标实现分类别NMS，重叠矩阵一次性向量化计算。
+    """
+    if len(detections) <= 1:
+        return detections
+    order = np.argsort(-detections[:, 4], kind="stable")
+    dets = detections[order]
+    boxes = dets[:, :4].astype(np.float64)
+    if class_aware:
+        # 不同类别的框平移到互不重叠的区域
+        boxes = boxes + dets[:, 5:6] * (boxes.max() + 1.0)
+    overlap = box_iou(boxes, boxes, metric=metric)
+    suppressed = np.zeros(len(dets), dtype=bool)
+    for i in range(len(dets)):
+        if suppressed[i]:
+            continue
+        suppressed[i + 1:] |= overlap[i, i + 1:] > iou_threshold
+    return dets[~suppressed]
+
+
+def points_in_polygon(points, polygon):
+    """向量化射线法判断多个点是否在多边形内（含边界附近），返回布尔数组"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0 or len(polygon) < 3:
+        return np.zeros(len(points), dtype=bool)
+    px, py = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    crosses = (y1 > py) != (y2 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+    inside = np.count_nonzero(crosses & (px < x_cross), axis=1) % 2 == 1
+    # 顶点坐标为整数像素，边界上的点按cv2.pointPolygonTest的约定视为在内
+    seg = np.stack([x2 - x1, y2 - y1], axis=1)
+    seg_len2 = np.maximum((seg ** 2).sum(axis=1), 1e-12)
+    t = np.clip(((px - x1) * seg[:, 0] + (py - y1) * seg[:, 1]) / seg_len2, 0, 1)
+    dist2 = (px - (x1 + t * seg[:, 0])) ** 2 + (py - (y1 + t * seg[:, 1])) ** 2
+    on_edge = (dist2 <= 1e-9).any(axis=1)
+    return inside | on_edge
+
+
+def filter_detections(detections, min_confidence=None, polygon=None, region=None):
+    """按置信度和ROI多边形（检测框中心点）向量化过滤检测结果
+
+    region 为带 contains(xy) 方法的编译ROI对象时优先使用，避免每帧重新计算多边形。
+    """
+    keep = np.ones(len(detections), dtype=bool)
+    if min_confidence is not None:
+        keep &= detections[:, 4] >= min_confidence
+    if (region is not None or polygon is not None) and keep.any():
+        centers = (detections[keep, :2] + detections[keep, 2:4]) / 2
+        if region is not None:
+            keep[keep] = region.contains(centers)
+        else:
+            keep[keep] = points_in_polygon(centers, polygon)
+    return detections[keep]
+
+
+def load_yolo_labels(label_path, width, height):
+    """读取YOLO格式标注文件，返回 N x 5 数组: [cls, x1, y1, x2, y2]（像素坐标）"""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 5), dtype=np.float32)
+    rows = []
+    with open(label_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 5:
+                rows.append([float(v) for v in parts[:5]])
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32)
+    labels = np.array(rows, dtype=np.float32)
+    cls, cx, cy, bw, bh = labels.T
+    return np.stack([
+        cls,
+        (cx - bw / 2) * width, (cy - bh / 2) * height,
+        (cx + bw / 2) * width, (cy + bh / 2) * height
+    ], axis=1).astype(np.float32)
+
+
+def match_detections(detections, ground_truth, iou_threshold=0.5):
+    """将检测结果与真值按类别贪心匹配，返回命中的真值数量"""
+    if len(detections) == 0 or len(ground_truth) == 0:
+        return 0
+    dets = detections[np.argsort(-detections[:, 4], kind="stable")]
+    iou = box_iou(dets[:, :4], ground_truth[:, 1:5])
+    iou[dets[:, 5][:, None] != ground_truth[:, 0][None, :]] = 0
+    matched = np.zeros(len(ground_truth), dtype=bool)
+    for row in iou:
+        row = np.where(matched, 0, row)
+        best = int(np.argmax(row))
+        if row[best] >= iou_threshold:
+            matched[best] = True
+    return int(matched.sum())
+
+
+def detection_true_positives(detections, ground_truth, iou_thresholds=(0.5,)):
+    """逐个检测框判断是否为真阳性（按置信度从高到低贪心匹配同类别真值）
+
+    返回 (按置信度降序排列的检测结果, N x T 布尔矩阵)，T 为IoU阈值个数。
+    """
+    thresholds = np.asarray(iou_thresholds, dtype=np.float32)
+    dets = detections[np.argsort(-detections[:, 4], kind="stable")] if len(detections) else detections
+    tp = np.zeros((len(dets), len(thresholds)), dtype=bool)
+    if len(dets) == 0 or len(ground_truth) == 0:
+        return dets, tp
+    iou = box_iou(dets[:, :4], ground_truth[:, 1:5])
+    iou[dets[:, 5][:, None] != ground_truth[:, 0][None, :]] = 0
+    for t, threshold in enumerate(thresholds):
+        matched = np.zeros(len(ground_truth), dtype=bool)
+        for i, row in enumerate(iou):
+            row = np.where(matched, 0, row)
+            best = int(np.argmax(row))
+            if row[best] >= threshold:
+                matched[best] = True
+                tp[i, t] = True
+    return dets, tp
+
+
+def average_precision(confidences, true_positives, num_ground_truth):
+    """由所有图像汇总的检测置信度和真阳性矩阵计算AP（COCO式101点插值），返回每个IoU阈值的AP"""
+    if num_ground_truth == 0:
+        return np.zeros(true_positives.shape[1])
+    order = np.argsort(-np.asarray(confidences), kind="stable")
+    tp = np.cumsum(true_positives[order], axis=0)
+    fp = np.cumsum(~true_positives[order], axis=0)
+    recall = tp / num_ground_truth
+    precision = tp / np.maximum(tp + fp, 1)
+    # 精度包络：每个召回率处取其后的最大精度
+    envelope = np.maximum.accumulate(precision[::-1], axis=0)[::-1]
+    points = np.linspace(0, 1, 101)
+    ap = np.zeros(true_positives.shape[1])
+    for t in range(true_positives.shape[1]):
+        index = np.searchsorted(recall[:, t], points, side="left")
+        valid = index < len(recall)
+        ap[t] = envelope[index[valid], t].sum() / len(points)
+    return ap
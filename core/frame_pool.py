@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import FRAME_POOL_CONFIG
+
+
+class FrameBufferPool:
+    """采集到显示全流程复用的图像缓冲区池
+
+    采集缓冲区按视频源分辨率预分配，以环形方式交给 cap.read(image=buf) 原地解码，
+    避免覆盖仍在处理或显示中的上一帧；结果帧、叠加层等临时缓冲区按名称复用，
+    只在尺寸变化时重新分配。所有分配都计入 allocations，用于统计每帧分配次数。
+    reuse=False 时每次请求都分配新数组，用于与原流程对比。
+    """
+
+    def __init__(self, capture_slots: int = None, reuse: bool = None):
+        self.capture_slots = max(1, capture_slots or FRAME_POOL_CONFIG["capture_slots"])
+        self.reuse = FRAME_POOL_CONFIG["enabled"] if reuse is None else reuse
+        self._capture: List[Optional[np.ndarray]] = [None] * self.capture_slots
+        self._capture_index = 0
+        self._scratch: Dict[str, np.ndarray] = {}
+        self._fill: Dict[str, tuple] = {}   # 名称 -> 缓冲区当前填充的颜色
+        self.allocations = 0
+        self.frames = 0
+
+    def _allocate(self, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        self.allocations += 1
+        return np.empty(shape, dtype=dtype)
+
+    def configure(self, width: int, height: int, channels: int = 3):
+        """按视频源分辨率预分配采集缓冲区（打开视频源时调用，分辨率未知时跳过）"""
+        if not self.reuse or width <= 0 or height <= 0:
+            return
+        shape = (int(height), int(width), channels)
+        if all(buf is not None and buf.shape == shape for buf in self._capture):
+            return
+        self._capture = [self._allocate(shape) for _ in range(self.capture_slots)]
+        self._capture_index = 0
+        self._scratch.clear()
+        self._fill.clear()
+
+    def capture_buffer(self) -> Optional[np.ndarray]:
+        """下一帧的采集缓冲区，传给 cap.read(image=...)；为None时由OpenCV分配"""
+        self.frames += 1
+        return self._capture[self._capture_index] if self.reuse else None
+
+    def commit_capture(self, frame: Optional[np.ndarray], buffer: Optional[np.ndarray]):
+        """登记读取结果：OpenCV没有写入给定缓冲区（首次读取或分辨率变化）时计为一次分配并接管该数组"""
+        if frame is None:
+            return
+        if frame is not buffer:
+            self.allocations += 1
+            if self.reuse:
+                self._capture[self._capture_index] = frame
+        if self.reuse:
+            self._capture_index = (self._capture_index + 1) % self.capture_slots
+
+    def scratch(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """获取指定名称的临时缓冲区（内容未初始化）"""
+        buf = self._scratch.get(name) if self.reuse else None
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = self._allocate(tuple(shape), dtype)
+            self._scratch[name] = buf
+            self._fill.pop(name, None)
+        return buf
+
+    def copy(self, name: str, frame: np.ndarray) -> np.ndarray:
+        """把帧复制到指定名称的临时缓冲区，代替 frame.copy()"""
+        buf = self.scratch(name, frame.shape, frame.dtype)
+        np.copyto(buf, frame)
+        return buf
+
+    def filled(self, name: str, shape: Tuple[int, ...], value) -> np.ndarray:
+        """纯色缓冲区，只在尺寸或颜色变化时重新填充，调用方不得修改"""
+        buf = self.scratch(name, shape)
+        value = tuple(value)
+        if self._fill.get(name) != value:
+            buf[:] = value
+            self._fill[name] = value
+        return buf
+
+    def release(self):
+        """释放所有缓冲区（关闭视频源时调用）"""
+        self._capture = [None] * self.capture_slots
+        self._capture_index = 0
+        self._scratch.clear()
+        self._fill.clear()
+
+    def reset_stats(self):
+        """清零分配统计"""
+        self.allocations = 0
+        self.frames = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取缓冲区数量、占用字节数和每帧分配次数"""
+        buffers = [buf for buf in self._capture if buf is not None] + list(self._scratch.values())
+        return {
+            "buffers": len(buffers),
+            "bytes": sum(buf.nbytes for buf in buffers),
+            "allocations": self.allocations,
+            "frames": self.frames,
+            "allocations_per_frame": self.allocations / self.frames if self.frames else 0.0,
+        }
+
+
+def shade_outside_roi(frame: np.ndarray, compiled, color, alpha: float, pool: FrameBufferPool):
+    """对ROI外部区域叠加半透明颜色（原地修改），叠加层和混合结果使用缓冲区池"""
+    # 纯色叠加层按颜色各保留一块，报警闪烁切换颜色时不需要重新填充
+    tint = pool.filled(f"tint{tuple(color)}", frame.shape, color)
+    shaded = pool.scratch("shaded", frame.shape)
+    cv2.addWeighted(frame, 1 - alpha, tint, alpha, 0, dst=shaded)
+    cv2.copyTo(shaded, compiled.outside_mask(frame.shape), frame)
+    return frame
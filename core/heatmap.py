@@ -0,0 +1,162 @@
+import os
+import math
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import HEATMAP_CONFIG
+
+
+class DetectionHeatmap:
+    """检测结果热力图累加器
+
+    在按 cell_size 缩小的网格上累加检测框覆盖区域，输出float32热力图。每个框只在二维差分数组的
+    四个角上做一次向量化散点累加（np.add.at），读取时再用两次累加和还原，因此每帧更新的
+    代价只与检测框数量有关，与画面尺寸无关。half_life 秒不为空时按指数衰减（用于实时叠加），
+    衰减以全局缩放系数延迟计算，不需要每帧乘整个数组。差分数组本身用float64保存，
+    避免长时间累加后两次累加和的舍入误差。
+    """
+
+    def __init__(self, cell_size: int = None, half_life: Optional[float] = None, weight_by_confidence: bool = None):
+        self.cell_size = max(1, int(cell_size or HEATMAP_CONFIG["cell_size"]))
+        self.half_life = half_life
+        self.weight_by_confidence = (HEATMAP_CONFIG["weight_by_confidence"]
+                                     if weight_by_confidence is None else weight_by_confidence)
+        self.frame_shape: Optional[Tuple[int, int]] = None
+        self._diff = None           # 差分数组，比网格多一行一列
+        self._scale = 1.0           # 延迟衰减：实际值 = 存储值 * _scale
+        self._last_time = None
+        self._cache = None          # 最近一次还原的热力图，数据变化后失效
+        self.frames = 0
+        self.detections = 0
+
+    @property
+    def grid_shape(self) -> Optional[Tuple[int, int]]:
+        if self._diff is None:
+            return None
+        return self._diff.shape[0] - 1, self._diff.shape[1] - 1
+
+    def reset(self, frame_shape: Tuple[int, ...] = None):
+        """清空热力图，给出帧尺寸时按新尺寸分配网格"""
+        if frame_shape is not None:
+            self.frame_shape = tuple(frame_shape[:2])
+        if self.frame_shape is not None:
+            h, w = self.frame_shape
+            rows, cols = math.ceil(h / self.cell_size), math.ceil(w / self.cell_size)
+            self._diff = np.zeros((rows + 1, cols + 1), dtype=np.float64)
+        self._scale = 1.0
+        self._last_time = None
+        self._cache = None
+        self.frames = 0
+        self.detections = 0
+
+    def _apply_decay(self, now: float):
+        """按距上次更新的时间推进衰减系数，系数过小时折算进数组避免下溢"""
+        if self.half_life:
+            if self._last_time is not None and now > self._last_time:
+                self._scale *= 0.5 ** ((now - self._last_time) / self.half_life)
+                if self._scale < 1e-6:
+                    self._diff *= self._scale
+                    self._scale = 1.0
+                self._cache = None
+            self._last_time = now
+
+    def add(self, detections: np.ndarray, frame_shape: Tuple[int, ...], now: float = None):
+        """累加一帧的检测框（N x 6，原图坐标）"""
+        if self.frame_shape != tuple(frame_shape[:2]) or self._diff is None:
+            self.reset(frame_shape)
+        self._apply_decay(time.monotonic() if now is None else now)
+        self.frames += 1
+        if len(detections) == 0:
+            return
+        self.detections += len(detections)
+        rows, cols = self.grid_shape
+        boxes = np.asarray(detections[:, :4], dtype=np.float32) / self.cell_size
+        x1 = np.clip(np.floor(boxes[:, 0]), 0, cols - 1).astype(np.intp)
+        y1 = np.clip(np.floor(boxes[:, 1]), 0, rows - 1).astype(np.intp)
+        x2 = np.clip(np.ceil(boxes[:, 2]), x1 + 1, cols).astype(np.intp)
+        y2 = np.clip(np.ceil(boxes[:, 3]), y1 + 1, rows).astype(np.intp)
+        weight = detections[:, 4].astype(np.float64) if self.weight_by_confidence else np.ones(len(boxes))
+        weight = weight / self._scale
+        # 矩形 [y1:y2, x1:x2] 加 weight 等价于差分数组四个角上的 +w, -w, -w, +w
+        ys = np.concatenate([y1, y1, y2, y2])
+        xs = np.concatenate([x1, x2, x1, x2])
+        np.add.at(self._diff, (ys, xs), np.concatenate([weight, -weight, -weight, weight]))
+        self._cache = None
+
+    def get(self) -> np.ndarray:
+        """当前热力图（网格分辨率，float32），数值为衰减后的累计覆盖次数"""
+        if self._diff is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self._cache is None:
+            heat = np.cumsum(np.cumsum(self._diff, axis=0), axis=1)[:-1, :-1] * self._scale
+            self._cache = np.maximum(heat, 0).astype(np.float32)  # 消除累加和的浮点误差
+        return self._cache
+
+    def render(self, frame_shape: Tuple[int, ...] = None, colormap: int = cv2.COLORMAP_JET) -> np.ndarray:
+        """归一化后映射为伪彩色BGR图像，给出帧尺寸时放大到帧尺寸"""
+        heat = self.get()
+        if heat.size == 0:
+            shape = tuple(frame_shape[:2]) if frame_shape is not None else (1, 1)
+            return np.zeros(shape + (3,), dtype=np.uint8)
+        peak = float(heat.max())
+        gray = (heat * (255.0 / peak)).astype(np.uint8) if peak > 0 else np.zeros(heat.shape, np.uint8)
+        if frame_shape is not None:
+            gray = cv2.resize(gray, (frame_shape[1], frame_shape[0]), interpolation=cv2.INTER_LINEAR)
+        return cv2.applyColorMap(gray, colormap)
+
+    def export(self, directory: str = None, prefix: str = "heatmap") -> Tuple[str, str]:
+        """导出伪彩色图像(PNG)和原始数组(NPZ，含网格尺寸等元数据)，返回两个文件路径"""
+        directory = directory or HEATMAP_CONFIG["export_dir"]
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        image_path, array_path = stem + ".png", stem + ".npz"
+        cv2.imwrite(image_path, self.render(self.frame_shape))
+        np.savez_compressed(array_path, heat=self.get(), cell_size=self.cell_size,
+                            frame_shape=np.array(self.frame_shape or (0, 0)),
+                            frames=self.frames, detections=self.detections,
+                            half_life=self.half_life or 0.0)
+        return image_path, array_path
+
+
+class HeatmapOverlay:
+    """把热力图半透明叠加到显示帧上
+
+    伪彩色图每 refresh_frames 帧才重新生成一次，其余帧只做一次混合，
+    热力图接近零的区域保持原样。
+    """
+
+    def __init__(self, heatmap: DetectionHeatmap, alpha: float = None, refresh_frames: int = None):
+        self.heatmap = heatmap
+        self.alpha = HEATMAP_CONFIG["overlay_alpha"] if alpha is None else alpha
+        self.refresh_frames = max(1, refresh_frames or HEATMAP_CONFIG["overlay_refresh_frames"])
+        self._colored = None
+        self._mask = None
+        self._blend = None
+        self._rect = (0, 0, 0, 0)
+        self._age = 0
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """原地叠加热力图并返回该帧"""
+        self._age += 1
+        if self._colored is None or self._colored.shape != frame.shape or self._age >= self.refresh_frames:
+            self._colored = self.heatmap.render(frame.shape)
+            heat = self.heatmap.get()
+            # 低于峰值1%的区域（包括已衰减殆尽的区域）不叠加
+            threshold = float(heat.max()) * 0.01 if heat.size else 0.0
+            mask = (heat > threshold).astype(np.uint8) * 255 if heat.size else np.zeros(frame.shape[:2], np.uint8)
+            self._mask = cv2.resize(mask, (frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_NEAREST)
+            self._rect = cv2.boundingRect(self._mask)  # 只在有热度的外接矩形内混合
+            self._age = 0
+        x, y, w, h = self._rect
+        if w == 0 or h == 0:
+            return frame
+        if self._blend is None or self._blend.shape != frame.shape:
+            self._blend = np.empty_like(frame)
+        region, blend = frame[y:y + h, x:x + w], self._blend[y:y + h, x:x + w]
+        cv2.addWeighted(region, 1 - self.alpha, self._colored[y:y + h, x:x + w], self.alpha, 0, dst=blend)
+        cv2.copyTo(blend, self._mask[y:y + h, x:x + w], region)
+        return frame
@@ -0,0 +1,144 @@
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from config import INFERENCE_CONFIG
+from core.detection_utils import empty_detections, letterbox_params, nms
+
+logger = logging.getLogger(__name__)
+
+
+class LeanPredictor:
+    """精简推理路径：直接调用PyTorch检测模型的前向计算
+
+    针对尺寸固定的摄像头画面：按 (帧尺寸, 推理尺寸) 缓存letterbox参数，输入张量和缩放缓冲区
+    预先分配并原地写入（填充区域只初始化一次），前向输出在numpy/torch上向量化地做
+    置信度与类别过滤和分类别NMS，直接返回 N x 6 数组，不构造Results对象，也不绘制图像。
+    """
+
+    def __init__(self, model, stride: int = 32, classes: Optional[Sequence[int]] = None, precision: str = "fp32"):
+        import torch
+        self.torch = torch
+        self.model = model.eval()
+        if hasattr(self.model, "fuse") and not getattr(self.model, "is_fused", lambda: True)():
+            self.model = self.model.fuse(verbose=False)
+        self.stride = int(stride)
+        self.classes = None if classes is None else np.asarray(classes, dtype=np.int64)
+        self.precision = precision
+        self.iou_threshold = INFERENCE_CONFIG["nms_iou"]
+        self.max_det = INFERENCE_CONFIG["max_det"]
+        self.max_nms = INFERENCE_CONFIG["max_nms"]
+        self._params: Dict[Tuple[int, int, int], tuple] = {}       # (高, 宽, 推理尺寸) -> letterbox参数
+        self._inputs: Dict[Tuple[int, int, int], object] = {}      # (批大小, 输出高, 输出宽) -> 预分配输入张量
+        self._slots: Dict[Tuple[int, int, int], list] = {}         # 同上 -> 每张图像上次写入时的letterbox参数
+        self._resized: Dict[Tuple[int, int], np.ndarray] = {}      # (缩放后高, 缩放后宽) -> 缩放缓冲区
+        self._class_index = None                                   # 模型输出中待检测类别所在的列
+
+    def _get_params(self, height: int, width: int, imgsz: int) -> tuple:
+        """获取（缓存的）letterbox参数"""
+        key = (height, width, imgsz)
+        params = self._params.get(key)
+        if params is None:
+            params = letterbox_params(height, width, imgsz, self.stride)
+            self._params[key] = params
+        return params
+
+    def _get_input(self, batch: int, out_h: int, out_w: int):
+        """获取预分配的输入张量，填充区域初始化为灰色(114)后保持不变"""
+        key = (batch, out_h, out_w)
+        tensor = self._inputs.get(key)
+        if tensor is None:
+            if len(self._inputs) > 8:
+                self._inputs.clear()
+                self._slots.clear()
+            tensor = self.torch.full((batch, 3, out_h, out_w), 114 / 255.0, dtype=self.torch.float32)
+            self._inputs[key] = tensor
+            self._slots[key] = [None] * batch
+        return tensor, self._slots[key]
+
+    def _fill(self, array: np.ndarray, index: int, image: np.ndarray, params: tuple):
+        """把一张BGR图像缩放后以RGB、0~1写入输入张量的第index张"""
+        scale, new_w, new_h, left, top = params[:5]
+        if (new_w, new_h) != (image.shape[1], image.shape[0]):
+            resized = self._resized.get((new_h, new_w))
+            if resized is None:
+                resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+                self._resized[(new_h, new_w)] = resized
+            cv2.resize(image, (new_w, new_h), dst=resized, interpolation=cv2.INTER_LINEAR)
+            image = resized
+        target = array[index, :, top:top + new_h, left:left + new_w]
+        np.multiply(image[:, :, ::-1].transpose(2, 0, 1), 1 / 255.0, out=target, casting="unsafe")
+
+    def _forward(self, tensor):
+        """原始前向计算，返回 (批, 4+类别数, 锚点数) 的输出"""
+        torch = self.torch
+        with torch.inference_mode():
+            if self.precision == "bf16":
+                with torch.autocast("cpu", dtype=torch.bfloat16):
+                    preds = self.model(tensor)
+            else:
+                preds = self.model(tensor)
+        if isinstance(preds, (list, tuple)):
+            preds = preds[0]
+        return preds.float()
+
+    def _postprocess(self, pred, conf: float, params: tuple, shape: Tuple[int, int]) -> np.ndarray:
+        """单张图像输出 -> N x 6 检测结果（原图坐标）"""
+        torch = self.torch
+        pred = pred.transpose(0, 1)  # 锚点数 x (4+类别数)
+        scores = pred[:, 4:]
+        if self._class_index is None:
+            num_classes = scores.shape[1]
+            classes = np.arange(num_classes) if self.classes is None else self.classes[self.classes < num_classes]
+            self._class_index = torch.as_tensor(classes, dtype=torch.long)
+        # 只在待检测类别中取最高分，避免其他类别压制
+        scores = scores.index_select(1, self._class_index)
+        best, best_col = scores.max(dim=1)
+        keep = best >= conf
+        if not bool(keep.any()):
+            return empty_detections()
+        boxes, best, best_col = pred[keep, :4], best[keep], best_col[keep]
+        if len(best) > self.max_nms:
+            top = best.topk(self.max_nms).indices
+            boxes, best, best_col = boxes[top], best[top], best_col[top]
+        cls = self._class_index[best_col].float()
+        xyxy = torch.cat([boxes[:, :2] - boxes[:, 2:] / 2, boxes[:, :2] + boxes[:, 2:] / 2], dim=1)
+
+        try:
+            from torchvision.ops import batched_nms
+            index = batched_nms(xyxy, best, cls.long(), self.iou_threshold)[:self.max_det]
+            dets = torch.cat([xyxy[index], best[index, None], cls[index, None]], dim=1).numpy()
+        except ImportError:
+            dets = torch.cat([xyxy, best[:, None], cls[:, None]], dim=1).numpy()
+            dets = nms(dets, self.iou_threshold)[:self.max_det]
+
+        # 去掉letterbox填充和缩放，映射回原图坐标
+        scale, _, _, left, top = params[:5]
+        dets = dets.astype(np.float32)
+        dets[:, [0, 2]] = np.clip((dets[:, [0, 2]] - left) / scale, 0, shape[1])
+        dets[:, [1, 3]] = np.clip((dets[:, [1, 3]] - top) / scale, 0, shape[0])
+        return dets
+
+    def predict(self, images, imgsz: int, conf: float) -> List[np.ndarray]:
+        """对一张或一批图像推理，返回每张图像的 N x 6 检测结果列表"""
+        if isinstance(images, np.ndarray):
+            images = [images]
+        params = [self._get_params(img.shape[0], img.shape[1], imgsz) for img in images]
+        out_w = max(p[5] for p in params)
+        out_h = max(p[6] for p in params)
+        if any((p[5], p[6]) != (out_w, out_h) for p in params):
+            # 同一批中尺寸不同的图像改用正方形输入
+            params = [letterbox_params(img.shape[0], img.shape[1], imgsz) for img in images]
+            out_w = out_h = imgsz
+        tensor, slots = self._get_input(len(images), out_h, out_w)
+        array = tensor.numpy()
+        for i, (image, p) in enumerate(zip(images, params)):
+            if slots[i] != p:
+                # 有效区域位置变化时才需要重置填充区域
+                array[i].fill(114 / 255.0)
+                slots[i] = p
+            self._fill(array, i, image, p)
+        preds = self._forward(tensor)
+        return [self._postprocess(preds[i], conf, p, img.shape[:2]) for i, (img, p) in enumerate(zip(images, params))]
@@ -0,0 +1,286 @@
+import os
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+from config import METRICS_CONFIG
+
+try:
+    import psutil
+except ImportError:  # psutil 为可选依赖，缺失时从 /proc 和 os.times 读取
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], le: Optional[str] = None) -> str:
+    """格式化Prometheus标签，le 为直方图桶上界"""
+    if le is not None:
+        labels = labels + (("le", le),)
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    """单调递增计数器
+
+    只由一个线程（帧循环）写入，抓取线程只读；在GIL下一次整数加法不需要加锁。
+    也可以在抓取时调用回调函数取值（如进程累计CPU时间）。
+    """
+
+    __slots__ = ("value", "func")
+
+    def __init__(self, func: Optional[Callable[[], float]] = None):
+        self.value = 0
+        self.func = func
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def get(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Gauge:
+    """可设置的瞬时值，也可以在抓取时调用回调函数取值"""
+
+    __slots__ = ("value", "func")
+
+    def __init__(self, func: Optional[Callable[[], float]] = None):
+        self.value = 0.0
+        self.func = func
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Histogram:
+    """固定桶直方图：观测时只做一次二分查找和两次加法，累计值在抓取时计算"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """指标注册表，按 (名称, 标签) 保存指标并输出Prometheus文本格式"""
+
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str, Dict[tuple, object]]] = {}  # 名称 -> (类型, 说明, {标签: 指标})
+        self._lock = threading.Lock()  # 保护注册新指标和抓取时的快照，不在观测路径上
+
+    def _get(self, kind, name, help_text, labels, factory):
+        key = tuple(sorted((labels or {}).items()))
+        family = self._families.get(name)
+        if family is not None:
+            metric = family[2].get(key)
+            if metric is not None:
+                return metric
+        with self._lock:
+            family = self._families.setdefault(name, (kind, help_text, {}))
+            return family[2].setdefault(key, factory())
+
+    def counter(self, name, help_text="", labels=None, func=None) -> Counter:
+        return self._get("counter", name, help_text, labels, lambda: Counter(func))
+
+    def gauge(self, name, help_text="", labels=None, func=None) -> Gauge:
+        return self._get("gauge", name, help_text, labels, lambda: Gauge(func))
+
+    def histogram(self, name, help_text="", labels=None, buckets=None) -> Histogram:
+        buckets = buckets or METRICS_CONFIG["latency_buckets"]
+        return self._get("histogram", name, help_text, labels, lambda: Histogram(buckets))
+
+    def render(self) -> str:
+        """输出Prometheus文本格式（在抓取线程调用，帧循环可能同时注册新指标，先在锁内取快照）"""
+        with self._lock:
+            families = [(name, kind, help_text, list(metrics.items()))
+                        for name, (kind, help_text, metrics) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help_text, metrics in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.get()}")
+                elif kind == "gauge":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.get()}")
+                else:
+                    counts = list(metric.counts)
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, str(bound))} {cumulative}")
+                    cumulative += counts[-1]
+                    lines.append(f"{name}_bucket{_format_labels(labels, '+Inf')} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def get_process_stats() -> Dict[str, float]:
+    """获取进程常驻内存(字节)和累计CPU时间(秒)"""
+    if psutil is not None:
+        process = psutil.Process()
+        cpu = process.cpu_times()
+        return {"rss_bytes": process.memory_info().rss, "cpu_seconds": cpu.user + cpu.system}
+    rss = 0
+    try:
+        with open("/proc/self/statm", "r") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    times = os.times()
+    return {"rss_bytes": rss, "cpu_seconds": times.user + times.system}
+
+
+class MetricsServer:
+    """在后台线程中提供 /metrics 的本地HTTP服务"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = None, port: int = None):
+        self.registry = registry
+        self.host = host or METRICS_CONFIG["host"]
+        self.port = METRICS_CONFIG["port"] if port is None else port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """启动服务，返回 (是否成功, 消息)"""
+        if self._server is not None:
+            return True, f"指标服务已在运行: {self.url}"
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            return False, f"指标服务启动失败: {e}"
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        logger.info(f"指标服务已启动: {self.url}")
+        return True, f"指标服务已启动: {self.url}"
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2] if self._server else (self.host, self.port)
+        return f"http://{host}:{port}/metrics"
+
+    def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+
+class PipelineMetrics:
+    """检测流水线指标
+
+    帧循环每帧调用一次 observe_frame（几次加法和二分查找），其余指标
+    （丢帧、队列深度、录制、进程资源）在抓取时从各处理器现有状态读取，不增加帧循环开销。
+    """
+
+    def __init__(self, video_handler=None, model_handler=None, roi_handler=None, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.video_handler = video_handler
+        self.model_handler = model_handler
+        self.roi_handler = roi_handler
+        r = self.registry
+
+        self.frames = r.counter("yolo_frames_total", "处理的帧数")
+        self.read_failures = r.counter("yolo_frame_read_failures_total", "读取视频帧失败次数")
+        self.capture_latency = r.histogram("yolo_capture_seconds", "读取一帧的耗时")
+        self.inference_latency = r.histogram("yolo_inference_seconds", "推理及过滤一帧的耗时")
+        self.frame_latency = r.histogram("yolo_frame_seconds", "帧循环单帧总耗时")
+        self.recorded_frames = r.counter("yolo_recorded_frames_total", "写入录制文件的帧数")
+        self.record_latency = r.histogram("yolo_record_write_seconds", "写入一帧录制视频的耗时（编码积压时升高）")
+        self._roi_detections: Dict[str, Counter] = {}
+
+        # 处理帧率由 rate(yolo_frames_total[1m]) 计算，抓取本身不改变任何状态
+        r.counter("yolo_dropped_frames_total", "视频文件实时播放累计丢帧数", func=self._dropped_frames)
+        r.gauge("yolo_recording_active", "是否正在录制", func=self._recording_active)
+        r.gauge("yolo_queue_depth", "各后台队列中待处理的条目数", labels={"queue": "persistence"},
+                func=self._persistence_pending)
+        r.gauge("yolo_detection_cache_entries", "检测结果缓存中的帧数", func=self._detection_cache_entries)
+        r.gauge("yolo_process_resident_memory_bytes", "进程常驻内存",
+                func=lambda: get_process_stats()["rss_bytes"])
+        r.counter("yolo_process_cpu_seconds_total", "进程累计CPU时间",
+                  func=lambda: get_process_stats()["cpu_seconds"])
+
+    def observe_frame(self, capture_seconds, inference_seconds, frame_seconds, roi_name=None, detections=0):
+        """记录一帧的耗时和检测数量"""
+        self.frames.inc()
+        self.capture_latency.observe(capture_seconds)
+        self.inference_latency.observe(inference_seconds)
+        self.frame_latency.observe(frame_seconds)
+        if detections:
+            counter = self._roi_detections.get(roi_name)
+            if counter is None:
+                counter = self.registry.counter("yolo_detections_total", "各ROI累计检测数量",
+                                                labels={"roi": roi_name or "full_frame"})
+                self._roi_detections[roi_name] = counter
+            counter.inc(detections)
+
+    def observe_record(self, seconds):
+        """记录一次录制写帧耗时"""
+        self.recorded_frames.inc()
+        self.record_latency.observe(seconds)
+
+    def _dropped_frames(self):
+        if self.video_handler is None or not self.video_handler.is_file_source():
+            return 0
+        return self.video_handler.get_playback_stats()["dropped_frames"]
+
+    def _recording_active(self):
+        return int(bool(self.video_handler and self.video_handler.is_recording()))
+
+    def _persistence_pending(self):
+        return self.roi_handler.get_persistence_stats()["pending"] if self.roi_handler else 0
+
+    def _detection_cache_entries(self):
+        cache = getattr(self.model_handler, "detection_cache", None)
+        return cache.get_stats()["entries"] if cache is not None else 0
@@ -1,10 +1,61 @@
 import os
+import math
+import time
+import logging
+import threading
+import contextlib
 from datetime import datetime
 from ultralytics import YOLO
 import cv2
 import numpy as np
 
-from config import DETECTABLE_CLASSES
+from config import (DETECTABLE_CLASSES, INFERENCE_CONFIG, DETECTION_CACHE_CONFIG, QUANTIZATION_CONFIG,
+                    TRACKING_CONFIG, MODEL_SWAP_CONFIG, MODEL_REGISTRY_CONFIG, CASCADE_CONFIG)
+from core.detection_utils import empty_detections, results_to_array, nms, filter_detections
+from core.roi_geometry import CompiledROI
+from core.detection_cache import DetectionCache, compute_file_digest
+from core.quantization import build_variant
+from core.lean_inference import LeanPredictor
+from core.tracker import TrackingManager
+from core.model_registry import ModelRegistry
+from core.cascade import BlobProposer, ModelProposer, CascadeDetector
+
+logger = logging.getLogger(__name__)
+
+
+def model_input_size(model):
+    """模型训练时的输入尺寸"""
+    imgsz = 640
+    if model is not None:
+        imgsz = getattr(model, "overrides", {}).get("imgsz", imgsz) or imgsz
+    if isinstance(imgsz, (list, tuple)):
+        imgsz = max(imgsz)
+    return int(imgsz)
+
+
+def model_stride(model):
+    """模型最大下采样步长"""
+    try:
+        return int(model.model.stride.max())
+    except Exception:
+        return 32
+
+
+class ModelState:
+    """一个已加载模型的全部相关状态，切换模型时整体替换"""
+
+    __slots__ = ("model", "path", "hash", "precision", "requested_precision", "fp32_model", "lean_predictor", "note")
+
+    def __init__(self, model, path, model_hash, precision="fp32", fp32_model=None, lean_predictor=None, note=None,
+                 requested_precision=None):
+        self.model = model
+        self.path = path
+        self.hash = model_hash
+        self.precision = precision
+        self.requested_precision = requested_precision or precision  # 加载时请求的精度（变体不可用时回退为FP32）
+        self.fp32_model = fp32_model if fp32_model is not None else model
+        self.lean_predictor = lean_predictor
+        self.note = note  # 加载时的附加说明（如低精度变体不可用）
 
 
 class ModelHandler:
@@ -12,89 +63,643 @@ class ModelHandler:
         self.model = None
         self.confidence_threshold = 0.5
         self.current_model_path = None
+        self.model_hash = None
+
+        # 原始检测结果缓存（视频文件回放时使用）
+        self.detection_cache = DetectionCache() if DETECTION_CACHE_CONFIG["enabled"] else None
+
+        # 切片推理设置
+        self.tiling_enabled = INFERENCE_CONFIG["tiling_enabled"]
+        self.tile_size = INFERENCE_CONFIG["tile_size"]
+        self.tile_overlap = INFERENCE_CONFIG["tile_overlap"]
+        self.last_tile_count = 0
+
+        # 按ROI自动选择推理尺寸
+        self.auto_imgsz = INFERENCE_CONFIG["auto_imgsz"]
+        self._roi_imgsz_cache = {}  # ROI名称 -> (顶点数据, 推理尺寸)
+        self.last_imgsz = None
+        self.last_detection_count = 0  # 上一帧输出的检测框数量
+        self.last_detections = empty_detections()  # 上一帧输出的检测结果（热力图等统计使用）
+
+        # 推理精度（fp32 / dynamic_int8 / static_int8 / bf16）
+        self.precision = "fp32"
+        self._requested_precision = "fp32"
+        self._fp32_model = None
+
+        # 精简推理路径（仅PyTorch模型），首次推理时创建
+        self.lean_inference = INFERENCE_CONFIG["lean_inference"]
+        self._lean_predictor = None
+
+        # 结果帧缓冲区池（由主窗口设置为视频源的缓冲区池），为None时每帧复制新数组
+        self.buffer_pool = None
+
+        # 目标跟踪（可选），为检测结果分配稳定ID并统计不同目标数量
+        self.tracking = TrackingManager() if TRACKING_CONFIG["enabled"] else None
+        self.last_new_objects = 0  # 上一帧新确认的目标数量
+
+        # 热切换模型：后台加载预热，帧间整体替换，切换后试用期内推理出错自动回滚
+        self._swap_thread = None
+        self._swap_result = None      # 后台线程结果 (是否通过, ModelState或None, 消息)
+        self._swap_event = None       # 待通知界面的切换/回滚结果 (是否成功, 消息)
+        self._previous_state = None   # 试用期内保留的旧模型，用于回滚
+        self._probation = 0           # 剩余试用帧数
+
+        # 常驻模型注册表（内存LRU），为None时每次切换都从磁盘加载
+        self.registry = ModelRegistry() if MODEL_REGISTRY_CONFIG["enabled"] else None
+
+        # 两级级联检测（可选）：候选阶段没有发现目标的帧不运行主模型
+        self.cascade = None
+        if CASCADE_CONFIG["enabled"]:
+            success, message = self.set_cascade(True)
+            if not success:
+                logger.warning(message)
+
+    def _resident_state(self, model_path):
+        """注册表中按当前精度配置常驻的模型，没有时返回None
+
+        注册表按加载时请求的精度登记，低精度变体不可用而回退为FP32的模型同样可以命中。
+        """
+        if self.registry is None:
+            return None
+        return self.registry.get(model_path, self.registry.file_digest(model_path), QUANTIZATION_CONFIG["precision"])
+
+    def _load_state(self, model_path):
+        """加载模型文件并按配置切换推理精度，返回 ModelState（不修改当前模型）；常驻模型直接返回"""
+        resident = self._resident_state(model_path)
+        if resident is not None:
+            return resident
+        model = YOLO(model_path)
+        model_hash = self.registry.file_digest(model_path) if self.registry else compute_file_digest(model_path, full=True)
+        precision = QUANTIZATION_CONFIG["precision"]
+        state = ModelState(model, model_path, model_hash, requested_precision=precision)
+        if precision != "fp32":
+            success, message, path = build_variant(model_path, state.hash, precision, model_input_size(model))
+            if not success:
+                state.note = f"{message}，使用FP32"
+            else:
+                try:
+                    if path != model_path:
+                        state.model = YOLO(path, task="detect")
+                    state.precision = precision
+                except Exception as e:
+                    state.note = f"加载{precision}模型失败: {e}，使用FP32"
+        return state
+
+    def _capture_state(self):
+        """当前模型的状态快照"""
+        return ModelState(self.model, self.current_model_path, self.model_hash, self.precision,
+                          self._fp32_model, self._lean_predictor, requested_precision=self._requested_precision)
+
+    def _apply_state(self, state):
+        """整体替换当前模型（在帧循环所在线程、两帧之间调用）"""
+        if self.registry is not None:
+            # 旧模型连同已创建的精简推理器留在注册表中，再切回时无需重新加载和预热
+            if self.model is not None:
+                self.registry.put(self._capture_state())
+            self.registry.put(state, active=True)
+        self.model = state.model
+        self.current_model_path = state.path
+        self.model_hash = state.hash
+        self.precision = state.precision
+        self._requested_precision = state.requested_precision
+        self._fp32_model = state.fp32_model
+        self._lean_predictor = state.lean_predictor
+        self.invalidate_roi_cache()
 
     def load_model(self, model_path):
         """加载YOLO模型"""
         try:
-            self.model = YOLO(model_path)
-            self.current_model_path = model_path
+            state = self._load_state(model_path)
+            self._apply_state(state)
+            self._previous_state = None
+            self._probation = 0
+            if state.note:
+                return True, f"模型加载成功: {model_path}（{state.note}）"
             return True, f"模型加载成功: {model_path}"
         except Exception as e:
             return False, f"模型加载失败: {str(e)}"
 
+    def _warmup_state(self, state, sample_frame=None):
+        """后台预热新模型并做基本检查，返回 (是否通过, 消息)"""
+        names = getattr(state.model, "names", None) or {}
+        missing = [c for c in (DETECTABLE_CLASSES or []) if c not in names]
+        if missing:
+            return False, f"模型不包含要检测的类别 {missing}"
+        imgsz = model_input_size(state.model)
+        torch_model = getattr(state.model, "model", None)
+        if self.lean_inference and hasattr(torch_model, "forward"):
+            state.lean_predictor = LeanPredictor(torch_model, model_stride(state.model), DETECTABLE_CLASSES,
+                                                 state.precision)
+        images = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * MODEL_SWAP_CONFIG["warmup_runs"]
+        if sample_frame is not None:
+            images.append(sample_frame)
+        start = time.perf_counter()
+        for image in images:
+            with self._inference_context(state.precision):
+                if state.lean_predictor is not None:
+                    dets = state.lean_predictor.predict(image, imgsz, self.confidence_threshold)[0]
+                else:
+                    dets = results_to_array(state.model(image, conf=self.confidence_threshold,
+                                                        classes=DETECTABLE_CLASSES, verbose=False)[0])
+            if dets.ndim != 2 or dets.shape[1] != 6 or not np.isfinite(dets).all():
+                return False, "模型输出格式异常"
+            if len(dets) > INFERENCE_CONFIG["max_det"]:
+                return False, f"检测框数量异常: {len(dets)}"
+        elapsed = (time.perf_counter() - start) / len(images)
+        return True, f"预热 {len(images)} 次，平均 {elapsed * 1000:.0f} ms"
+
+    def _swap_worker(self, model_path, sample_frame):
+        """后台线程：加载并预热新模型，结果留给帧循环线程应用"""
+        try:
+            state = self._load_state(model_path)
+            if self.registry is not None and self.registry.contains(state):
+                self._swap_result = (True, state, "常驻模型")
+                return
+            passed, message = self._warmup_state(state, sample_frame)
+            self._swap_result = (passed, state if passed else None, message)
+        except Exception as e:
+            self._swap_result = (False, None, f"模型加载失败: {e}")
+
+    def begin_model_swap(self, model_path, sample_frame=None):
+        """在后台加载并预热新模型，当前模型继续处理画面；完成后由 poll_model_swap 在两帧之间切换"""
+        if self._swap_thread is not None:
+            return False, "已有模型正在后台加载"
+        try:
+            resident = self._resident_state(model_path)
+        except OSError as e:
+            return False, f"模型加载失败: {e}"
+        if resident is not None:
+            # 常驻模型已预热，直接在当前两帧之间切换
+            start = time.perf_counter()
+            self._activate_swapped(resident, "常驻模型")
+            elapsed = (time.perf_counter() - start) * 1000
+            return True, f"已切换到常驻模型: {model_path}（{elapsed:.1f} ms）"
+        self._swap_result = None
+        self._swap_thread = threading.Thread(target=self._swap_worker, name="ModelSwap", daemon=True,
+                                             args=(model_path, None if sample_frame is None else sample_frame.copy()))
+        self._swap_thread.start()
+        return True, f"正在后台加载模型: {model_path}"
+
+    def is_swapping(self):
+        """是否有后台加载、试用期或未通知的切换结果"""
+        return self._swap_thread is not None or self._probation > 0 or self._swap_event is not None
+
+    def poll_model_swap(self):
+        """在帧循环线程中调用：后台加载完成时整体替换模型，返回 (是否成功, 消息)，无新结果时返回None"""
+        if self._swap_thread is not None and not self._swap_thread.is_alive():
+            self._swap_thread.join()
+            self._swap_thread = None
+            passed, state, message = self._swap_result
+            if passed:
+                self._activate_swapped(state, message)
+            else:
+                self._swap_event = (False, f"新模型未通过检查，继续使用当前模型: {message}")
+        event, self._swap_event = self._swap_event, None
+        return event
+
+    def _activate_swapped(self, state, message):
+        """切换到已通过检查的模型，保留旧模型进入试用期"""
+        if self.model is not None:
+            self._previous_state = self._capture_state()
+            self._probation = MODEL_SWAP_CONFIG["probation_frames"]
+        self._apply_state(state)
+        note = f"，{state.note}" if state.note else ""
+        self._swap_event = (True, f"模型已切换: {state.path}（{message}{note}）")
+
+    def rollback_model(self):
+        """回滚到切换前的模型（仅试用期内可用）"""
+        if self._previous_state is None:
+            return False, "没有可回滚的模型"
+        failed_path = self.current_model_path
+        if self.registry is not None:
+            self.registry.discard(self._capture_state())
+            self.model = None  # 失败的模型不再放回注册表
+        self._apply_state(self._previous_state)
+        self._previous_state = None
+        self._probation = 0
+        return True, f"已回滚到 {self.current_model_path}（{os.path.basename(failed_path)} 已弃用）"
+
+    def set_precision(self, precision, calibration_dir=None):
+        """切换推理精度，INT8变体首次使用时生成并缓存，之后直接加载缓存"""
+        if self.model is None:
+            return False, "模型未加载"
+        if precision == self.precision:
+            return True, f"当前精度已是 {precision}"
+        success, message, path = build_variant(self.current_model_path, self.model_hash, precision,
+                                               self.get_model_imgsz(), calibration_dir)
+        if not success:
+            return False, message
+        try:
+            if path == self.current_model_path:
+                self.model = self._fp32_model
+            else:
+                self.model = YOLO(path, task="detect")
+        except Exception as e:
+            return False, f"加载{precision}模型失败: {e}"
+        self.precision = precision
+        self._requested_precision = precision
+        self._lean_predictor = None
+        self.invalidate_roi_cache()
+        return True, f"推理精度已切换为 {precision}"
+
+    def _inference_context(self, precision=None):
+        """BF16精度下在CPU自动混合精度中推理"""
+        if (precision or self.precision) == "bf16":
+            import torch
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
     def load_default_model(self):
         """加载默认模型"""
         if os.path.exists("best.pt"):
             return self.load_model("best.pt")
         return False, "默认模型文件不存在"
 
-    def process_frame(self, frame, confidence_threshold=None, roi=None):
-        """处理帧，支持ROI和置信度设置"""
+    def get_model_imgsz(self):
+        """获取模型训练时的输入尺寸"""
+        return model_input_size(self.model)
+
+    def get_model_stride(self):
+        """获取模型最大下采样步长"""
+        return model_stride(self.model)
+
+    def _get_lean_predictor(self):
+        """获取精简推理器，模型不是PyTorch模型（如ONNX量化模型）时返回None"""
+        if not self.lean_inference or self.model is None:
+            return None
+        if self._lean_predictor is None:
+            torch_model = getattr(self.model, "model", None)
+            if not hasattr(torch_model, "forward"):
+                return None
+            try:
+                self._lean_predictor = LeanPredictor(torch_model, self.get_model_stride(),
+                                                     DETECTABLE_CLASSES, self.precision)
+            except Exception as e:
+                logger.warning(f"精简推理路径不可用，使用默认推理: {e}")
+                self.lean_inference = False
+                return None
+        return self._lean_predictor
+
+    def _run_model(self, images, imgsz=None, conf=None):
+        """对一张或一批图像推理，返回每张图像的 N x 6 检测结果列表"""
+        conf = self.confidence_threshold if conf is None else conf
+        predictor = self._get_lean_predictor()
+        if predictor is not None:
+            return predictor.predict(images, int(imgsz or self.get_model_imgsz()), conf)
+        return self._run_predictor(images, imgsz, conf)
+
+    def _run_predictor(self, images, imgsz=None, conf=None):
+        """通过ultralytics通用预测器推理"""
+        conf = self.confidence_threshold if conf is None else conf
+        kwargs = {"conf": conf, "classes": DETECTABLE_CLASSES, "verbose": False}
+        if imgsz is not None:
+            kwargs["imgsz"] = imgsz
+        with self._inference_context():
+            results = self.model(images, **kwargs)
+        return [results_to_array(r) for r in results]
+
+    @staticmethod
+    def _tile_origins(length, tile, overlap):
+        """计算一维方向上的切片起点，首尾切片分别对齐区域两端，相邻切片重叠不少于 overlap"""
+        if length <= tile:
+            return [0]
+        max_step = max(1.0, tile * (1 - overlap))
+        count = math.ceil((length - tile) / max_step) + 1
+        step = (length - tile) / (count - 1)
+        return [int(round(i * step)) for i in range(count)]
+
+    def get_tile_windows(self, bbox):
+        """计算覆盖外接矩形 (x, y, w, h) 的切片窗口列表"""
+        x, y, w, h = bbox
+        tile = int(self.tile_size or self.get_model_imgsz())
+        xs = self._tile_origins(w, tile, self.tile_overlap)
+        ys = self._tile_origins(h, tile, self.tile_overlap)
+        return [(x + tx, y + ty, min(tile, w), min(tile, h)) for ty in ys for tx in xs]
+
+    def select_imgsz(self, width, height):
+        """根据区域像素范围和最小目标尺寸选择推理输入尺寸（步长的整数倍）"""
+        stride = self.get_model_stride()
+        scale = INFERENCE_CONFIG["model_min_object_px"] / INFERENCE_CONFIG["min_object_px"]
+        needed = max(width, height) * scale
+        imgsz = int(math.ceil(needed / stride) * stride)
+        min_imgsz = int(math.ceil(INFERENCE_CONFIG["min_imgsz"] / stride) * stride)
+        max_imgsz = int(INFERENCE_CONFIG["max_imgsz"] // stride * stride)
+        return max(min_imgsz, min(imgsz, max_imgsz))
+
+    def get_roi_imgsz(self, roi_name, roi_points, bbox):
+        """获取ROI对应的推理尺寸，按ROI缓存，顶点变化时自动重新计算"""
+        if not self.auto_imgsz:
+            return None
+        key = roi_points.tobytes()
+        cached = self._roi_imgsz_cache.get(roi_name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        imgsz = self.select_imgsz(bbox[2], bbox[3])
+        if roi_name is not None:
+            self._roi_imgsz_cache[roi_name] = (key, imgsz)
+        return imgsz
+
+    def invalidate_roi_cache(self, roi_name=None):
+        """ROI编辑、重命名或删除后清除其缓存的推理尺寸"""
+        if roi_name is None:
+            self._roi_imgsz_cache.clear()
+        else:
+            self._roi_imgsz_cache.pop(roi_name, None)
+
+    def _predict_tiled(self, frame, bbox, conf=None):
+        """对外接矩形区域切片后批量推理，并用跨切片NMS合并结果"""
+        windows = self.get_tile_windows(bbox)
+        self.last_tile_count = len(windows)
+        crops = [frame[ty:ty + th, tx:tx + tw] for tx, ty, tw, th in windows]
+        tile = int(self.tile_size or self.get_model_imgsz())
+        per_tile = self._run_model(crops, imgsz=tile, conf=conf)
+
+        merged = []
+        for (tx, ty, _, _), dets in zip(windows, per_tile):
+            if len(dets):
+                dets = dets.copy()
+                dets[:, [0, 2]] += tx
+                dets[:, [1, 3]] += ty
+                merged.append(dets)
+        if not merged:
+            return empty_detections()
+        return nms(np.concatenate(merged), INFERENCE_CONFIG["tile_nms_iou"],
+                   metric=INFERENCE_CONFIG["tile_nms_metric"])
+
+    def should_tile(self, bbox):
+        """ROI外接矩形超出模型输入尺寸时才需要切片"""
+        if not self.tiling_enabled:
+            return False
+        tile = int(self.tile_size or self.get_model_imgsz())
+        return bbox[2] > tile or bbox[3] > tile
+
+    def set_cascade(self, enabled, proposer=None, proposal_model=None):
+        """启用或关闭两级级联检测，proposer 为 blob（形态学斑点）或 model（轻量候选模型）"""
+        if not enabled:
+            self.cascade = None
+            return True, "级联检测已关闭"
+        proposer = proposer or CASCADE_CONFIG["proposer"]
+        if proposer == "model":
+            path = proposal_model or CASCADE_CONFIG["proposal_model"]
+            if not path or not os.path.exists(path):
+                return False, f"候选模型文件不存在: {path}"
+            try:
+                small = YOLO(path)
+            except Exception as e:
+                return False, f"候选模型加载失败: {e}"
+            torch_model = getattr(small, "model", None)
+            if hasattr(torch_model, "forward"):
+                lean = LeanPredictor(torch_model, model_stride(small), DETECTABLE_CLASSES, "fp32")
+                predict = lambda image, imgsz, conf: lean.predict(image, imgsz, conf)[0]
+            else:
+                predict = lambda image, imgsz, conf: results_to_array(
+                    small(image, imgsz=imgsz, conf=conf, classes=DETECTABLE_CLASSES, verbose=False)[0])
+            candidates = ModelProposer(predict)
+        else:
+            candidates = BlobProposer()
+        self.cascade = CascadeDetector(candidates, lambda crops, imgsz: self._run_model(crops, imgsz=imgsz))
+        return True, f"级联检测已启用（候选: {proposer}）"
+
+    def _detect_region(self, frame, roi_name, roi_points, bbox, conf=None):
+        """对外接矩形区域整块推理（超出模型输入尺寸且启用切片时切片推理），返回原图坐标结果"""
+        x, y, w, h = bbox
+        if self.should_tile(bbox):
+            return self._predict_tiled(frame, bbox, conf)
+        self.last_tile_count = 1
+        self.last_imgsz = self.get_roi_imgsz(roi_name, roi_points, bbox)
+        dets = self._run_model(frame[y:y + h, x:x + w], imgsz=self.last_imgsz, conf=conf)[0]
+        dets[:, [0, 2]] += x
+        dets[:, [1, 3]] += y
+        return dets
+
+    def _detect_full_frame(self, frame):
+        """未启用ROI时的整帧检测，启用级联时先扫描候选"""
+        if self.cascade is None:
+            return self._run_model(frame)[0]
+        h, w = frame.shape[:2]
+        return self.cascade.detect(frame, (0, 0, w, h), lambda: self._run_model(frame)[0])
+
+    @staticmethod
+    def _clip_bbox(bbox, frame_shape):
+        """把外接矩形 (x, y, w, h) 裁剪到帧范围内，完全在帧外时返回None"""
+        x, y, w, h = bbox
+        frame_h, frame_w = frame_shape[:2]
+        x, y = max(0, x), max(0, y)
+        w, h = min(w, frame_w - x), min(h, frame_h - y)
+        if w <= 0 or h <= 0:
+            return None
+        return x, y, w, h
+
+    def detect_in_roi(self, frame, roi, roi_name=None):
+        """在ROI外接矩形内推理，返回中心点位于ROI多边形内的检测结果
+
+        roi 为 CompiledROI，也兼容直接传入 N x 2 顶点数组。
+        """
+        if not isinstance(roi, CompiledROI):
+            roi = CompiledROI(roi_name, roi)
+        roi_name = roi_name if roi_name is not None else roi.name
+        bbox = self._clip_bbox(roi.bbox, frame.shape)
+        if bbox is None:
+            return empty_detections()
+
+        if self.cascade is not None:
+            dets = self.cascade.detect(frame, bbox, lambda: self._detect_region(frame, roi_name, roi.points, bbox))
+        else:
+            dets = self._detect_region(frame, roi_name, roi.points, bbox)
+
+        # 过滤出中心点在ROI区域内的检测框
+        return filter_detections(dets, region=roi)
+
+    def get_raw_detections(self, frame, frame_id, roi=None):
+        """获取置信度下限下的原始检测结果，优先读取缓存
+
+        frame_id 为 (视频内容摘要, 帧序号)，roi 为启用时的 CompiledROI。默认缓存整帧结果，
+        调整阈值或切换ROI只需向量化重新过滤，无需再次推理（不使用切片和按ROI推理尺寸）。
+        DETECTION_CACHE_CONFIG["region_inference"] 为True时未命中按实时路径在ROI外接矩形内推理，
+        缓存键包含外接矩形和推理方式，切换到外接矩形不同的ROI时每帧需要重新推理一次。
+        """
+        source_id, frame_index = frame_id
+        floor = DETECTION_CACHE_CONFIG["floor_confidence"]
+        bbox = mode = None
+        if roi is not None and DETECTION_CACHE_CONFIG["region_inference"]:
+            bbox = self._clip_bbox(roi.bbox, frame.shape)
+            if bbox is None:
+                return empty_detections()
+            if self.should_tile(bbox):
+                mode = ("tiled", int(self.tile_size or self.get_model_imgsz()), self.tile_overlap)
+            else:
+                mode = ("region", self.get_roi_imgsz(roi.name, roi.points, bbox))
+        key = (source_id, self.model_hash, self.precision, floor, tuple(DETECTABLE_CLASSES or ()),
+               bbox, mode, frame_index)
+        raw = self.detection_cache.get(key)
+        if raw is None:
+            if bbox is None:
+                raw = self._run_model(frame, conf=floor)[0]
+            else:
+                raw = self._detect_region(frame, roi.name, roi.points, bbox, conf=floor)
+            self.detection_cache.put(key, raw)
+        return raw
+
+    def detect(self, frame):
+        """整帧按当前置信度推理，只返回 N x 6 检测结果，不绘制也不更新跟踪"""
+        if self.model is None:
+            return empty_detections()
+        return self._run_model(frame)[0]
+
+    def can_use_cache(self, frame_id):
+        """当前帧是否可以使用检测结果缓存（级联检测按帧序列决定推理方式，启用时不缓存）"""
+        return (frame_id is not None and self.detection_cache is not None and self.model_hash is not None
+                and self.cascade is None)
+
+    def draw_detections(self, frame, detections):
+        """在帧上绘制检测框和标签，带轨迹ID列 (N x 7) 时在标签前显示ID"""
+        for det in detections:
+            x1, y1, x2, y2 = int(det[0]), int(det[1]), int(det[2]), int(det[3])
+            conf, class_id = det[4], det[5]
+            label = f"{self.model.names[int(class_id)]} {conf:.2f}"
+            if len(det) > 6 and det[6] >= 0:
+                label = f"#{int(det[6])} {label}"
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, label, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
+        return frame
+
+    def _track(self, roi_name, detections):
+        """启用跟踪时为检测结果附加轨迹ID"""
+        if self.tracking is None:
+            return detections
+        tracked = self.tracking.update(roi_name, detections)
+        self.last_new_objects = len(self.tracking.newly_confirmed(roi_name))
+        return tracked
+
+    def set_tracking(self, enabled):
+        """启用或关闭目标跟踪"""
+        if enabled and self.tracking is None:
+            self.tracking = TrackingManager()
+        elif not enabled:
+            self.tracking = None
+            self.last_new_objects = 0
+
+    def reset_tracking(self, roi_name=None):
+        """清除跟踪状态（ROI重命名、删除或停止检测时调用）"""
+        if self.tracking is not None:
+            self.tracking.reset(roi_name)
+
+    def get_unique_count(self, roi_name=None, window_seconds=None):
+        """时间窗口内出现的不同目标数量，未启用跟踪时返回None"""
+        if self.tracking is None:
+            return None
+        return self.tracking.unique_count(roi_name, window_seconds)
+
+    def _result_frame(self, frame):
+        """用于绘制检测结果的帧副本，有缓冲区池时复用同一块内存"""
+        if self.buffer_pool is None:
+            return frame.copy()
+        return self.buffer_pool.copy("result", frame)
+
+    def process_frame(self, frame, confidence_threshold=None, roi=None, frame_id=None):
+        """处理帧，支持ROI和置信度设置
+
+        frame_id 为视频文件帧标识 (视频内容摘要, 帧序号)，提供时使用原始检测结果缓存。
+        刚热切换的模型在试用期内推理出错时回滚到旧模型并重新处理该帧。
+        """
+        if self._probation <= 0:
+            return self._process_frame(frame, confidence_threshold, roi, frame_id)
+        try:
+            result = self._process_frame(frame, confidence_threshold, roi, frame_id)
+        except Exception as e:
+            logger.error(f"新模型推理失败: {e}")
+            _, message = self.rollback_model()
+            self._swap_event = (False, f"新模型推理失败，{message}")
+            return self._process_frame(frame, confidence_threshold, roi, frame_id)
+        self._probation -= 1
+        if self._probation == 0:
+            self._previous_state = None  # 试用期结束，释放旧模型
+        return result
+
+    def _process_frame(self, frame, confidence_threshold=None, roi=None, frame_id=None):
+        """处理帧（process_frame 的实现）"""
         if self.model is None:
             return frame, False
-        
+
         # 设置置信度
         if confidence_threshold is not None:
             self.confidence_threshold = confidence_threshold
-        
+
+        roi_enabled = bool(roi and hasattr(roi, 'is_roi_enabled') and roi.is_roi_enabled())
+
+        # 视频文件：原始推理结果缓存后，按置信度和ROI多边形向量化过滤
+        if self.can_use_cache(frame_id):
+            compiled = roi.get_compiled_roi(frame_shape=frame.shape) if roi_enabled else None
+            raw = self.get_raw_detections(frame, frame_id, compiled)
+            filtered = filter_detections(raw, self.confidence_threshold, region=compiled)
+            filtered = self._track(roi.get_active_roi_name() if roi_enabled else None, filtered)
+            detected_class0 = roi_enabled and bool(np.any(filtered[:, 5] == 0))
+            self.last_detections = filtered
+            self.last_detection_count = len(filtered)
+            return self.draw_detections(self._result_frame(frame), filtered), detected_class0
+
         # 如果有ROI处理器，使用ROI检测
-        if roi and hasattr(roi, 'is_roi_enabled') and roi.is_roi_enabled():
-            # 创建ROI掩码
-            mask = roi.create_roi_mask(frame.shape)
-            
-            # 在ROI区域内进行检测
-            results = self.model(frame, conf=self.confidence_threshold, classes=DETECTABLE_CLASSES)
-            
-            # 先获取所有检测框
-            boxes = results[0].boxes.xyxy.cpu().numpy()
-            confs = results[0].boxes.conf.cpu().numpy()
-            class_ids = results[0].boxes.cls.cpu().numpy().astype(int)
-
-            # 过滤出在ROI区域内的检测框
-            filtered_boxes = []
-            detected_class0 = False
-            if len(boxes) > 0:
-                roi_points = np.array(roi.get_roi_points(roi.get_active_roi_name()), dtype=np.int32)
-                for i, box in enumerate(boxes):
-                    x1, y1, x2, y2 = box
-                    center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2
-                    if cv2.pointPolygonTest(roi_points, (center_x, center_y), False) >= 0:
-                        filtered_boxes.append((box, confs[i], class_ids[i]))
-                        if class_ids[i] == 0:
-                            detected_class0 = True
-            
+        if roi_enabled:
+            roi_name = roi.get_active_roi_name()
+            filtered = self.detect_in_roi(frame, roi.get_compiled_roi(roi_name, frame.shape), roi_name)
+            filtered = self._track(roi_name, filtered)
+            detected_class0 = bool(np.any(filtered[:, 5] == 0))
+            self.last_detections = filtered
+            self.last_detection_count = len(filtered)
+
             # 在原始帧的副本上绘制过滤后的检测框
-            result_frame = frame.copy()
-            for box, conf, class_id in filtered_boxes:
-                x1, y1, x2, y2 = map(int, box)
-                label = f"{self.model.names[class_id]} {conf:.2f}"
-                cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(result_frame, label, (x1, y1 - 10), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-            
+            result_frame = self.draw_detections(self._result_frame(frame), filtered)
             return result_frame, detected_class0
         else:
             # 正常检测
-            results = self.model(frame, conf=self.confidence_threshold, classes=DETECTABLE_CLASSES)
-            return results[0].plot(), False
+            detections = self._track(None, self._detect_full_frame(frame))
+            self.last_detections = detections
+            self.last_detection_count = len(detections)
+            return self.draw_detections(self._result_frame(frame), detections), False
 
     def set_confidence(self, confidence):
         """设置置信度阈值"""
         self.confidence_threshold = confidence
 
+    def set_tiling(self, enabled, tile_size=None, overlap=None):
+        """设置切片推理参数"""
+        self.tiling_enabled = enabled
+        if tile_size is not None:
+            self.tile_size = tile_size
+        if overlap is not None:
+            self.tile_overlap = overlap
+
+    def set_auto_imgsz(self, enabled):
+        """设置是否按ROI自动选择推理尺寸"""
+        self.auto_imgsz = enabled
+        self._roi_imgsz_cache.clear()
+
     def get_model_info(self):
         """获取模型信息"""
         if self.current_model_path is None:
             return "未加载"
-        
+
         model_name = os.path.basename(self.current_model_path)
+        if self.precision != "fp32":
+            model_name = f"{model_name} [{self.precision}]"
         try:
             mod_time = os.path.getmtime(self.current_model_path)
             mod_time_str = datetime.fromtimestamp(mod_time).strftime('%Y-%m-%d %H:%M')
-            return f"{model_name} (修改时间: {mod_time_str})"
+            info = f"{model_name} (修改时间: {mod_time_str})"
         except Exception:
-            return model_name
+            info = model_name
+        resident = self.get_resident_models()
+        if len(resident) > 1:
+            total = sum(entry["memory_mb"] for entry in resident)
+            names = ", ".join(f"{entry['name']} {entry['memory_mb']:.0f}MB" for entry in resident)
+            info += f" | 常驻 {len(resident)} 个 {total:.0f}MB: {names}"
+        return info
+
+    def get_resident_models(self):
+        """注册表中常驻的模型列表（最近使用的在前），包括名称、精度和内存占用"""
+        return self.registry.entries() if self.registry is not None else []
 
     def is_model_loaded(self):
         """检查模型是否已加载"""
-        return self.model is not None 
\ No newline at end of file
+        return self.model is not None
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from config import MODEL_REGISTRY_CONFIG
+from core.detection_cache import compute_file_digest
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_model_bytes(state) -> int:
+    """估算模型占用的内存：PyTorch模型按参数和缓冲区统计，其他格式（如ONNX）按模型文件大小"""
+    total = 0
+    for model in {id(m): m for m in (state.model, state.fp32_model) if m is not None}.values():
+        torch_model = getattr(model, "model", None)
+        if hasattr(torch_model, "parameters"):
+            tensors = list(torch_model.parameters()) + list(torch_model.buffers())
+            total += sum(t.numel() * t.element_size() for t in tensors)
+            continue
+        path = getattr(model, "ckpt_path", None) or state.path
+        try:
+            total += os.path.getsize(path)
+        except (OSError, TypeError):
+            pass
+    return total
+
+
+class ModelRegistry:
+    """已加载模型的内存LRU
+
+    键为 (模型文件绝对路径, 内容摘要, 请求的推理精度)，值为已预热的 ModelState，切换到常驻模型不需要重新读盘和预热；
+    低精度变体生成失败而以FP32运行的模型仍按请求的精度登记，按同一精度配置查找时可以命中。
+    总内存超过 memory_budget_mb 或数量超过 max_models 时按最久未使用淘汰，当前使用的模型不会被淘汰。
+    文件摘要按 (修改时间, 大小) 缓存，常驻模型的查找不需要重新读取整个文件。
+    """
+
+    def __init__(self, memory_budget_mb: float = None, max_models: int = None):
+        budget = MODEL_REGISTRY_CONFIG["memory_budget_mb"] if memory_budget_mb is None else memory_budget_mb
+        self.memory_budget = int(budget * 1024 * 1024)
+        self.max_models = max(1, max_models or MODEL_REGISTRY_CONFIG["max_models"])
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._digests: Dict[str, Tuple[float, int, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def file_digest(self, path: str) -> str:
+        """模型文件内容摘要，文件未变化时直接返回缓存值"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self._digests.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        digest = compute_file_digest(path, full=True)
+        self._digests[path] = (stat.st_mtime, stat.st_size, digest)
+        return digest
+
+    @staticmethod
+    def key(path: str, model_hash: str, precision: str) -> Tuple[str, str, str]:
+        return os.path.abspath(path), model_hash, precision
+
+    def get(self, path: str, model_hash: str, precision: str):
+        """查找常驻模型，命中时标记为最近使用"""
+        key = self.key(path, model_hash, precision)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            self.hits += 1
+            return entry["state"]
+
+    def put(self, state, active: bool = False) -> List[Tuple[str, str, str]]:
+        """登记（或刷新）一个已加载的模型并按预算淘汰，active 表示当前正在使用，返回被淘汰的键"""
+        key = self.key(state.path, state.hash, state.requested_precision)
+        nbytes = estimate_model_bytes(state)
+        with self._lock:
+            self._entries[key] = {"state": state, "bytes": nbytes, "last_used": time.time()}
+            self._entries.move_to_end(key)
+            evicted = []
+            for old_key in list(self._entries):
+                if not self._over_budget():
+                    break
+                if old_key == key and active:
+                    continue
+                del self._entries[old_key]
+                evicted.append(old_key)
+            self.evictions += len(evicted)
+        for path, _, precision in evicted:
+            logger.info(f"模型常驻内存超出预算，释放: {os.path.basename(path)} [{precision}]")
+        return evicted
+
+    def _over_budget(self) -> bool:
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        return total > self.memory_budget or len(self._entries) > self.max_models
+
+    def discard(self, state):
+        """移除一个模型（如切换后推理失败的模型）"""
+        with self._lock:
+            self._entries.pop(self.key(state.path, state.hash, state.requested_precision), None)
+
+    def contains(self, state) -> bool:
+        with self._lock:
+            return self.key(state.path, state.hash, state.requested_precision) in self._entries
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """常驻模型列表（最近使用的在前）"""
+        with self._lock:
+            items = list(self._entries.items())
+        return [{"path": path, "name": os.path.basename(path), "precision": entry["state"].precision,
+                 "memory_mb": entry["bytes"] / (1024 * 1024), "last_used": entry["last_used"]}
+                for (path, _, _), entry in reversed(items)]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry["bytes"] for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
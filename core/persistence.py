@@ -0,0 +1,206 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+from config import PERSISTENCE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_text(path: str, text: str, fsync: bool = True):
+    """原子写入文本文件：写临时文件并fsync后用os.replace替换"""
+    temp_file = path + ".tmp"
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_file, path)
+    except Exception:
+        if os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+        raise
+
+
+class WriteBehindWriter:
+    """写回式(write-behind)持久化
+
+    调用方在GUI线程只标记文件内容已变化(schedule)，后台线程在最后一次修改后
+    等待 debounce 秒再原子写盘；同一文件在等待期间的多次修改合并为一次写入。
+    append() 用于只追加的日志文件，同一批追加内容一次写入、一次fsync。
+    程序退出前调用 close() 把未写入的内容全部落盘。
+    """
+
+    def __init__(self, debounce: Optional[float] = None, fsync: Optional[bool] = None):
+        self.debounce = PERSISTENCE_CONFIG["debounce_seconds"] if debounce is None else debounce
+        self.fsync = PERSISTENCE_CONFIG["fsync"] if fsync is None else fsync
+        self._pending: Dict[str, tuple] = {}   # 路径 -> (文本, 到期时间, 写入后回调)
+        self._appends: Dict[str, list] = {}    # 路径 -> [待追加的行列表, 到期时间]
+        self._inflight = set()                  # 正在写入的路径
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+        # I/O统计
+        self.requested = 0   # 调用方请求的保存次数
+        self.written = 0     # 实际写盘次数
+        self.appended = 0    # 追加的记录条数
+        self.append_writes = 0  # 追加日志的实际写盘次数
+        self.failed = 0
+
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        """按需启动后台写盘线程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="WriteBehindWriter", daemon=True)
+            self._thread.start()
+
+    def schedule(self, path: str, text: str, on_written: Optional[Callable[[str], None]] = None):
+        """标记文件需要写入，内容以最后一次调度为准"""
+        with self._cond:
+            if self._stopped:
+                # 已关闭时直接同步写入，保证不丢数据
+                self._write(path, text, on_written)
+                return
+            self.requested += 1
+            self._pending[path] = (text, time.monotonic() + self.debounce, on_written)
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def append(self, path: str, line: str):
+        """向只追加的日志文件追加一行，由后台线程批量写入
+
+        到期时间从该批第一条记录算起，连续追加时也会按 debounce 间隔定期落盘。
+        """
+        with self._cond:
+            if self._stopped:
+                self._write_appends(path, [line])
+                return
+            self.appended += 1
+            batch = self._appends.get(path)
+            if batch is None:
+                self._appends[path] = [[line], time.monotonic() + self.debounce]
+            else:
+                batch[0].append(line)
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def cancel(self, path: str):
+        """取消尚未写入的文件（删除或重命名文件前调用），并等待正在进行的写入完成"""
+        with self._cond:
+            self._pending.pop(path, None)
+            self._appends.pop(path, None)
+            while path in self._inflight:
+                self._cond.wait()
+
+    def is_pending(self, path: str) -> bool:
+        """文件是否有尚未落盘的修改"""
+        with self._cond:
+            return path in self._pending or path in self._appends or path in self._inflight
+
+    def _write_appends(self, path: str, lines):
+        """把一批记录追加到日志文件并fsync一次"""
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write("".join(line + "\n" for line in lines))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.append_writes += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"追加写入文件失败 {path}: {e}")
+
+    def _write(self, path: str, text: str, on_written):
+        """执行一次原子写入"""
+        try:
+            atomic_write_text(path, text, self.fsync)
+            self.written += 1
+            if on_written is not None:
+                on_written(path)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"写入文件失败 {path}: {e}")
+
+    def _run(self):
+        """后台线程：等待到期后批量写盘"""
+        with self._cond:
+            while not self._stopped or self._pending or self._appends:
+                if not self._pending and not self._appends:
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                next_due = min([due for _, due, _ in self._pending.values()] +
+                               [due for _, due in self._appends.values()])
+                if next_due > now and not self._stopped:
+                    self._cond.wait(next_due - now)
+                    continue
+                due_items = [(path, item) for path, item in self._pending.items()
+                             if item[1] <= now or self._stopped]
+                due_appends = [(path, batch[0]) for path, batch in self._appends.items()
+                               if batch[1] <= now or self._stopped]
+                for path, _ in due_items:
+                    del self._pending[path]
+                    self._inflight.add(path)
+                for path, _ in due_appends:
+                    del self._appends[path]
+                    self._inflight.add(path)
+                self._cond.release()
+                try:
+                    for path, lines in due_appends:
+                        self._write_appends(path, lines)
+                    for path, (text, _, on_written) in due_items:
+                        self._write(path, text, on_written)
+                finally:
+                    self._cond.acquire()
+                    for path, _ in due_items + due_appends:
+                        self._inflight.discard(path)
+                    self._cond.notify_all()
+
+    def flush(self, timeout: float = 5.0):
+        """立即写出所有待写入的内容并等待完成"""
+        with self._cond:
+            if not self._pending and not self._appends and not self._inflight:
+                return
+            now = time.monotonic()
+            self._pending = {path: (text, now, cb) for path, (text, _, cb) in self._pending.items()}
+            for batch in self._appends.values():
+                batch[1] = now
+            self._ensure_thread()
+            self._cond.notify_all()
+            deadline = now + timeout
+            while (self._pending or self._appends or self._inflight) and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+
+    def close(self):
+        """关闭写盘线程，退出前确保所有修改落盘"""
+        self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        if self.requested:
+            logger.info(f"持久化统计: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取I/O统计：请求次数、实际写盘次数及合并节省的写盘次数"""
+        with self._cond:
+            pending = len(self._pending) + len(self._inflight)
+        return {
+            "requested": self.requested,
+            "written": self.written,
+            "pending": pending,
+            "saved": max(0, self.requested - self.written - pending),
+            "appended": self.appended,
+            "append_writes": self.append_writes,
+            "failed": self.failed
+        }
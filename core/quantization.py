@@ -0,0 +1,163 @@
+import os
+import glob
+import shutil
+import logging
+from typing import Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import QUANTIZATION_CONFIG, DEFAULT_SETTINGS
+from core.detection_utils import letterbox
+
+logger = logging.getLogger(__name__)
+
+# fp32: 原始PyTorch模型; bf16: PyTorch + CPU自动混合精度;
+# dynamic_int8 / static_int8: 导出ONNX后用onnxruntime量化
+PRECISION_VARIANTS = ("fp32", "dynamic_int8", "static_int8", "bf16")
+ONNX_VARIANTS = ("dynamic_int8", "static_int8")
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def is_bf16_supported() -> bool:
+    """CPU是否支持BF16加速指令（AVX512-BF16 或 AMX）"""
+    try:
+        import torch
+    except ImportError:
+        return False
+    check = getattr(getattr(torch, "cpu", None), "_is_avx512_bf16_supported", None)
+    if check is not None:
+        try:
+            if check():
+                return True
+        except Exception:
+            pass
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def variant_path(model_path: str, model_hash: str, variant: str) -> str:
+    """量化模型在缓存目录中的路径，按原模型内容摘要区分，模型更新后自动重新生成"""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(QUANTIZATION_CONFIG["cache_dir"], f"{stem}-{model_hash[:12]}-{variant}.onnx")
+
+
+def iter_calibration_frames(source_dir: str = None, max_frames: int = None) -> Iterator[np.ndarray]:
+    """从训练数据录像（及图片）中均匀抽取校准帧"""
+    source_dir = source_dir or DEFAULT_SETTINGS["training_data_dir"]
+    max_frames = max_frames or QUANTIZATION_CONFIG["calibration_frames"]
+    paths = sorted(glob.glob(os.path.join(source_dir, "**", "*"), recursive=True))
+    videos = [p for p in paths if p.lower().endswith(VIDEO_EXTENSIONS)]
+    images = [p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS)]
+    if not videos and not images:
+        return
+
+    count = 0
+    # 图片和每个视频平均分配校准帧数
+    per_source = max(1, max_frames // max(1, len(videos) + (1 if images else 0)))
+    if images:
+        step = max(1, len(images) // per_source)
+        for path in images[::step][:per_source]:
+            frame = cv2.imread(path)
+            if frame is not None:
+                count += 1
+                yield frame
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        try:
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            indices = np.linspace(0, max(total - 1, 0), num=per_source, dtype=int) if total > 0 else []
+            for index in sorted(set(int(i) for i in indices)):
+                if count >= max_frames:
+                    return
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ret, frame = cap.read()
+                if ret:
+                    count += 1
+                    yield frame
+        finally:
+            cap.release()
+
+
+def _to_input_tensor(frame: np.ndarray, imgsz: int) -> np.ndarray:
+    """BGR帧转换为模型输入: 1 x 3 x imgsz x imgsz, RGB, float32, 0~1"""
+    image = letterbox(frame, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+def _export_onnx(model_path: str, target: str, imgsz: int) -> str:
+    """导出FP32 ONNX模型（动态输入尺寸，便于按ROI选择推理尺寸）"""
+    from ultralytics import YOLO
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, verbose=False)
+    shutil.move(str(exported), target)
+    return target
+
+
+def build_variant(model_path: str, model_hash: str, variant: str, imgsz: int = 640,
+                  calibration_dir: str = None) -> Tuple[bool, str, Optional[str]]:
+    """生成（或从缓存读取）量化模型，返回 (是否成功, 消息, 模型路径)
+
+    fp32 和 bf16 直接使用原模型；INT8 变体需要 onnx 和 onnxruntime。
+    """
+    if variant not in PRECISION_VARIANTS:
+        return False, f"未知的精度类型: {variant}", None
+    if variant == "bf16" and not is_bf16_supported():
+        return False, "当前CPU不支持BF16", None
+    if variant not in ONNX_VARIANTS:
+        return True, f"使用原模型: {model_path}", model_path
+
+    target = variant_path(model_path, model_hash, variant)
+    if os.path.exists(target):
+        return True, f"使用缓存的量化模型: {target}", target
+
+    try:
+        from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                              quantize_dynamic, quantize_static)
+        import onnxruntime
+    except ImportError:
+        return False, "INT8量化需要安装 onnx 和 onnxruntime", None
+
+    os.makedirs(QUANTIZATION_CONFIG["cache_dir"], exist_ok=True)
+    fp32_path = variant_path(model_path, model_hash, "fp32")
+    temp_path = target + ".tmp.onnx"
+    try:
+        if not os.path.exists(fp32_path):
+            logger.info(f"导出ONNX模型: {fp32_path}")
+            _export_onnx(model_path, fp32_path, imgsz)
+
+        if variant == "dynamic_int8":
+            quantize_dynamic(fp32_path, temp_path, weight_type=QuantType.QInt8)
+        else:
+            input_name = onnxruntime.InferenceSession(
+                fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+            class FrameReader(CalibrationDataReader):
+                """把训练数据帧逐个提供给静态量化校准"""
+
+                def __init__(self):
+                    self._frames = iter_calibration_frames(calibration_dir)
+
+                def get_next(self):
+                    frame = next(self._frames, None)
+                    return None if frame is None else {input_name: _to_input_tensor(frame, imgsz)}
+
+            if next(iter_calibration_frames(calibration_dir, 1), None) is None:
+                return False, f"校准数据目录中没有可用的视频或图片: {calibration_dir or DEFAULT_SETTINGS['training_data_dir']}", None
+            quantize_static(fp32_path, temp_path, FrameReader(), quant_format=QuantFormat.QDQ,
+                            per_channel=True, weight_type=QuantType.QInt8,
+                            activation_type=QuantType.QUInt8)
+        os.replace(temp_path, target)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        logger.error(f"生成量化模型失败 {variant}: {e}")
+        return False, f"生成量化模型失败: {e}", None
+
+    logger.info(f"量化模型已生成: {target}")
+    return True, f"量化模型已生成: {target}", target
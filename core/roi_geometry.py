@@ -0,0 +1,158 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+def has_self_intersection(points: np.ndarray) -> bool:
+    """向量化检查闭合多边形是否存在非相邻边相交"""
+    n = len(points)
+    if n < 4:
+        return False
+    p = points.astype(np.float64)
+    a, b = p, np.roll(p, -1, axis=0)  # 第i条边: a[i] -> b[i]
+
+    def orient(p1, p2, p3):
+        return np.sign((p2[..., 0] - p1[..., 0]) * (p3[..., 1] - p1[..., 1]) -
+                       (p2[..., 1] - p1[..., 1]) * (p3[..., 0] - p1[..., 0]))
+
+    ai, bi = a[:, None, :], b[:, None, :]
+    aj, bj = a[None, :, :], b[None, :, :]
+    o1 = orient(ai, bi, aj)
+    o2 = orient(ai, bi, bj)
+    o3 = orient(aj, bj, ai)
+    o4 = orient(aj, bj, bi)
+    crossing = (o1 * o2 < 0) & (o3 * o4 < 0)
+
+    # 只比较非相邻的边对（首尾两条边也相邻）
+    idx = np.arange(n)
+    diff = np.abs(idx[:, None] - idx[None, :])
+    non_adjacent = (diff > 1) & (diff < n - 1)
+    return bool(np.any(crossing & non_adjacent))
+
+
+def normalize_points(points, frame_size: Tuple[int, int]):
+    """像素坐标转换为相对参考帧尺寸 (宽, 高) 的归一化坐标列表"""
+    w, h = frame_size
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2) / np.array([w, h], dtype=np.float64)
+    return np.round(pts, 6).tolist()
+
+
+def project_points(normalized, frame_size: Tuple[int, int]) -> np.ndarray:
+    """归一化坐标投影到指定帧尺寸 (宽, 高) 的int32像素坐标"""
+    w, h = frame_size
+    pts = np.asarray(normalized, dtype=np.float64).reshape(-1, 2) * np.array([w, h], dtype=np.float64)
+    pts = np.rint(pts)
+    np.clip(pts[:, 0], 0, max(w - 1, 0), out=pts[:, 0])
+    np.clip(pts[:, 1], 0, max(h - 1, 0), out=pts[:, 1])
+    return pts.astype(np.int32)
+
+
+class CompiledROI:
+    """编译后的不可变ROI几何对象
+
+    在ROI编辑后构建一次，持有连续的int32顶点数组及外接矩形、面积、凸性等预计算结果，
+    并缓存外接矩形内的局部掩码用于快速向量化点包含判断，供推理过滤、叠加显示等热路径共享。
+    """
+
+    __slots__ = ("name", "points", "bbox", "area", "is_convex", "is_simple", "_local_mask", "_mask_cache")
+
+    def __init__(self, name: str, points):
+        pts = np.ascontiguousarray(np.asarray(points, dtype=np.int32).reshape(-1, 2))
+        pts.flags.writeable = False
+        setattr_ = object.__setattr__
+        setattr_(self, "name", name)
+        setattr_(self, "points", pts)
+        if len(pts) >= 3:
+            setattr_(self, "bbox", tuple(int(v) for v in cv2.boundingRect(pts)))
+            setattr_(self, "area", float(abs(cv2.contourArea(pts))))
+            setattr_(self, "is_convex", bool(cv2.isContourConvex(pts)))
+        else:
+            setattr_(self, "bbox", (0, 0, 0, 0))
+            setattr_(self, "area", 0.0)
+            setattr_(self, "is_convex", False)
+        setattr_(self, "is_simple", not has_self_intersection(pts))
+        setattr_(self, "_local_mask", None)
+        setattr_(self, "_mask_cache", {})
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CompiledROI 是不可变对象")
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def is_valid(self) -> bool:
+        """是否为至少3个顶点且不自相交的多边形"""
+        return len(self.points) >= 3 and self.is_simple and self.area > 0
+
+    def _get_local_mask(self) -> np.ndarray:
+        """外接矩形范围内的多边形掩码（懒加载）"""
+        if self._local_mask is None:
+            x, y, w, h = self.bbox
+            mask = np.zeros((max(h, 1), max(w, 1)), dtype=np.uint8)
+            if len(self.points) >= 3:
+                cv2.fillPoly(mask, [self.points - np.array([x, y], dtype=np.int32)], 1)
+            mask.flags.writeable = False
+            object.__setattr__(self, "_local_mask", mask)
+        return self._local_mask
+
+    def contains(self, xy) -> np.ndarray:
+        """向量化判断多个点 (N x 2) 是否在ROI内，返回布尔数组"""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        result = np.zeros(len(xy), dtype=bool)
+        if len(xy) == 0 or len(self.points) < 3:
+            return result
+        x, y, w, h = self.bbox
+        px = np.floor(xy[:, 0]).astype(np.int64) - x
+        py = np.floor(xy[:, 1]).astype(np.int64) - y
+        inside_bbox = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+        mask = self._get_local_mask()
+        result[inside_bbox] = mask[py[inside_bbox], px[inside_bbox]] > 0
+        return result
+
+    def contains_point(self, x: float, y: float) -> bool:
+        """判断单个点是否在ROI内"""
+        return bool(self.contains([[x, y]])[0])
+
+    def full_mask(self, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """整帧尺寸的ROI掩码（ROI内为255），按帧尺寸缓存，返回只读数组"""
+        key = tuple(frame_shape[:2])
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.zeros(key, dtype=np.uint8)
+            if len(self.points) >= 3:
+                cv2.fillPoly(mask, [self.points], 255)
+            mask.flags.writeable = False
+            self._mask_cache[key] = mask
+        return mask
+
+    def outside_mask(self, frame_shape: Tuple[int, ...]) -> np.ndarray:
+        """整帧尺寸的ROI外部掩码（ROI外为255），按帧尺寸缓存，返回只读数组"""
+        key = tuple(frame_shape[:2]) + ("outside",)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = cv2.bitwise_not(self.full_mask(frame_shape))
+            mask.flags.writeable = False
+            self._mask_cache[key] = mask
+        return mask
+
+    def simplify(self, max_points: Optional[int] = None, epsilon: Optional[float] = None) -> "CompiledROI":
+        """Douglas-Peucker简化，返回顶点数不超过 max_points 的新ROI"""
+        if len(self.points) < 4:
+            return self
+        contour = self.points.reshape(-1, 1, 2)
+        if epsilon is not None:
+            simplified = cv2.approxPolyDP(contour, epsilon, True)
+        else:
+            # 从亚像素误差开始逐步放大容差，直到满足顶点数限制
+            simplified = contour
+            eps = 0.5
+            while max_points is not None and len(simplified) > max_points:
+                simplified = cv2.approxPolyDP(contour, eps, True)
+                eps *= 1.5
+        if len(simplified) < 3:
+            return self
+        return CompiledROI(self.name, simplified.reshape(-1, 2))
+
+    def to_list(self):
+        """转换为 [[x, y], ...] 列表，用于保存到JSON"""
+        return self.points.tolist()
@@ -4,30 +4,37 @@ import json
 import os
 import re
 import logging
-import traceback
-import glob
 from datetime import datetime
 from typing import List, Tuple, Optional, Dict, Any
 from config import ROI_CONFIG
+from core.roi_store import ROIStore
+from core.persistence import WriteBehindWriter
+from core.roi_geometry import CompiledROI, normalize_points, project_points
 
 # 设置日志记录器
 logger = logging.getLogger(__name__)
 
 class ROIHandler:
     def __init__(self):
-        self.roi_configs = {}  # 存储多个ROI配置
         self.active_roi = None  # 当前激活的ROI名称
         self.roi_enabled = False  # ROI是否启用
         self.roi_mode = False  # 是否处于ROI绘制模式
         self.current_points = []  # 当前正在绘制的点
         self.roi_folder = ROI_CONFIG["roi_folder"]  # ROI文件夹
-        self.temp_file = os.path.join(self.roi_folder, ROI_CONFIG["temp_roi_file"])  # 临时ROI文件
-        self._saving = False  # 防止保存过程中重新加载
+        self.temp_file = os.path.join(self.roi_folder, ROI_CONFIG["temp_roi_file"])  # 旧版临时ROI文件（仅用于恢复）
+        self.journal_file = os.path.join(self.roi_folder, ROI_CONFIG["temp_roi_journal"])  # 绘制中ROI的追加日志
+        self.recovered_points = []  # 上次异常退出时未完成的ROI顶点
+        self.writer = WriteBehindWriter()  # 写回式持久化，避免在GUI线程频繁fsync
         self.max_roi_count = ROI_CONFIG["max_roi_count"]  # 最大ROI数量限制
         self.max_points = ROI_CONFIG["max_points"]  # 最大点数
+        self.simplify_max_points = ROI_CONFIG["simplify_max_points"]  # 保存时简化到的最大顶点数
+        self.legacy_reference_size = ROI_CONFIG["legacy_reference_size"]  # 旧版ROI文件的参考分辨率
+        self.frame_size = None  # 当前视频源分辨率 (宽, 高)，ROI按此分辨率投影
+        self._compiled: Dict[tuple, CompiledROI] = {}  # (ROI名称, 分辨率) -> 编译后的几何对象，编辑时失效
         
         # 确保ROI文件夹存在
         self._ensure_roi_folder()
+        self.roi_configs = ROIStore(self.roi_folder, self.writer)  # 存储多个ROI配置（按需加载）
         
         # 加载配置
         self.load_config()
@@ -39,67 +46,98 @@ class ROIHandler:
             logger.info(f"创建ROI文件夹: {self.roi_folder}")
 
     def _clear_temp_roi(self):
-        """清除临时ROI文件"""
-        if os.path.exists(self.temp_file):
+        """清除绘制日志和旧版临时ROI文件"""
+        self.writer.cancel(self.journal_file)
+        for temp_file in (self.journal_file, self.temp_file):
+            if os.path.exists(temp_file):
+                try:
+                    os.remove(temp_file)
+                    logger.info(f"清除临时ROI文件: {temp_file}")
+                except Exception as e:
+                    logger.error(f"清除临时ROI文件失败: {e}")
+        self.recovered_points = []
+
+    def _read_journal(self) -> List[List[int]]:
+        """读取绘制日志，忽略异常退出时写了一半的最后一行"""
+        points = []
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("op") == "begin":
+                        points = []
+                    elif record.get("op") == "point":
+                        points.append([int(record["x"]), int(record["y"])])
+        except Exception as e:
+            logger.error(f"读取ROI绘制日志失败: {e}")
+        return points[:self.max_points]
+
+    def _load_recoverable_drawing(self):
+        """启动时读取上次未完成的ROI（绘制日志或旧版临时文件）"""
+        points = []
+        if os.path.exists(self.journal_file):
+            points = self._read_journal()
+        elif os.path.exists(self.temp_file):
             try:
-                os.remove(self.temp_file)
-                logger.info("清除临时ROI文件")
+                with open(self.temp_file, 'r', encoding='utf-8') as f:
+                    points = json.load(f).get("points", [])
             except Exception as e:
-                logger.error(f"清除临时ROI文件失败: {e}")
+                logger.error(f"读取旧版临时ROI文件失败: {e}")
+        self.recovered_points = points
+        if points:
+            logger.info(f"发现未完成的ROI，顶点数: {len(points)}")
+
+    def _append_journal(self, record: Dict[str, Any]):
+        """向绘制日志追加一条记录（后台批量写盘）"""
+        self.writer.append(self.journal_file, json.dumps(record, ensure_ascii=False))
+
+    def has_recoverable_drawing(self) -> bool:
+        """是否存在可恢复的未完成ROI"""
+        return len(self.recovered_points) > 0
+
+    def get_recoverable_points(self) -> List[List[int]]:
+        """获取可恢复的未完成ROI顶点"""
+        return [list(p) for p in self.recovered_points]
+
+    def recover_drawing(self) -> bool:
+        """恢复上次未完成的ROI，继续绘制"""
+        if not self.recovered_points:
+            return False
+        points = self.get_recoverable_points()
+        self._clear_temp_roi()
+        self.roi_mode = True
+        self.current_points = []
+        self._append_journal({"op": "begin", "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        for x, y in points:
+            self.current_points.append([x, y])
+            self._append_journal({"op": "point", "x": x, "y": y})
+        logger.info(f"已恢复未完成的ROI，顶点数: {len(points)}")
+        return True
 
     def _get_roi_file_path(self, roi_name: str) -> str:
         """获取ROI文件路径"""
         return os.path.join(self.roi_folder, f"{roi_name}.json")
 
-    def _load_roi_from_file(self, roi_name: str) -> Optional[Dict[str, Any]]:
-        """从文件加载单个ROI配置"""
-        roi_file = self._get_roi_file_path(roi_name)
-        if not os.path.exists(roi_file):
-            return None
-        
-        try:
-            with open(roi_file, 'r', encoding='utf-8') as f:
-                roi_config = json.load(f)
-            return roi_config
-        except Exception as e:
-            logger.error(f"加载ROI文件失败 {roi_file}: {e}")
-            return None
-
     def _save_roi_to_file(self, roi_name: str, roi_config: Dict[str, Any]) -> bool:
-        """保存ROI配置到文件"""
+        """保存ROI配置到文件（写回式：后台防抖合并后原子写盘）"""
         roi_file = self._get_roi_file_path(roi_name)
         try:
-            # 使用临时文件来避免写入过程中的问题
-            temp_file = roi_file + ".tmp"
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(roi_config, f, ensure_ascii=False, indent=2)
-                f.flush()
-                os.fsync(f.fileno())
-            
-            # 如果临时文件写入成功，则替换原文件
-            if os.path.exists(temp_file):
-                if os.path.exists(roi_file):
-                    os.remove(roi_file)
-                os.rename(temp_file, roi_file)
-                logger.info(f"ROI配置已保存到文件: {roi_file}")
-                return True
-            else:
-                logger.error("临时文件创建失败")
-                return False
-                
+            text = json.dumps(roi_config, ensure_ascii=False, indent=2)
         except Exception as e:
-            logger.error(f"保存ROI文件失败 {roi_file}: {e}")
-            # 如果临时文件存在，尝试删除
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
+            logger.error(f"序列化ROI配置失败 {roi_file}: {e}")
             return False
+        self.writer.schedule(roi_file, text, on_written=lambda _: self.roi_configs.mark_saved(roi_name))
+        return True
 
     def _delete_roi_file(self, roi_name: str) -> bool:
         """删除ROI文件"""
         roi_file = self._get_roi_file_path(roi_name)
+        # 先取消尚未写入的修改，避免删除后被后台线程重新写出
+        pending = self.writer.is_pending(roi_file)
+        self.writer.cancel(roi_file)
         if os.path.exists(roi_file):
             try:
                 os.remove(roi_file)
@@ -108,35 +146,15 @@ class ROIHandler:
             except Exception as e:
                 logger.error(f"删除ROI文件失败 {roi_file}: {e}")
                 return False
-        return False
-
-    def _scan_roi_files(self) -> List[str]:
-        """扫描ROI文件夹，获取所有ROI名称"""
-        roi_names = []
-        if not os.path.exists(self.roi_folder):
-            return roi_names
-        
-        try:
-            # 获取所有.json文件，排除临时和主配置文件
-            roi_files = glob.glob(os.path.join(self.roi_folder, "*.json"))
-            for roi_file in roi_files:
-                filename = os.path.basename(roi_file)
-                if filename not in [ROI_CONFIG["temp_roi_file"], ROI_CONFIG["main_config_file"]]:
-                    roi_name = os.path.splitext(filename)[0]
-                    roi_names.append(roi_name)
-            
-            logger.info(f"扫描到ROI文件: {roi_names}")
-            return roi_names
-        except Exception as e:
-            logger.error(f"扫描ROI文件失败: {e}")
-            return []
+        return pending
 
     def start_drawing(self):
         """开始绘制新的ROI"""
         self.roi_mode = True
         self.current_points = []
-        # 清除之前的临时文件
+        # 清除之前的临时文件，开始新的绘制日志
         self._clear_temp_roi()
+        self._append_journal({"op": "begin", "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
 
     def stop_drawing(self):
         """停止绘制"""
@@ -155,39 +173,22 @@ class ROIHandler:
 
         self.current_points.append([x, y])
         
-        # 保存临时ROI文件
-        self._save_temp_roi()
+        # 只追加新顶点到绘制日志，用于异常退出后恢复
+        self._append_journal({"op": "point", "x": x, "y": y})
         
         return True
 
-    def _save_temp_roi(self):
-        """保存临时ROI文件"""
-        if len(self.current_points) >= 3:
-            temp_config = {
-                "name": "temp_roi",
-                "points": self.current_points.copy(),
-                "created_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "last_used": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            try:
-                with open(self.temp_file, 'w', encoding='utf-8') as f:
-                    json.dump(temp_config, f, ensure_ascii=False, indent=2)
-                    f.flush()
-                    os.fsync(f.fileno())
-                logger.info("临时ROI文件已保存")
-            except Exception as e:
-                logger.error(f"保存临时ROI文件失败: {e}")
-
     def clear_current_roi(self) -> bool:
         """清除当前选中的ROI"""
         if self.active_roi:
-            # 从内存中删除
+            # 先删除文件（会取消并等待后台写入），再从内存中删除，
+            # 避免写入完成回调把已删除的ROI重新加回索引
+            deleted = self._delete_roi_file(self.active_roi)
             if self.active_roi in self.roi_configs:
                 del self.roi_configs[self.active_roi]
+            self._invalidate_compiled(self.active_roi)
             
-            # 删除文件
-            if self._delete_roi_file(self.active_roi):
+            if deleted:
                 self.active_roi = None
                 self.save_config()
                 return True
@@ -210,11 +211,11 @@ class ROIHandler:
     def is_roi_file_exists(self, roi_name: str) -> bool:
         """检查ROI文件是否已存在于硬盘上"""
         roi_file = self._get_roi_file_path(roi_name)
-        return os.path.exists(roi_file)
+        return os.path.exists(roi_file) or self.writer.is_pending(roi_file)
 
     def generate_unique_roi_name(self) -> str:
-        """扫描文件夹并生成一个唯一的ROI名称"""
-        existing_names = self._scan_roi_files()
+        """根据ROI索引生成一个唯一的ROI名称"""
+        existing_names = set(self.roi_configs)
         base_name = "ROI"
         counter = 1
         while True:
@@ -241,13 +242,18 @@ class ROIHandler:
             logger.warning(f"ROI名称 '{roi_name}' 已存在，请使用不同的名称")
             return False
         
+        # 校验多边形：拒绝自相交，按配置简化顶点
+        compiled = self._prepare_roi(roi_name, self.current_points)
+        if compiled is None:
+            return False
+        
         # 创建ROI配置
         roi_config = {
             "name": roi_name,
-            "points": self.current_points.copy(),
             "created_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             "last_used": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
+        self._set_roi_geometry(roi_config, compiled)
         
         logger.info(f"保存前ROI数量: {len(self.roi_configs)}")
         logger.info(f"保存前ROI名称: {list(self.roi_configs.keys())}")
@@ -256,6 +262,7 @@ class ROIHandler:
         if self._save_roi_to_file(roi_name, roi_config):
             # 添加到内存配置中
             self.roi_configs[roi_name] = roi_config
+            self._invalidate_compiled(roi_name)
             
             logger.info(f"保存后ROI数量: {len(self.roi_configs)}")
             logger.info(f"保存后ROI名称: {list(self.roi_configs.keys())}")
@@ -267,6 +274,9 @@ class ROIHandler:
             # 保存配置到文件
             self.save_config()
             
+            # 压缩绘制日志：ROI文件落盘后再删除日志，保证任意时刻都可恢复
+            self.writer.flush()
+            
             # 停止绘制模式
             self.stop_drawing()
             
@@ -281,7 +291,11 @@ class ROIHandler:
         if roi_name in self.roi_configs:
             if len(points) > self.max_points:
                 return False
-            self.roi_configs[roi_name]["points"] = points
+            compiled = self._prepare_roi(roi_name, points)
+            if compiled is None:
+                return False
+            self._set_roi_geometry(self.roi_configs[roi_name], compiled)
+            self._invalidate_compiled(roi_name)
             self.roi_configs[roi_name]["last_used"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             if self._save_roi_to_file(roi_name, self.roi_configs[roi_name]):
                 self.save_config()
@@ -289,13 +303,120 @@ class ROIHandler:
         return False
 
     def get_roi_points(self, roi_name: str = None) -> List[List[int]]:
-        """获取ROI点坐标"""
+        """获取ROI点坐标（投影到当前视频源分辨率的像素坐标）"""
+        compiled = self.get_compiled_roi(roi_name)
+        return compiled.to_list() if compiled is not None else []
+
+    def set_frame_size(self, frame_shape: Tuple[int, ...]):
+        """记录当前视频源分辨率，ROI按该分辨率投影"""
+        size = (int(frame_shape[1]), int(frame_shape[0]))
+        if size != self.frame_size:
+            logger.info(f"视频源分辨率变化: {self.frame_size} -> {size}")
+            self.frame_size = size
+
+    @staticmethod
+    def _is_normalized(roi_config: Dict[str, Any]) -> bool:
+        """ROI配置是否为归一化坐标格式"""
+        return "normalized_points" in roi_config and "reference_size" in roi_config
+
+    def _set_roi_geometry(self, roi_config: Dict[str, Any], compiled: CompiledROI):
+        """把当前分辨率下的像素顶点按归一化坐标写入ROI配置，并记录参考分辨率
+
+        视频源未打开时，顶点是按ROI自身参考分辨率投影的坐标（见 get_compiled_roi），按该分辨率归一化。
+        """
+        reference = self.frame_size or roi_config.get("reference_size") or self.legacy_reference_size
+        if reference is None:
+            # 分辨率未知的旧版ROI只能保存像素坐标，不能与归一化坐标并存
+            roi_config.pop("normalized_points", None)
+            roi_config.pop("reference_size", None)
+            roi_config["points"] = compiled.to_list()
+            return
+        reference = tuple(reference)
+        roi_config.pop("points", None)
+        roi_config["version"] = 2
+        roi_config["reference_size"] = list(reference)
+        roi_config["normalized_points"] = normalize_points(compiled.points, reference)
+
+    def _migrate_roi(self, roi_name: str, roi_config: Dict[str, Any]) -> bool:
+        """按 legacy_reference_size 把旧版绝对像素坐标的ROI迁移为归一化坐标并保存
+
+        未指定时不迁移：首个打开的视频源不一定是绘制时的分辨率，按它迁移会把错误的多边形永久写入文件。
+        """
+        reference = self.legacy_reference_size
+        if reference is None:
+            return False
+        roi_config["version"] = 2
+        roi_config["reference_size"] = list(reference)
+        roi_config["normalized_points"] = normalize_points(roi_config.pop("points", []), reference)
+        logger.info(f"ROI '{roi_name}' 已迁移为归一化坐标，参考分辨率: {tuple(reference)}")
+        self._save_roi_to_file(roi_name, roi_config)
+        return True
+
+    def _prepare_roi(self, roi_name: str, points: List[List[int]]) -> Optional[CompiledROI]:
+        """编译并校验ROI多边形，自相交或面积为0时返回None"""
+        compiled = CompiledROI(roi_name, points)
+        if self.simplify_max_points and len(compiled) > self.simplify_max_points:
+            simplified = compiled.simplify(self.simplify_max_points)
+            logger.info(f"ROI '{roi_name}' 顶点简化: {len(compiled)} -> {len(simplified)}")
+            compiled = simplified
+        if not compiled.is_simple:
+            logger.warning(f"ROI '{roi_name}' 多边形自相交，无法保存")
+            return None
+        if not compiled.is_valid():
+            logger.warning(f"ROI '{roi_name}' 多边形无效（顶点不足或面积为0）")
+            return None
+        return compiled
+
+    def get_compiled_roi(self, roi_name: str = None, frame_shape: Tuple[int, ...] = None) -> Optional[CompiledROI]:
+        """获取投影到指定帧尺寸的编译ROI几何对象
+
+        每个ROI在每种分辨率下只投影、构建一次，供推理过滤和叠加显示共享；
+        frame_shape 为空时使用当前视频源分辨率，视频源未打开时使用ROI的参考分辨率。
+        """
         if roi_name is None:
             roi_name = self.active_roi
-        
-        if roi_name and roi_name in self.roi_configs:
-            return self.roi_configs[roi_name]["points"]
-        return []
+        if not roi_name or roi_name not in self.roi_configs:
+            return None
+        if frame_shape is not None:
+            size = (int(frame_shape[1]), int(frame_shape[0]))
+        else:
+            size = self.frame_size
+        compiled = self._compiled.get((roi_name, size))
+        if compiled is not None:
+            return compiled
+
+        roi_config = self.roi_configs[roi_name]
+        if not self._is_normalized(roi_config):
+            self._migrate_roi(roi_name, roi_config)
+        if self._is_normalized(roi_config):
+            points = project_points(roi_config["normalized_points"], size or tuple(roi_config["reference_size"]))
+        else:
+            # 参考分辨率未知的旧版ROI，按原像素坐标使用（在当前视频源上编辑保存后转为归一化坐标）
+            points = roi_config.get("points", [])
+            logger.warning(f"ROI '{roi_name}' 为旧版像素坐标且未设置 legacy_reference_size，按原坐标使用")
+        compiled = CompiledROI(roi_name, points)
+        if not compiled.is_simple:
+            logger.warning(f"ROI '{roi_name}' 多边形自相交，检测结果可能不准确")
+        self._compiled[(roi_name, size)] = compiled
+        return compiled
+
+    def _invalidate_compiled(self, roi_name: str = None):
+        """清除编译后的ROI几何缓存（所有分辨率）"""
+        if roi_name is None:
+            self._compiled.clear()
+        else:
+            for key in [key for key in self._compiled if key[0] == roi_name]:
+                del self._compiled[key]
+
+    def simplify_roi(self, roi_name: str, max_points: int) -> bool:
+        """用Douglas-Peucker算法把ROI简化到不超过 max_points 个顶点并保存"""
+        compiled = self.get_compiled_roi(roi_name)
+        if compiled is None:
+            return False
+        simplified = compiled.simplify(max_points)
+        if len(simplified) == len(compiled):
+            return True
+        return self.update_roi_points(roi_name, simplified.to_list())
 
     def get_current_points(self) -> List[List[int]]:
         """获取当前正在绘制的点"""
@@ -357,33 +478,26 @@ class ROIHandler:
         if not self.is_roi_enabled():
             return np.ones(frame_shape[:2], dtype=np.uint8) * 255
         
-        mask = np.zeros(frame_shape[:2], dtype=np.uint8)
-        points = self.get_roi_points()
-        
-        if len(points) >= 3:
-            points_array = np.array(points, dtype=np.int32)
-            cv2.fillPoly(mask, [points_array], 255)
-        
-        return mask
+        # 编译对象按帧尺寸缓存掩码（只读），返回副本供调用方修改
+        return self.get_compiled_roi(frame_shape=frame_shape).full_mask(frame_shape).copy()
 
     def is_point_in_roi(self, x: int, y: int) -> bool:
         """判断点是否在ROI内"""
         if not self.is_roi_enabled():
             return True
         
-        points = self.get_roi_points()
-        if len(points) < 3:
+        compiled = self.get_compiled_roi()
+        if len(compiled) < 3:
             return True
         
-        points_array = np.array(points, dtype=np.int32)
-        return cv2.pointPolygonTest(points_array, (x, y), False) >= 0
+        return compiled.contains_point(x, y)
 
     def apply_roi_to_frame(self, frame: np.ndarray) -> np.ndarray:
         """将ROI应用到帧上"""
         if not self.is_roi_enabled():
             return frame
         
-        mask = self.create_roi_mask(frame.shape)
+        mask = self.get_compiled_roi(frame_shape=frame.shape).full_mask(frame.shape)
         return cv2.bitwise_and(frame, frame, mask=mask)
 
     def draw_roi_on_frame(self, frame: np.ndarray, draw_current: bool = True) -> np.ndarray:
@@ -405,15 +519,14 @@ class ROIHandler:
         
         # 绘制激活的ROI
         if self.has_active_roi():
-            points = self.get_roi_points()
-            if len(points) >= 3:
-                points_array = np.array(points, dtype=np.int32)
-                cv2.polylines(result_frame, [points_array], True, (0, 255, 0), 2)
+            compiled = self.get_compiled_roi(frame_shape=frame.shape)
+            if len(compiled) >= 3:
+                cv2.polylines(result_frame, [compiled.points], True, (0, 255, 0), 2)
                 
                 # 绘制顶点
-                for i, point in enumerate(points):
-                    cv2.circle(result_frame, tuple(point), 5, (255, 0, 0), -1)
-                    cv2.putText(result_frame, str(i+1), (point[0]+10, point[1]-10), 
+                for i, (px, py) in enumerate(compiled.points.tolist()):
+                    cv2.circle(result_frame, (px, py), 5, (255, 0, 0), -1)
+                    cv2.putText(result_frame, str(i+1), (px+10, py-10), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
         return result_frame
@@ -433,72 +546,35 @@ class ROIHandler:
         return None
 
     def save_config(self):
-        """保存配置到文件"""
-        if self._saving:
-            logger.warning("正在保存配置，跳过重复保存")
-            return
-            
-        self._saving = True
-        
-        # 添加详细的调试信息
-        logger.info(f"开始保存配置，当前ROI配置: {list(self.roi_configs.keys())}")
-        
+        """保存配置到文件（写回式：标记为脏，由后台线程防抖合并后原子写盘）"""
         config = {
             "roi_settings": {
                 "roi_enabled": self.roi_enabled,
                 "active_roi": self.active_roi
             }
         }
-        
-        try:
-            # 使用临时文件来避免写入过程中的问题
-            config_file = os.path.join(self.roi_folder, "roi_config.json")
-            temp_file = config_file + ".tmp"
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
-                f.flush()  # 确保数据写入磁盘
-                os.fsync(f.fileno())  # 强制同步到磁盘
-            
-            # 如果临时文件写入成功，则替换原文件
-            if os.path.exists(temp_file):
-                if os.path.exists(config_file):
-                    os.remove(config_file)
-                os.rename(temp_file, config_file)
-                logger.info(f"ROI配置已保存，当前ROI数量: {len(self.roi_configs)}")
-                
-                # 验证保存后的文件内容
-                try:
-                    with open(config_file, 'r', encoding='utf-8') as f:
-                        saved_config = json.load(f)
-                    logger.info(f"配置保存成功")
-                except Exception as e:
-                    logger.error(f"验证保存文件失败: {e}")
-            else:
-                logger.error("临时文件创建失败")
-                
-        except Exception as e:
-            logger.error(f"保存ROI配置失败: {e}")
-            # 如果临时文件存在，尝试删除
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-        finally:
-            self._saving = False
+        config_file = os.path.join(self.roi_folder, ROI_CONFIG["main_config_file"])
+        self.writer.schedule(config_file, json.dumps(config, ensure_ascii=False, indent=2))
+
+    def flush(self):
+        """立即把所有待写入的ROI修改落盘"""
+        self.writer.flush()
+
+    def shutdown(self):
+        """程序退出前调用，确保所有ROI修改落盘"""
+        self.writer.close()
+
+    def get_persistence_stats(self) -> Dict[str, int]:
+        """获取ROI持久化的I/O统计（请求次数、实际写盘次数、合并节省次数）"""
+        return self.writer.get_stats()
 
     def load_config(self):
         """从文件加载配置"""
-        # 添加调用栈信息
-        stack_trace = traceback.format_stack()
-        logger.info(f"load_config被调用，调用栈: {stack_trace[-3:]}")  # 只显示最后3层
+        # 先落盘尚未写入的修改，保证读到的是最新配置
+        self.writer.flush()
         
-        if self._saving:
-            logger.warning("正在保存配置，跳过加载")
-            return
-        
-        # 清除临时文件
-        self._clear_temp_roi()
+        # 读取上次未完成的ROI，由界面决定恢复或丢弃
+        self._load_recoverable_drawing()
         
         # 加载主配置文件
         config_file = os.path.join(self.roi_folder, "roi_config.json")
@@ -508,30 +584,18 @@ class ROIHandler:
                     config = json.load(f)
                 
                 roi_settings = config.get("roi_settings", {})
-                old_roi_count = len(self.roi_configs)
-                old_roi_names = list(self.roi_configs.keys())
-                
-                logger.info(f"加载配置前ROI数量: {old_roi_count}, ROI名称: {old_roi_names}")
-                
                 self.roi_enabled = roi_settings.get("roi_enabled", False)
                 self.active_roi = roi_settings.get("active_roi")
                 
             except Exception as e:
                 logger.error(f"加载主配置文件失败: {e}")
         
-        # 扫描并加载所有ROI文件
-        roi_names = self._scan_roi_files()
-        self.roi_configs = {}
-        
-        for roi_name in roi_names:
-            roi_config = self._load_roi_from_file(roi_name)
-            if roi_config:
-                self.roi_configs[roi_name] = roi_config
-        
-        new_roi_count = len(self.roi_configs)
-        new_roi_names = list(self.roi_configs.keys())
-        logger.info(f"ROI配置已加载，ROI数量变化: {old_roi_count} -> {new_roi_count}")
-        logger.info(f"ROI名称变化: {old_roi_names} -> {new_roi_names}")
+        # 增量刷新ROI索引，只有变化的ROI会在下次访问时重新加载
+        old_roi_count = len(self.roi_configs)
+        changed = self.roi_configs.refresh()
+        for name in changed:
+            self._invalidate_compiled(name)
+        logger.info(f"ROI配置已刷新，ROI数量变化: {old_roi_count} -> {len(self.roi_configs)}，变化的ROI: {len(changed)}")
         
         # 验证活动ROI是否仍然存在
         if self.active_roi and self.active_roi not in self.roi_configs:
@@ -549,9 +613,12 @@ class ROIHandler:
     def rename_roi(self, old_name: str, new_name: str) -> bool:
         """重命名ROI"""
         if old_name in self.roi_configs and new_name not in self.roi_configs:
-            # 复制配置，删除旧的
+            # 复制配置，删除旧的（先取消旧文件的后台写入，原因同 clear_current_roi）
+            self.writer.cancel(self._get_roi_file_path(old_name))
             self.roi_configs[new_name] = self.roi_configs.pop(old_name)
             self.roi_configs[new_name]['name'] = new_name
+            self._invalidate_compiled(old_name)
+            self._invalidate_compiled(new_name)
             
             # 如果重命名的是当前激活的ROI，则更新激活名称
             if self.active_roi == old_name:
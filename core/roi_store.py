@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import logging
+import threading
+from collections.abc import MutableMapping
+from typing import Dict, Any, Optional, Set
+
+from config import ROI_CONFIG
+from core.persistence import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+
+def natural_sort_key(name: str):
+    """自然排序键：ROI_2 排在 ROI_10 之前"""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+class ROIStore(MutableMapping):
+    """带索引清单的ROI配置仓库
+
+    清单文件 (roi_index.json) 记录每个ROI文件的名称、mtime和大小。启动时只读取清单并
+    对文件夹做一次stat扫描，按mtime/大小判断变化；ROI文件在首次访问时才解析，
+    发生变化的ROI丢弃缓存后按需重新加载。没有清单时自动从现有 ROI_N.json 文件迁移。
+    索引会被写回线程的 mark_saved 回调修改，所有读写都在 _lock 下进行。
+    """
+
+    def __init__(self, roi_folder: str, writer=None):
+        self.roi_folder = roi_folder
+        self.writer = writer  # 可选的写回式写入器，清单写入交给后台线程
+        self.index_file = os.path.join(roi_folder, ROI_CONFIG["index_file"])
+        self._excluded = {ROI_CONFIG["temp_roi_file"], ROI_CONFIG["main_config_file"], ROI_CONFIG["index_file"]}
+        self._index: Dict[str, Dict[str, Any]] = {}   # ROI名称 -> {"file", "mtime_ns", "size"}
+        self._cache: Dict[str, Dict[str, Any]] = {}   # 已解析的ROI配置
+        self.load_count = 0  # 实际解析ROI文件的次数
+        self._lock = threading.RLock()  # 保护 _index，GUI线程与写回线程共用
+        self._load_index()
+
+    def _load_index(self):
+        """读取索引清单，不存在或损坏时由refresh重建"""
+        if not os.path.exists(self.index_file):
+            logger.info("未找到ROI索引清单，将从现有ROI文件迁移")
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._index = {name: entry for name, entry in data.get("rois", {}).items()}
+        except Exception as e:
+            logger.error(f"读取ROI索引清单失败，将重建: {e}")
+            self._index = {}
+
+    def _save_index(self):
+        """原子写入索引清单"""
+        try:
+            # 在锁内生成快照并调度，保证后调度的清单总是较新的快照
+            with self._lock:
+                text = json.dumps({"version": 1, "rois": dict(self._index)}, ensure_ascii=False, indent=2)
+                if self.writer is not None:
+                    self.writer.schedule(self.index_file, text)
+                else:
+                    atomic_write_text(self.index_file, text, fsync=False)
+        except Exception as e:
+            logger.error(f"保存ROI索引清单失败: {e}")
+
+    def _file_path(self, name: str) -> str:
+        """ROI文件路径"""
+        with self._lock:
+            entry = self._index.get(name)
+        filename = entry["file"] if entry else f"{name}.json"
+        return os.path.join(self.roi_folder, filename)
+
+    @staticmethod
+    def _stat_entry(filename: str, stat: os.stat_result) -> Dict[str, Any]:
+        """由stat结果生成索引条目"""
+        return {"file": filename, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def refresh(self) -> Set[str]:
+        """扫描ROI文件夹，按mtime/大小检测变化，返回新增、修改或删除的ROI名称"""
+        if not os.path.exists(self.roi_folder):
+            return set()
+
+        found = {}
+        try:
+            with os.scandir(self.roi_folder) as entries:
+                for entry in entries:
+                    if not entry.is_file() or not entry.name.endswith(".json") or entry.name in self._excluded:
+                        continue
+                    name = os.path.splitext(entry.name)[0]
+                    found[name] = self._stat_entry(entry.name, entry.stat())
+        except Exception as e:
+            logger.error(f"扫描ROI文件夹失败: {e}")
+            return set()
+
+        changed = set()
+        with self._lock:
+            for name in list(self._index):
+                if name not in found:
+                    changed.add(name)
+                    del self._index[name]
+                    self._cache.pop(name, None)
+            for name in sorted(found, key=natural_sort_key):
+                old = self._index.get(name)
+                new = found[name]
+                if old is None or old.get("mtime_ns") != new["mtime_ns"] or old.get("size") != new["size"]:
+                    changed.add(name)
+                    self._index[name] = new
+                    self._cache.pop(name, None)
+            if changed:
+                self._save_index()
+
+        if changed:
+            logger.info(f"ROI文件变化: {sorted(changed, key=natural_sort_key)}")
+        return changed
+
+    def mark_saved(self, name: str):
+        """ROI文件写入后更新索引中的mtime/大小，避免下次扫描误判为外部修改（在写回线程中调用）"""
+        with self._lock:
+            # 检查与更新在同一把锁内，已删除的ROI不会被重新加回索引
+            if name not in self._index:
+                return
+            path = self._file_path(name)
+            try:
+                self._index[name] = self._stat_entry(os.path.basename(path), os.stat(path))
+            except OSError as e:
+                logger.error(f"更新ROI索引失败 {path}: {e}")
+                return
+            self._save_index()
+
+    def _load(self, name: str) -> Optional[Dict[str, Any]]:
+        """解析单个ROI文件"""
+        path = self._file_path(name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            self.load_count += 1
+            return config
+        except Exception as e:
+            logger.error(f"加载ROI文件失败 {path}: {e}")
+            return None
+
+    def is_loaded(self, name: str) -> bool:
+        """ROI配置是否已解析到内存"""
+        return name in self._cache
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        config = self._cache.get(name)
+        if config is not None:
+            return config
+        if name not in self:
+            raise KeyError(name)
+        config = self._load(name)
+        if config is None:
+            # 文件损坏或已不可读，从索引中移除
+            with self._lock:
+                self._index.pop(name, None)
+                self._save_index()
+            raise KeyError(name)
+        self._cache[name] = config
+        return config
+
+    def __setitem__(self, name: str, config: Dict[str, Any]):
+        self._cache[name] = config
+        with self._lock:
+            if name in self._index:
+                return
+            path = os.path.join(self.roi_folder, f"{name}.json")
+            if os.path.exists(path):
+                self._index[name] = self._stat_entry(f"{name}.json", os.stat(path))
+            else:
+                self._index[name] = {"file": f"{name}.json", "mtime_ns": 0, "size": 0}
+            self._save_index()
+
+    def __delitem__(self, name: str):
+        with self._lock:
+            if name not in self._index:
+                raise KeyError(name)
+            del self._index[name]
+            self._cache.pop(name, None)
+            self._save_index()
+
+    def __contains__(self, name) -> bool:
+        with self._lock:
+            return name in self._index
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._index))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def copy(self) -> Dict[str, Dict[str, Any]]:
+        """返回所有ROI配置的字典副本（会加载全部ROI）"""
+        configs = {}
+        for name in self:
+            try:
+                configs[name] = self[name]
+            except KeyError:
+                continue
+        return configs
@@ -0,0 +1,313 @@
+import os
+import csv
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import SESSION_CONFIG
+from core.detection_utils import empty_detections
+from core.roi_geometry import CompiledROI
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILE = "session.json"
+TIMESTAMP_FILE = "timestamps.csv"
+RESULT_FILE = "results.jsonl"
+
+
+class SessionRecorder:
+    """检测会话录制：原始画面（无损编码）+ 每帧采集时间戳 + 当时的ROI和置信度设置 + 每帧检测结果
+
+    帧循环只做一次帧复制和非阻塞入队，编码和写文件在后台线程完成；队列满时丢弃该帧并计数，
+    丢弃的帧不会出现在时间戳文件中，回放时按实际写入的帧序列重现。
+    """
+
+    def __init__(self, directory: str = None, max_queue: int = None):
+        base = directory or SESSION_CONFIG["dir"]
+        self.path = os.path.join(base, datetime.now().strftime("session_%Y%m%d_%H%M%S"))
+        self._queue = queue.Queue(maxsize=max_queue or SESSION_CONFIG["max_queue"])
+        self._thread = None
+        self._writer = None
+        self._start_time = None
+        self._next_index = 0
+        self.settings: Dict[str, Any] = {}
+        self.written = 0
+        self.dropped = 0
+
+    def start(self, frame_shape: Tuple[int, ...], fps: float, settings: Dict[str, Any]) -> Tuple[bool, str]:
+        """创建会话目录和视频文件，返回 (是否成功, 消息)"""
+        height, width = frame_shape[:2]
+        os.makedirs(self.path, exist_ok=True)
+        video_file = None
+        for codec, ext in ((SESSION_CONFIG["codec"], ".mkv"), (SESSION_CONFIG["fallback_codec"], ".avi")):
+            video_file = "frames" + ext
+            self._writer = cv2.VideoWriter(os.path.join(self.path, video_file), cv2.VideoWriter_fourcc(*codec),
+                                           fps or 30.0, (width, height))
+            if self._writer.isOpened():
+                break
+            logger.warning(f"会话录制不支持编码 {codec}，尝试下一种")
+        else:
+            return False, "无法创建会话视频文件"
+
+        self.settings = dict(settings)
+        meta = {
+            "version": 1,
+            "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "frame_size": [width, height],
+            "fps": fps,
+            "codec": codec,
+            "video": video_file,
+            "settings": self.settings,
+        }
+        with open(os.path.join(self.path, SESSION_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        self._timestamps = open(os.path.join(self.path, TIMESTAMP_FILE), "w", newline="", encoding="utf-8")
+        self._results = open(os.path.join(self.path, RESULT_FILE), "w", encoding="utf-8")
+        csv.writer(self._timestamps).writerow(["index", "offset_seconds"])
+        self._start_time = None
+        self._thread = threading.Thread(target=self._run, name="SessionRecorder", daemon=True)
+        self._thread.start()
+        return True, f"会话录制已开始: {self.path}"
+
+    def add_frame(self, frame: np.ndarray, capture_time: float) -> Optional[int]:
+        """登记一帧原始画面（采集后立即调用），返回帧序号；队列满时丢弃并返回None"""
+        if self._thread is None:
+            return None
+        if self._start_time is None:
+            self._start_time = capture_time
+        try:
+            self._queue.put_nowait(("frame", self._next_index, capture_time - self._start_time, frame.copy()))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        self._next_index += 1
+        return self._next_index - 1
+
+    def add_result(self, index: Optional[int], detections: np.ndarray, latency: float, **settings):
+        """登记该帧的检测结果、处理耗时和当时的设置（置信度、ROI）"""
+        if index is None or self._thread is None:
+            return
+        record = {"index": index, "latency_ms": round(latency * 1000, 3),
+                  "detections": np.round(np.asarray(detections)[:, :6], 2).tolist()}
+        record.update(settings)
+        try:
+            self._queue.put_nowait(("result", record))
+        except queue.Full:
+            pass  # 结果只用于对比，队列满时不阻塞帧循环
+
+    def _run(self):
+        """后台线程：编码写入帧，写时间戳和检测结果"""
+        timestamps = csv.writer(self._timestamps)
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if item[0] == "frame":
+                    _, index, offset, frame = item
+                    self._writer.write(frame)
+                    timestamps.writerow([index, f"{offset:.6f}"])
+                    self.written += 1
+                else:
+                    self._results.write(json.dumps(item[1], ensure_ascii=False) + "\n")
+            except Exception as e:
+                logger.error(f"会话录制写入失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def stop(self) -> Tuple[bool, str]:
+        """写完队列中剩余的帧并关闭文件"""
+        if self._thread is None:
+            return False, "会话录制未开始"
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._writer.release()
+        self._timestamps.close()
+        self._results.close()
+        message = f"会话录制完成: {self.path}（{self.written} 帧"
+        if self.dropped:
+            message += f"，丢弃 {self.dropped} 帧"
+        return True, message + "）"
+
+    def is_recording(self) -> bool:
+        return self._thread is not None
+
+
+def load_session(path: str) -> Dict[str, Any]:
+    """读取会话元数据和每帧时间戳"""
+    with open(os.path.join(path, SESSION_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    indices, offsets = [], []
+    with open(os.path.join(path, TIMESTAMP_FILE), "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            indices.append(int(row["index"]))
+            offsets.append(float(row["offset_seconds"]))
+    meta["indices"] = indices
+    meta["offsets"] = offsets
+    meta["path"] = path
+    return meta
+
+
+def load_results(path: str) -> Dict[int, Dict[str, Any]]:
+    """读取每帧检测结果文件（会话目录或结果文件路径），按帧序号索引"""
+    if os.path.isdir(path):
+        path = os.path.join(path, RESULT_FILE)
+    results = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                dets = np.asarray(record["detections"], dtype=np.float32).reshape(-1, 6)
+                record["detections"] = dets if len(dets) else empty_detections()
+                results[record["index"]] = record
+    return results
+
+
+class RecordedROI:
+    """会话录制时生效的ROI（按录制的顶点重建），回放时代替 ROIHandler 传给 process_frame
+
+    录制后ROI被编辑或删除也不影响回放；录制时未启用ROI则 is_roi_enabled 返回False。
+    """
+
+    def __init__(self, roi: Optional[Dict[str, Any]]):
+        self.compiled = CompiledROI(roi["name"], roi["points"]) if roi else None
+
+    def is_roi_enabled(self) -> bool:
+        return self.compiled is not None
+
+    def get_active_roi_name(self) -> Optional[str]:
+        return self.compiled.name if self.compiled is not None else None
+
+    def get_compiled_roi(self, roi_name: str = None, frame_shape: Tuple[int, ...] = None) -> Optional[CompiledROI]:
+        """录制的顶点已是会话画面的像素坐标，回放帧尺寸相同，直接返回"""
+        return self.compiled
+
+    def differs_from(self, points: List[List[int]]) -> bool:
+        """与当前同名ROI的顶点是否不同（已编辑或已删除）"""
+        return self.compiled is not None and self.compiled.to_list() != [list(map(int, p)) for p in points]
+
+
+class ReplaySource:
+    """会话回放视频源：按录制时的时间间隔（original）或尽可能快（max_speed）输出帧
+
+    get_frame 返回的帧与录制的帧序列完全一致，last_index 为该帧在原会话中的序号，
+    可与原会话的检测结果逐帧对比。
+    """
+
+    def __init__(self, path: str, mode: str = "original"):
+        self.session = load_session(path)
+        self.mode = mode
+        self.cap = cv2.VideoCapture(os.path.join(path, self.session["video"]))
+        self.position = 0
+        self.last_index = -1
+        self.finished = False
+        self._anchor = None   # 回放开始时的 (墙上时间, 录制时间偏移)
+        self.delivered_frames = 0
+        self.effective_fps = 0.0
+        self._window = (time.perf_counter(), 0)
+
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        return self.session["settings"]
+
+    def frame_interval_ms(self) -> float:
+        return 1000.0 / (self.session.get("fps") or 30.0)
+
+    def read(self, image: np.ndarray = None) -> Tuple[Optional[np.ndarray], bool]:
+        """读取下一帧，original 模式下等待到该帧按原始时间应出现的时刻"""
+        if self.finished or self.position >= len(self.session["offsets"]):
+            self.finished = True
+            return None, False
+        ret, frame = self.cap.read(image=image)
+        if not ret:
+            self.finished = True
+            return None, False
+        offset = self.session["offsets"][self.position]
+        if self.mode == "original":
+            now = time.perf_counter()
+            if self._anchor is None:
+                self._anchor = (now, offset)
+            delay = (offset - self._anchor[1]) - (now - self._anchor[0])
+            if delay > 0:
+                time.sleep(delay)
+        self.last_index = self.session["indices"][self.position]
+        self.position += 1
+        self._count_delivered()
+        return frame, True
+
+    def _count_delivered(self):
+        """更新有效帧率统计（每秒计算一次）"""
+        self.delivered_frames += 1
+        start, frames = self._window
+        now = time.perf_counter()
+        if now - start >= 1.0:
+            self.effective_fps = (frames + 1) / (now - start)
+            self._window = (now, 0)
+        else:
+            self._window = (start, frames + 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """回放统计，字段与视频文件播放统计一致"""
+        offsets = self.session["offsets"]
+        return {
+            "mode": self.mode,
+            "nominal_fps": self.session.get("fps") or 0.0,
+            "effective_fps": self.effective_fps,
+            "delivered_frames": self.delivered_frames,
+            "dropped_frames": 0,
+            "position_ms": offsets[self.position - 1] * 1000 if self.position else 0.0,
+            "finished": self.finished,
+        }
+
+    def rewind(self):
+        """回到会话开头"""
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self.position = 0
+        self.last_index = -1
+        self.finished = False
+        self._anchor = None
+
+    def release(self):
+        self.cap.release()
+
+
+def compare_results(reference: Dict[int, Dict[str, Any]], candidate: Dict[int, Dict[str, Any]],
+                    iou_threshold: float = 0.5) -> Dict[str, Any]:
+    """逐帧对比两次运行的检测结果和耗时"""
+    from core.detection_utils import match_detections
+
+    common = sorted(set(reference) & set(candidate))
+    mismatched: List[int] = []
+    matched = total = 0
+    for index in common:
+        ref, cand = reference[index]["detections"], candidate[index]["detections"]
+        truth = np.concatenate([ref[:, 5:6], ref[:, :4]], axis=1)
+        hits = match_detections(cand, truth, iou_threshold)
+        matched += hits
+        total += len(ref)
+        if hits != len(ref) or len(cand) != len(ref):
+            mismatched.append(index)
+
+    def latency_stats(results):
+        values = np.array([results[i]["latency_ms"] for i in common]) if common else np.zeros(1)
+        return float(values.mean()), float(np.percentile(values, 95))
+
+    return {
+        "frames": len(common),
+        "missing": len(set(reference) - set(candidate)),
+        "mismatched_frames": mismatched,
+        "agreement": matched / total if total else 1.0,
+        "reference_latency": latency_stats(reference),
+        "candidate_latency": latency_stats(candidate),
+    }
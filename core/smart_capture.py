@@ -0,0 +1,229 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from config import SMART_CAPTURE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def dhash(frame: np.ndarray, hash_size: int = 8) -> np.ndarray:
+    """差值感知哈希：灰度缩略图相邻像素比较，返回打包后的位数组（uint8）"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return np.packbits(small[:, 1:] > small[:, :-1])
+
+
+def hamming_distances(hashes: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """一组打包哈希（M x B）与目标哈希的汉明距离，查表向量化计算"""
+    return _POPCOUNT[np.bitwise_xor(hashes, target)].sum(axis=1, dtype=np.int32)
+
+
+def ssim(a: np.ndarray, b: np.ndarray) -> float:
+    """两张同尺寸灰度图（float32）的平均结构相似度，高斯窗口 11x11 / sigma 1.5"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a * mu_a
+    var_b = blur(b * b) - mu_b * mu_b
+    cov = blur(a * b) - mu_a * mu_b
+    score = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a * mu_a + mu_b * mu_b + c1) * (var_a + var_b + c2))
+    return float(score.mean())
+
+
+def yolo_label_lines(detections: np.ndarray, frame_shape: Tuple[int, ...]) -> str:
+    """把 N x 6 检测结果（原图像素坐标）转换为YOLO标注文本: class cx cy w h（归一化）"""
+    if len(detections) == 0:
+        return ""
+    h, w = frame_shape[:2]
+    boxes = np.asarray(detections[:, :4], dtype=np.float64)
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w) / w
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h) / h
+    cx, cy = (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2
+    bw, bh = boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+    classes = detections[:, 5].astype(int)
+    return "".join(f"{c} {x:.6f} {y:.6f} {ww:.6f} {hh:.6f}\n"
+                   for c, x, y, ww, hh in zip(classes, cx, cy, bw, bh) if ww > 0 and hh > 0)
+
+
+class SmartCapture:
+    """智能训练数据采集：按最短间隔采样，与最近保留的帧做近重复判断，只保存画面有变化的帧
+
+    去重默认用dHash（与最近 history 个保留帧的汉明距离一次向量化算出），也可改用灰度缩略图SSIM。
+    JPEG/PNG编码和写文件在线程池中完成，待写入帧超过 max_pending 时跳过该帧，不阻塞帧循环。
+    提供检测函数时只对保留的帧推理，并在图像旁写同名YOLO标注文件，供人工修正。
+    """
+
+    def __init__(self, directory: str = None, method: str = None, image_format: str = None,
+                 write_labels: bool = None, config: Dict[str, Any] = None):
+        self.config = dict(SMART_CAPTURE_CONFIG, **(config or {}))
+        self.method = method or self.config["method"]
+        self.image_format = (image_format or self.config["image_format"]).lower().lstrip(".")
+        self.write_labels = self.config["write_labels"] if write_labels is None else write_labels
+        base = directory or "training_data"
+        self.path = os.path.join(base, datetime.now().strftime("capture_%Y%m%d_%H%M%S"))
+        self.image_dir = os.path.join(self.path, "images")
+        self.label_dir = os.path.join(self.path, "labels")
+
+        history = self.config["history"]
+        hash_bytes = (self.config["hash_size"] ** 2 + 7) // 8
+        self._hashes = np.zeros((history, hash_bytes), dtype=np.uint8)
+        self._thumbs = deque(maxlen=history)
+        self._stored = 0              # 环形缓冲区中有效哈希数量
+        self._slot = 0
+        self._last_sample = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._events = deque()        # 统计窗口内的 (时间, 是否保留)
+        self.kept = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def start(self, class_names: Optional[Sequence[str]] = None) -> Tuple[bool, str]:
+        """创建采集目录并启动写入线程池，返回 (是否成功, 消息)"""
+        if self.image_format not in ("jpg", "jpeg", "png"):
+            return False, f"不支持的图像格式: {self.image_format}"
+        try:
+            os.makedirs(self.image_dir, exist_ok=True)
+            if self.write_labels:
+                os.makedirs(self.label_dir, exist_ok=True)
+                if class_names:
+                    with open(os.path.join(self.path, "classes.txt"), "w", encoding="utf-8") as f:
+                        f.write("\n".join(class_names) + "\n")
+        except OSError as e:
+            return False, f"无法创建采集目录: {e}"
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.config["workers"]),
+                                            thread_name_prefix="SmartCapture")
+        return True, f"智能采集已开始: {self.path}"
+
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def _is_duplicate(self, frame: np.ndarray) -> Tuple[bool, Any]:
+        """与最近保留的帧比较，返回 (是否重复, 该帧的特征)"""
+        if self.method == "ssim":
+            size = self.config["ssim_size"]
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+            thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+            # 从最新的保留帧开始比较，镜头静止时通常第一次就命中
+            for kept in reversed(self._thumbs):
+                if ssim(thumb, kept) >= self.config["ssim_threshold"]:
+                    return True, thumb
+            return False, thumb
+        signature = dhash(frame, self.config["hash_size"])
+        if self._stored:
+            distances = hamming_distances(self._hashes[:self._stored], signature)
+            if int(distances.min()) <= self.config["hash_threshold"]:
+                return True, signature
+        return False, signature
+
+    def _remember(self, signature):
+        """把保留帧的特征放入环形缓冲区"""
+        if self.method == "ssim":
+            self._thumbs.append(signature)
+            return
+        self._hashes[self._slot] = signature
+        self._slot = (self._slot + 1) % len(self._hashes)
+        self._stored = min(self._stored + 1, len(self._hashes))
+
+    def offer(self, frame: np.ndarray, detect: Callable[[np.ndarray], np.ndarray] = None,
+              now: float = None) -> bool:
+        """提交一帧，返回是否保留；detect 为可选检测函数，只对保留的帧调用"""
+        if self._executor is None:
+            return False
+        now = time.monotonic() if now is None else now
+        if self._last_sample is not None and now - self._last_sample < self.config["min_interval"]:
+            return False
+        self._last_sample = now
+
+        duplicate, signature = self._is_duplicate(frame)
+        if duplicate:
+            self.skipped += 1
+            self._record_event(now, False)
+            return False
+        with self._lock:
+            if self._pending >= self.config["max_pending"]:
+                self.dropped += 1
+                return False
+            self._pending += 1
+
+        detections = detect(frame) if detect is not None and self.write_labels else None
+        self._remember(signature)
+        self.kept += 1
+        self._record_event(now, True)
+        stem = f"frame_{self.kept:06d}"
+        # 采集缓冲区会被下一帧覆盖，提交前复制
+        self._executor.submit(self._write, frame.copy(), detections, stem)
+        return True
+
+    def _write(self, frame: np.ndarray, detections: Optional[np.ndarray], stem: str):
+        """线程池任务：编码写入图像和标注文件"""
+        try:
+            ext = "jpg" if self.image_format == "jpeg" else self.image_format
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.config["jpeg_quality"]] if ext == "jpg" else []
+            if not cv2.imwrite(os.path.join(self.image_dir, f"{stem}.{ext}"), frame, params):
+                raise OSError("图像编码失败")
+            if detections is not None:
+                with open(os.path.join(self.label_dir, f"{stem}.txt"), "w", encoding="utf-8") as f:
+                    f.write(yolo_label_lines(detections, frame.shape))
+            with self._lock:
+                self.written += 1
+        except Exception as e:
+            logger.error(f"训练数据写入失败 {stem}: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record_event(self, now: float, kept: bool):
+        self._events.append((now, kept))
+        self._trim_events(now)
+
+    def _trim_events(self, now: float):
+        window = self.config["stats_window"]
+        while self._events and now - self._events[0][0] > window:
+            self._events.popleft()
+
+    def get_stats(self, now: float = None) -> Dict[str, Any]:
+        """采集统计：累计保留/跳过/丢弃/已写入数量，以及统计窗口内折算的每分钟保留和跳过帧数"""
+        now = time.monotonic() if now is None else now
+        self._trim_events(now)
+        kept_recent = sum(1 for _, kept in self._events if kept)
+        scale = 60.0 / self.config["stats_window"]
+        return {
+            "kept": self.kept,
+            "skipped": self.skipped,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "pending": self._pending,
+            "kept_per_minute": kept_recent * scale,
+            "skipped_per_minute": (len(self._events) - kept_recent) * scale,
+        }
+
+    def stop(self) -> Tuple[bool, str]:
+        """等待剩余图像写完并关闭线程池"""
+        if self._executor is None:
+            return False, "智能采集未开始"
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        message = f"智能采集完成: {self.path}（保留 {self.written} 帧，跳过重复 {self.skipped} 帧"
+        if self.dropped:
+            message += f"，写入繁忙跳过 {self.dropped} 帧"
+        if self.failed:
+            message += f"，写入失败 {self.failed} 帧"
+        return True, message + "）"
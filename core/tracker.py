@@ -0,0 +1,254 @@
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import TRACKING_CONFIG
+
+
+def overlap_pairs(boxes_a: np.ndarray, boxes_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """只对x方向可能重叠的框对计算IoU，返回 (行索引, 列索引, IoU)
+
+    boxes_b 按x1排序后用二分查找确定每个框的候选区间，目标分散时候选对数远小于 N x M，
+    轨迹数较多时比完整IoU矩阵快一个数量级。
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    order = np.argsort(boxes_b[:, 0], kind="stable")
+    sorted_x1 = boxes_b[order, 0]
+    max_width = float((boxes_b[:, 2] - boxes_b[:, 0]).max())
+    lo = np.searchsorted(sorted_x1, boxes_a[:, 0] - max_width, side="right")
+    hi = np.searchsorted(sorted_x1, boxes_a[:, 2], side="left")
+    counts = np.maximum(hi - lo, 0)
+    rows = np.repeat(np.arange(len(boxes_a)), counts)
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = order[np.repeat(lo, counts) + offsets]
+
+    a, b = boxes_a[rows], boxes_b[cols]
+    inter = (np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None) *
+             np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None))
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter
+    iou = np.where(union > 0, inter / np.maximum(union, 1e-9), 0).astype(np.float32)
+    return rows, cols, iou
+
+
+def greedy_match(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray,
+                 threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """按IoU从高到低一对一匹配候选对，返回 (行索引, 列索引)
+
+    先向量化地取出互为最佳的行列对（目标不拥挤时几乎覆盖全部匹配），
+    剩余少量冲突再按IoU降序贪心处理。
+    """
+    keep = scores >= threshold
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+    if len(rows) == 0:
+        return rows, cols
+    order = np.argsort(-scores, kind="stable")
+    rows, cols = rows[order], cols[order]
+    # 排序后每行、每列第一次出现的候选即为其最佳匹配
+    row_best = np.zeros(len(rows), dtype=bool)
+    col_best = np.zeros(len(rows), dtype=bool)
+    row_best[np.unique(rows, return_index=True)[1]] = True
+    col_best[np.unique(cols, return_index=True)[1]] = True
+    mutual = row_best & col_best
+    match_rows, match_cols = rows[mutual], cols[mutual]
+
+    used_rows, used_cols = set(match_rows.tolist()), set(match_cols.tolist())
+    rest = np.flatnonzero(~mutual & ~np.isin(rows, match_rows) & ~np.isin(cols, match_cols))
+    if len(rest):
+        extra_r, extra_c = [], []
+        for r, c in zip(rows[rest].tolist(), cols[rest].tolist()):
+            if r not in used_rows and c not in used_cols:
+                used_rows.add(r)
+                used_cols.add(c)
+                extra_r.append(r)
+                extra_c.append(c)
+        match_rows = np.concatenate([match_rows, np.asarray(extra_r, dtype=np.int64)])
+        match_cols = np.concatenate([match_cols, np.asarray(extra_c, dtype=np.int64)])
+    return match_rows, match_cols
+
+
+class ObjectTracker:
+    """ByteTrack风格的多目标跟踪器（仅CPU）
+
+    所有轨迹状态保存在numpy数组中，按匀速模型预测框位置，对可能重叠的框对向量化计算IoU并关联：
+    先匹配高分检测，剩余轨迹再匹配低分检测；未匹配的高分检测新建轨迹，
+    连续 min_hits 帧匹配成功后确认并分配稳定ID，超过 max_age 帧未匹配的轨迹删除。
+    """
+
+    def __init__(self, match_iou=None, high_threshold=None, min_hits=None, max_age=None, max_tracks=None):
+        self.match_iou = TRACKING_CONFIG["match_iou"] if match_iou is None else match_iou
+        self.high_threshold = TRACKING_CONFIG["high_threshold"] if high_threshold is None else high_threshold
+        self.min_hits = min_hits or TRACKING_CONFIG["min_hits"]
+        self.max_age = TRACKING_CONFIG["max_age"] if max_age is None else max_age
+        self.max_tracks = max_tracks or TRACKING_CONFIG["max_tracks"]
+        self.next_id = 1
+        self.newly_confirmed: List[int] = []  # 最近一次 update 中新确认的轨迹ID
+        self._clear()
+
+    def _clear(self):
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.classes = np.zeros(0, dtype=np.float32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.misses = np.zeros(0, dtype=np.int32)   # 连续未匹配的帧数
+        self.ids = np.zeros(0, dtype=np.int64)      # 未确认的轨迹为 -1
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _associate(self, predicted: np.ndarray, track_index: np.ndarray,
+                   dets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """把检测结果关联到指定轨迹（同类别才匹配），返回 (轨迹索引, 检测索引)"""
+        if len(track_index) == 0 or len(dets) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        rows, cols, iou = overlap_pairs(predicted[track_index], dets[:, :4])
+        iou[self.classes[track_index][rows] != dets[cols, 5]] = 0
+        rows, cols = greedy_match(rows, cols, iou, self.match_iou)
+        return track_index[rows], cols
+
+    def update(self, detections: np.ndarray) -> np.ndarray:
+        """输入一帧 N x 6 检测结果，返回 N x 7 数组，最后一列为轨迹ID（未确认为 -1）"""
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        track_ids = np.full(len(detections), -1, dtype=np.int64)
+        previous = self.boxes
+        predicted = previous + self.velocity
+        all_tracks = np.arange(len(self))
+
+        # 第一阶段：高分检测与全部轨迹匹配
+        high = np.flatnonzero(detections[:, 4] >= self.high_threshold)
+        low = np.flatnonzero(detections[:, 4] < self.high_threshold)
+        matched_t, matched_d = self._associate(predicted, all_tracks, detections[high])
+        matched_d = high[matched_d]
+
+        # 第二阶段：低分检测只用于延续剩余轨迹，不新建轨迹
+        remaining = np.setdiff1d(all_tracks, matched_t, assume_unique=True)
+        low_t, low_d = self._associate(predicted, remaining, detections[low])
+        matched_t = np.concatenate([matched_t, low_t])
+        matched_d = np.concatenate([matched_d, low[low_d]])
+
+        # 已匹配轨迹：更新位置并平滑速度
+        self.boxes = predicted
+        if len(matched_t):
+            new_boxes = detections[matched_d, :4]
+            self.velocity[matched_t] = 0.5 * self.velocity[matched_t] + 0.5 * (new_boxes - previous[matched_t])
+            self.boxes[matched_t] = new_boxes
+            self.scores[matched_t] = detections[matched_d, 4]
+            self.hits[matched_t] += 1
+        self.misses += 1
+        self.misses[matched_t] = 0
+        # 未匹配的轨迹按衰减后的速度继续滑行
+        unmatched = np.ones(len(self), dtype=bool)
+        unmatched[matched_t] = False
+        self.velocity[unmatched] *= 0.5
+
+        # 新确认的轨迹分配ID
+        confirm = (self.ids < 0) & (self.hits >= self.min_hits)
+        count = int(confirm.sum())
+        self.ids[confirm] = np.arange(self.next_id, self.next_id + count)
+        self.newly_confirmed = self.ids[confirm].tolist()
+        self.next_id += count
+        track_ids[matched_d] = self.ids[matched_t]
+
+        # 未匹配的高分检测新建轨迹
+        new = np.setdiff1d(high, matched_d, assume_unique=True)
+        if len(new):
+            self.boxes = np.concatenate([self.boxes, detections[new, :4]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 4), dtype=np.float32)])
+            self.scores = np.concatenate([self.scores, detections[new, 4]])
+            self.classes = np.concatenate([self.classes, detections[new, 5]])
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int32)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new), dtype=np.int32)])
+            self.ids = np.concatenate([self.ids, np.full(len(new), -1, dtype=np.int64)])
+            if self.min_hits <= 1:
+                ids = np.arange(self.next_id, self.next_id + len(new))
+                self.ids[-len(new):] = ids
+                track_ids[new] = ids
+                self.newly_confirmed.extend(ids.tolist())
+                self.next_id += len(new)
+
+        # 删除过期轨迹；超过容量时优先保留最近匹配过的轨迹
+        keep = self.misses <= self.max_age
+        if keep.sum() > self.max_tracks:
+            order = np.lexsort((-self.hits, self.misses))
+            keep = np.zeros(len(self), dtype=bool)
+            keep[order[:self.max_tracks]] = True
+        if not keep.all():
+            self._select(keep)
+
+        return np.concatenate([detections, track_ids[:, None].astype(np.float32)], axis=1)
+
+    def _select(self, keep: np.ndarray):
+        for name in ("boxes", "velocity", "scores", "classes", "hits", "misses", "ids"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def reset(self):
+        """清除所有轨迹（ID继续递增，不会与之前的目标重复）"""
+        self._clear()
+        self.newly_confirmed = []
+
+
+class TrackingManager:
+    """按ROI分别跟踪，并统计时间窗口内出现的不同目标数量"""
+
+    def __init__(self, window_seconds=None, max_events=None):
+        self.window_seconds = window_seconds or TRACKING_CONFIG["count_window_seconds"]
+        self.max_events = max_events or TRACKING_CONFIG["max_events"]
+        self._trackers: Dict[Optional[str], ObjectTracker] = {}
+        self._events: Dict[Optional[str], deque] = {}   # ROI -> 新目标确认时间，长度有上限
+        self.totals: Dict[Optional[str], int] = {}
+
+    def update(self, roi_name: Optional[str], detections: np.ndarray, now: float = None) -> np.ndarray:
+        """跟踪一帧检测结果，返回带轨迹ID的 N x 7 数组"""
+        tracker = self._trackers.get(roi_name)
+        if tracker is None:
+            tracker = ObjectTracker()
+            self._trackers[roi_name] = tracker
+            self._events[roi_name] = deque(maxlen=self.max_events)
+        tracked = tracker.update(detections)
+        if tracker.newly_confirmed:
+            now = time.monotonic() if now is None else now
+            self._events[roi_name].extend([now] * len(tracker.newly_confirmed))
+            self.totals[roi_name] = self.totals.get(roi_name, 0) + len(tracker.newly_confirmed)
+        return tracked
+
+    def newly_confirmed(self, roi_name: Optional[str]) -> List[int]:
+        """最近一帧中新确认的目标ID"""
+        tracker = self._trackers.get(roi_name)
+        return tracker.newly_confirmed if tracker else []
+
+    def unique_count(self, roi_name: Optional[str], window_seconds: float = None, now: float = None) -> int:
+        """时间窗口内新出现的不同目标数量（窗口最长为 count_window_seconds）"""
+        events = self._events.get(roi_name)
+        if not events:
+            return 0
+        now = time.monotonic() if now is None else now
+        oldest = now - self.window_seconds
+        while events and events[0] < oldest:
+            events.popleft()  # 超出统计窗口的记录不再保留
+        since = now - min(window_seconds or self.window_seconds, self.window_seconds)
+        count = 0
+        for t in reversed(events):
+            if t < since:
+                break
+            count += 1
+        return count
+
+    def active_tracks(self, roi_name: Optional[str]) -> int:
+        """当前跟踪中的轨迹数"""
+        tracker = self._trackers.get(roi_name)
+        return len(tracker) if tracker else 0
+
+    def reset(self, roi_name: Optional[str] = None):
+        """清除跟踪状态（ROI修改、删除或停止检测时调用）"""
+        if roi_name is None:
+            self._trackers.clear()
+            self._events.clear()
+            self.totals.clear()
+        else:
+            self._trackers.pop(roi_name, None)
+            self._events.pop(roi_name, None)
+            self.totals.pop(roi_name, None)
@@ -4,6 +4,142 @@ import platform
 import os
 from datetime import datetime
 
+from config import PLAYBACK_CONFIG, SESSION_CONFIG, VIRTUAL_CAMERA_CONFIG
+from core.detection_cache import compute_file_digest
+from core.frame_pool import FrameBufferPool
+from core.session_replay import ReplaySource
+from core.virtual_camera import VirtualCamera
+
+
+class PlaybackClock:
+    """视频文件播放时钟，按帧时间戳(CAP_PROP_POS_MSEC)控制播放节奏"""
+
+    def __init__(self, mode=None, loop=None):
+        self.mode = mode or PLAYBACK_CONFIG["mode"]
+        self.loop = PLAYBACK_CONFIG["loop"] if loop is None else loop
+        self.max_drop_per_read = PLAYBACK_CONFIG["max_drop_per_read"]
+        self.resync_gap = PLAYBACK_CONFIG["resync_gap"]
+        self.stats_window = PLAYBACK_CONFIG["stats_window"]
+        self.nominal_fps = 0.0
+        self.reset()
+
+    def reset(self):
+        """重置时钟（打开新视频或回到开头时调用）"""
+        self.anchor_wall = None   # 对齐时刻的墙上时间
+        self.anchor_pts = 0.0     # 对齐时刻的帧时间戳(ms)
+        self.last_pts = None
+        self.last_wall = None
+        self.last_frame_index = -1
+        self.finished = False
+        self.delivered_frames = 0
+        self.dropped_frames = 0
+        self.effective_fps = 0.0
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+
+    def set_nominal_fps(self, fps):
+        """设置视频标称帧率"""
+        self.nominal_fps = fps if fps and fps > 0 else 0.0
+
+    def frame_interval_ms(self):
+        """标称帧间隔(ms)，未知帧率时按30FPS估计"""
+        return 1000.0 / (self.nominal_fps or 30.0)
+
+    def timer_interval(self, default_interval):
+        """根据播放模式给出UI定时器间隔(ms)"""
+        if self.mode == "max_speed":
+            return 0
+        return max(1, min(default_interval, int(self.frame_interval_ms() // 2)))
+
+    def _frame_pts(self, cap):
+        """读取当前帧时间戳，部分后端不提供时按帧序号推算"""
+        pts = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if pts <= 0:
+            pos_frames = cap.get(cv2.CAP_PROP_POS_FRAMES)
+            if pos_frames > 1:
+                pts = (pos_frames - 1) * self.frame_interval_ms()
+        return pts
+
+    def _grab(self, cap):
+        """抓取下一帧（不解码），到达结尾时按设置循环"""
+        if cap.grab():
+            return True
+        if not self.loop:
+            self.finished = True
+            return False
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self.anchor_wall = None
+        self.last_pts = None
+        return cap.grab()
+
+    def read(self, cap, image=None):
+        """按播放模式读取下一帧，返回 (frame, ret)；image 为复用的解码缓冲区"""
+        if self.finished:
+            return None, False
+
+        now = time.perf_counter()
+        # 长时间未读取（暂停、编辑ROI等）时重新对齐，避免恢复后集中丢帧
+        if self.last_wall is not None and now - self.last_wall > self.resync_gap:
+            self.anchor_wall = None
+
+        if not self._grab(cap):
+            return None, False
+        pts = self._frame_pts(cap)
+
+        if self.mode == "realtime" and self.anchor_wall is not None:
+            frame_ms = self.frame_interval_ms()
+            media_now = self.anchor_pts + (now - self.anchor_wall) * 1000.0
+            # 落后一整帧以上时直接跳过（grab不解码，代价很小）
+            dropped = 0
+            while pts + frame_ms <= media_now and dropped < self.max_drop_per_read:
+                if not self._grab(cap):
+                    return None, False
+                pts = self._frame_pts(cap)
+                dropped += 1
+                if self.anchor_wall is None:
+                    break  # 循环回到开头，重新对齐
+            self.dropped_frames += dropped
+            # 超前时等待到该帧的显示时刻（最多一个帧间隔）
+            if self.anchor_wall is not None:
+                ahead_ms = pts - (self.anchor_pts + (time.perf_counter() - self.anchor_wall) * 1000.0)
+                if ahead_ms > 0:
+                    time.sleep(min(ahead_ms, frame_ms) / 1000.0)
+
+        ret, frame = cap.retrieve(image=image)
+        if not ret:
+            return None, False
+        self.last_frame_index = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+
+        if self.anchor_wall is None:
+            self.anchor_wall = time.perf_counter()
+            self.anchor_pts = pts
+        self.last_pts = pts
+        self.last_wall = time.perf_counter()
+        self._count_delivered()
+        return frame, True
+
+    def _count_delivered(self):
+        """更新有效帧率统计"""
+        self.delivered_frames += 1
+        self._window_frames += 1
+        elapsed = self.last_wall - self._window_start
+        if elapsed >= self.stats_window:
+            self.effective_fps = self._window_frames / elapsed
+            self._window_frames = 0
+            self._window_start = self.last_wall
+
+    def get_stats(self):
+        """获取播放统计信息"""
+        return {
+            "mode": self.mode,
+            "nominal_fps": self.nominal_fps,
+            "effective_fps": self.effective_fps,
+            "delivered_frames": self.delivered_frames,
+            "dropped_frames": self.dropped_frames,
+            "position_ms": self.last_pts or 0.0,
+            "finished": self.finished
+        }
+
 
 class VideoHandler:
     def __init__(self):
@@ -12,6 +148,10 @@ class VideoHandler:
         self.recording = False
         self.record_path = ""
         self.camera_index = None
+        self.source_id = None  # 视频文件内容摘要，用于检测结果缓存
+        self.playback_clock = PlaybackClock()
+        self.buffer_pool = FrameBufferPool()  # 采集及后续合成复用的帧缓冲区
+        self.replay = None  # 会话回放源
         
         # FPS计算相关
         self.frame_count = 0
@@ -19,7 +159,9 @@ class VideoHandler:
         self.last_time = time.time()
 
     def open_camera(self, camera_index=0):
-        """打开摄像头"""
+        """打开摄像头（配置了虚拟摄像头源时打开虚拟摄像头）"""
+        if VIRTUAL_CAMERA_CONFIG["source"]:
+            return self.open_virtual_camera(VIRTUAL_CAMERA_CONFIG["source"])
         self.release()
         self.camera_index = camera_index
         
@@ -37,34 +179,134 @@ class VideoHandler:
         # 如果首选API失败，则尝试使用默认API
         if not self.cap.isOpened():
             self.cap = cv2.VideoCapture(camera_index)
-            
+
+        self._configure_buffers()
         return self.cap.isOpened()
 
+    def open_virtual_camera(self, source, fps=None, config=None):
+        """打开虚拟摄像头：按固定帧率实时回放视频文件或图像文件夹，按实时摄像头处理（丢帧、延迟、断开）"""
+        self.release()
+        camera = VirtualCamera(source, fps, config)
+        if not camera.open():
+            camera.release()
+            return False
+        self.cap = camera
+        self.camera_index = f"virtual:{source}"  # 非None: 走摄像头读取路径
+        self._configure_buffers()
+        return True
+
+    def is_virtual_camera(self):
+        """当前视频源是否为虚拟摄像头"""
+        return isinstance(self.cap, VirtualCamera)
+
     def open_video(self, video_path):
         """打开视频文件"""
         self.release()
         self.camera_index = None
         self.cap = cv2.VideoCapture(video_path)
+        self.playback_clock.reset()
+        if self.cap.isOpened():
+            self.playback_clock.set_nominal_fps(self.cap.get(cv2.CAP_PROP_FPS))
+            try:
+                self.source_id = compute_file_digest(video_path)
+            except OSError:
+                self.source_id = None
+            self._configure_buffers()
         return self.cap.isOpened()
 
+    def open_replay(self, session_path, mode=None):
+        """打开录制的检测会话进行回放（original: 按原始时间间隔; max_speed: 尽可能快）"""
+        self.release()
+        self.camera_index = None
+        try:
+            replay = ReplaySource(session_path, mode or SESSION_CONFIG["replay_mode"])
+        except (OSError, ValueError, KeyError):
+            return False
+        if not replay.is_opened():
+            replay.release()
+            return False
+        self.replay = replay
+        self.cap = replay.cap
+        self._configure_buffers()
+        return True
+
+    def is_replay(self):
+        """当前视频源是否为会话回放"""
+        return self.replay is not None
+
+    def _configure_buffers(self):
+        """按视频源分辨率预分配采集缓冲区"""
+        if self.cap is not None and self.cap.isOpened():
+            self.buffer_pool.configure(int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                       int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def rewind(self):
+        """视频文件回到开头"""
+        if self.replay is not None:
+            self.replay.rewind()
+        elif self.cap is not None and self.camera_index is None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.playback_clock.reset()
+
+    def set_playback_mode(self, mode=None, loop=None):
+        """设置视频文件播放模式（realtime/max_speed）及是否循环"""
+        if mode is not None:
+            self.playback_clock.mode = mode
+        if loop is not None:
+            self.playback_clock.loop = loop
+        self.playback_clock.anchor_wall = None
+
+    def is_file_source(self):
+        """当前视频源是否为视频文件"""
+        return self.cap is not None and self.camera_index is None
+
+    def is_playback_finished(self):
+        """视频文件是否已播放结束（仅非循环模式），会话回放到结尾时也返回True"""
+        if self.replay is not None:
+            return self.replay.finished
+        return self.is_file_source() and self.playback_clock.finished
+
+    def get_playback_stats(self):
+        """获取视频文件播放统计（有效帧率/标称帧率/丢帧数）"""
+        if self.replay is not None:
+            return self.replay.get_stats()
+        return self.playback_clock.get_stats()
+
+    def get_frame_id(self):
+        """获取最近读取帧的标识 (视频内容摘要, 帧序号)，摄像头和会话回放返回None（回放需要实际推理）"""
+        if not self.is_file_source() or self.source_id is None or self.replay is not None:
+            return None
+        return self.source_id, self.playback_clock.last_frame_index
+
+    def get_timer_interval(self, default_interval):
+        """获取适合当前视频源的UI定时器间隔(ms)"""
+        if self.replay is not None:
+            if self.replay.mode == "max_speed":
+                return 0
+            return max(1, min(default_interval, int(self.replay.frame_interval_ms() // 2)))
+        if self.is_file_source():
+            return self.playback_clock.timer_interval(default_interval)
+        return default_interval
+
     def get_frame(self):
         """获取当前帧"""
         if self.cap is None or not self.cap.isOpened():
             return None, False
 
-        ret, frame = self.cap.read()
+        buffer = self.buffer_pool.capture_buffer()
+        if self.replay is not None:
+            # 会话回放按录制时的帧间隔或最快速度输出
+            frame, ret = self.replay.read(buffer)
+        elif self.camera_index is None:
+            # 视频文件按时间戳控制播放节奏，结尾处循环或结束
+            frame, ret = self.playback_clock.read(self.cap, buffer)
+        else:
+            ret, frame = self.cap.read(image=buffer)
         if not ret:
-            if self.camera_index is None:
-                # 视频文件结束，重新开始播放
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = self.cap.read()
-                if not ret:
-                    return None, False
-                return frame, ret
-            else:
-                # 摄像头读取失败
-                return None, False
+            # 读取失败
+            return None, False
 
+        self.buffer_pool.commit_capture(frame, buffer)
         return frame, ret
 
     def update_fps_counter(self):
@@ -139,4 +381,7 @@ class VideoHandler:
         if self.cap is not None and self.cap.isOpened():
             self.cap.release()
         self.cap = None
-        self.camera_index = None 
\ No newline at end of file
+        self.camera_index = None
+        self.source_id = None
+        self.replay = None
+        self.buffer_pool.release() 
\ No newline at end of file
@@ -0,0 +1,225 @@
+import os
+import glob
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import VIRTUAL_CAMERA_CONFIG
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class VirtualCamera:
+    """虚拟摄像头：在独立线程中按固定帧率实时回放视频文件或图像文件夹
+
+    接口与 cv2.VideoCapture 一致（isOpened/read/get/release），可直接作为 VideoHandler 的摄像头使用。
+    与实时摄像头相同，只保留最新一帧：读取跟不上时未读的帧被覆盖并计为丢帧，read 阻塞到下一帧产生。
+    可按配置注入出帧抖动、卡顿（期间不出帧）和断开（期间读取失败，之后自动恢复），
+    也可调用 stall()/disconnect() 在指定时刻注入。每个实例有独立的读取线程，可多路同时运行。
+    """
+
+    def __init__(self, source: str, fps: float = None, config: Dict = None):
+        self.config = dict(VIRTUAL_CAMERA_CONFIG, **(config or {}))
+        self.source = source
+        self.fps = fps or self.config["fps"]
+        self._rng = random.Random(self.config["seed"])
+        self._cap = None
+        self._images = None
+        self._position = 0
+        self._size = (0, 0)
+        self._thread = None
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._sequence = 0          # 已产生的帧数（最新帧的序号）
+        self._last_read = 0         # 最近一次读取到的帧序号
+        self._capture_time = 0.0
+        self._stall_until = 0.0
+        self._disconnect_until = 0.0
+        self.ended = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.delivered = 0
+        self.dropped = 0
+        self.read_failures = 0
+        self.stalls = 0
+        self.disconnects = 0
+        self._latencies = deque(maxlen=300)
+        self._started = time.perf_counter()
+
+    def open(self) -> bool:
+        """打开视频文件或图像文件夹并启动出帧线程"""
+        if os.path.isdir(self.source):
+            self._images = sorted(p for p in glob.glob(os.path.join(self.source, "*"))
+                                  if p.lower().endswith(IMAGE_EXTENSIONS))
+            self.fps = self.fps or 30.0
+            first = self._next_source_frame() if self._images else None
+        else:
+            self._cap = cv2.VideoCapture(self.source)
+            if not self._cap.isOpened():
+                return False
+            self.fps = self.fps or self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+            first = self._next_source_frame()
+        if first is None:
+            return False
+        self._size = (first.shape[1], first.shape[0])
+        self._publish(first, time.perf_counter())
+        self._thread = threading.Thread(target=self._run, name=f"VirtualCamera({os.path.basename(self.source)})",
+                                        daemon=True)
+        self._thread.start()
+        return True
+
+    def _next_source_frame(self) -> Optional[np.ndarray]:
+        """读取源的下一帧，结尾处按配置循环；图像尺寸统一为第一帧的分辨率"""
+        for _ in range(2):
+            if self._images is not None:
+                if self._position >= len(self._images):
+                    if not self.config["loop"]:
+                        return None
+                    self._position = 0
+                frame = cv2.imread(self._images[self._position])
+                self._position += 1
+                if frame is None:
+                    continue
+                if self._size[0] and (frame.shape[1], frame.shape[0]) != self._size:
+                    frame = cv2.resize(frame, self._size)
+                return frame
+            ret, frame = self._cap.read()
+            if ret:
+                return frame
+            if not self.config["loop"]:
+                return None
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return None
+
+    def _publish(self, frame: np.ndarray, capture_time: float):
+        with self._cond:
+            if self._sequence > self._last_read:
+                self.dropped += 1  # 上一帧没有被读取就被覆盖
+            self._frame = frame
+            self._sequence += 1
+            self._capture_time = capture_time
+            self._cond.notify_all()
+
+    def _run(self):
+        """出帧线程：按帧率时间表产生帧，注入抖动、卡顿和断开"""
+        interval = 1.0 / self.fps
+        anchor = time.perf_counter()
+        tick = 1
+        jitter = self.config["jitter_ms"] / 1000.0
+        while not self._stop.is_set():
+            due = anchor + tick * interval + (self._rng.gauss(0.0, jitter) if jitter else 0.0)
+            delay = due - time.perf_counter()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            if self._rng.random() < self.config["stall_probability"]:
+                self.stall(self.config["stall_duration"])
+            if self._rng.random() < self.config["disconnect_probability"]:
+                self.disconnect(self.config["disconnect_duration"])
+            now = time.perf_counter()
+            blocked_until = max(self._stall_until, self._disconnect_until)
+            if now < blocked_until:
+                # 卡顿或断开期间不出帧，时间表上错过的帧直接跳过（与实时设备相同）
+                if self._stop.wait(blocked_until - now):
+                    break
+                now = time.perf_counter()
+            frame = self._next_source_frame()
+            if frame is None:
+                self.ended = True
+                with self._cond:
+                    self._cond.notify_all()
+                break
+            self._publish(frame, now)
+            tick = max(tick + 1, int((now - anchor) / interval) + 1)
+
+    def stall(self, duration: float):
+        """注入一次卡顿：duration 秒内不产生新帧"""
+        self.stalls += 1
+        self._stall_until = max(self._stall_until, time.perf_counter() + duration)
+
+    def disconnect(self, duration: float):
+        """注入一次断开：duration 秒内读取失败，之后自动恢复"""
+        self.disconnects += 1
+        self._disconnect_until = max(self._disconnect_until, time.perf_counter() + duration)
+        logger.info(f"虚拟摄像头断开 {duration:.1f} 秒: {self.source}")
+        with self._cond:
+            self._last_read = self._sequence  # 断开前未读取的帧不再交付
+            self._cond.notify_all()
+
+    def is_connected(self) -> bool:
+        return not self.ended and time.perf_counter() >= self._disconnect_until
+
+    def isOpened(self) -> bool:
+        return self._thread is not None
+
+    def read(self, image: np.ndarray = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """等待并返回比上次读取更新的帧；断开、结束或超时返回 (False, None)"""
+        deadline = time.perf_counter() + self.config["read_timeout"]
+        with self._cond:
+            while self._sequence <= self._last_read:
+                remaining = deadline - time.perf_counter()
+                if not self.is_connected() or remaining <= 0 or self._thread is None:
+                    self.read_failures += 1
+                    return False, None
+                self._cond.wait(remaining)
+            if not self.is_connected():
+                self.read_failures += 1
+                return False, None
+            frame, capture_time = self._frame, self._capture_time
+            self._last_read = self._sequence
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            frame = image
+        self.delivered += 1
+        self._latencies.append(time.perf_counter() - capture_time)
+        return True, frame
+
+    def get(self, prop_id: int) -> float:
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._size[0])
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._size[1])
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def set(self, prop_id: int, value: float) -> bool:
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """出帧/读取统计：实际读取帧率、丢帧、读取失败、卡顿和断开次数、帧延迟（采集到读取）"""
+        elapsed = max(1e-6, time.perf_counter() - self._started)
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return {
+            "nominal_fps": self.fps,
+            "effective_fps": self.delivered / elapsed,
+            "produced": self._sequence,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "read_failures": self.read_failures,
+            "stalls": self.stalls,
+            "disconnects": self.disconnects,
+            "latency_ms": float(latencies.mean()),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+        }
+
+    def release(self):
+        """停止出帧线程并释放视频文件"""
+        self._stop.set()
+        if self._thread is not None:
+            with self._cond:
+                self._cond.notify_all()
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
@@ -66,6 +66,752 @@ def test_video_handler():
         print(f"✗ VideoHandler 测试失败: {e}")
         return False
 
+def test_detection_cache():
+    """测试检测结果缓存的LRU淘汰和磁盘缓存"""
+    try:
+        import tempfile
+        import numpy as np
+        from core.detection_cache import DetectionCache
+
+        dets = np.array([[1, 2, 3, 4, 0.5, 0]], dtype=np.float32)
+        cache = DetectionCache(max_entries=2, disk_dir="")
+        for index in range(3):
+            cache.put(("video", "model", index), dets + index)
+        assert cache.get(("video", "model", 0)) is None
+        assert np.array_equal(cache.get(("video", "model", 2)), dets + 2)
+        assert cache.get_stats() == {"entries": 2, "hits": 1, "misses": 1}
+        print("✓ 内存LRU按帧数淘汰")
+
+        disk_dir = tempfile.mkdtemp()
+        DetectionCache(disk_dir=disk_dir).put(("video", "model", 7), dets)
+        reopened = DetectionCache(disk_dir=disk_dir)
+        assert np.array_equal(reopened.get(("video", "model", 7)), dets)
+        assert reopened.get(("video", "other_model", 7)) is None
+        print("✓ 磁盘缓存跨实例读取，键不同不命中")
+
+        return True
+    except Exception as e:
+        print(f"✗ 检测结果缓存测试失败: {e}")
+        return False
+
+def test_detection_cache_filtering():
+    """测试视频文件缓存路径：调整阈值和切换ROI的推理次数"""
+    try:
+        import numpy as np
+        from config import DETECTION_CACHE_CONFIG
+        from core.detection_cache import DetectionCache
+        from core.detection_utils import filter_detections
+        from core.model_handler import ModelHandler
+        from core.roi_geometry import CompiledROI
+
+        handler = ModelHandler()
+        handler.model_hash = "model"
+        handler.detection_cache = DetectionCache(max_entries=100, disk_dir="")
+        calls = {"full": 0, "region": 0}
+        raw = np.array([[10, 10, 20, 20, 0.3, 0], [110, 10, 120, 20, 0.8, 0]], dtype=np.float32)
+
+        def run_model(images, imgsz=None, conf=None):
+            calls["full"] += 1
+            return [raw.copy()]
+
+        def detect_region(frame, roi_name, roi_points, bbox, conf=None):
+            calls["region"] += 1
+            return raw.copy()
+
+        handler._run_model = run_model
+        handler._detect_region = detect_region
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        left = CompiledROI("left", [[0, 0], [60, 0], [60, 60], [0, 60]])
+        right = CompiledROI("right", [[100, 0], [180, 0], [180, 60], [100, 60]])
+
+        results = [filter_detections(handler.get_raw_detections(frame, ("video", 0), left), conf, region=left)
+                   for conf in (0.2, 0.5, 0.9)]
+        assert [len(r) for r in results] == [1, 0, 0] and calls["full"] == 1
+        print("✓ 调整置信度阈值不重新推理")
+
+        switched = filter_detections(handler.get_raw_detections(frame, ("video", 0), right), 0.5, region=right)
+        assert len(switched) == 1 and calls == {"full": 1, "region": 0}
+        print("✓ 默认整帧缓存：切换ROI只重新过滤")
+
+        original = DETECTION_CACHE_CONFIG["region_inference"]
+        DETECTION_CACHE_CONFIG["region_inference"] = True
+        try:
+            for roi in (left, right, left, right):
+                handler.get_raw_detections(frame, ("video", 1), roi)
+        finally:
+            DETECTION_CACHE_CONFIG["region_inference"] = original
+        assert calls == {"full": 1, "region": 2}
+        print("✓ 按ROI推理：每个不同外接矩形推理一次")
+
+        return True
+    except Exception as e:
+        print(f"✗ 检测缓存过滤测试失败: {e}")
+        return False
+
+def test_detection_utils():
+    """测试检测结果工具函数"""
+    try:
+        import numpy as np
+        from core.detection_utils import nms, match_detections
+
+        dets = np.array([
+            [0, 0, 10, 10, 0.9, 0],
+            [1, 1, 10, 10, 0.8, 0],
+            [0, 0, 10, 10, 0.7, 1],
+            [50, 50, 60, 60, 0.6, 0],
+        ], dtype=np.float32)
+        kept = nms(dets, 0.5)
+        assert len(kept) == 3
+        print("✓ 分类别NMS正确")
+
+        gt = np.array([[0, 0, 0, 10, 10], [1, 50, 50, 60, 60]], dtype=np.float32)
+        assert match_detections(kept, gt, 0.5) == 1
+        print("✓ 检测框匹配正确")
+
+        return True
+    except Exception as e:
+        print(f"✗ 检测工具测试失败: {e}")
+        return False
+
+def test_roi_geometry():
+    """测试编译后的ROI几何对象"""
+    try:
+        import numpy as np
+        from core.roi_geometry import CompiledROI
+
+        roi = CompiledROI("ROI_1", [[10, 10], [110, 10], [110, 60], [10, 60]])
+        assert roi.bbox == (10, 10, 101, 51) and roi.is_convex and roi.is_valid()
+        inside = roi.contains(np.array([[50, 30], [5, 5], [200, 30]]))
+        assert inside.tolist() == [True, False, False]
+        print("✓ 外接矩形与向量化点包含判断正确")
+
+        bowtie = CompiledROI("bowtie", [[0, 0], [100, 100], [100, 0], [0, 100]])
+        assert not bowtie.is_simple and not bowtie.is_valid()
+        print("✓ 自相交多边形检测正确")
+
+        angles = np.linspace(0, 2 * np.pi, 100, endpoint=False)
+        circle = np.stack([200 + 100 * np.cos(angles), 200 + 100 * np.sin(angles)], axis=1)
+        assert len(CompiledROI("circle", circle).simplify(20)) <= 20
+        print("✓ 顶点简化正确")
+
+        return True
+    except Exception as e:
+        print(f"✗ ROI几何测试失败: {e}")
+        return False
+
+def test_roi_reference_size():
+    """测试ROI在未打开视频源时的编辑和旧版像素坐标ROI的处理"""
+    try:
+        import os
+        import json
+        import tempfile
+        from config import ROI_CONFIG
+        from core.roi_handler import ROIHandler
+
+        folder = tempfile.mkdtemp()
+        with open(os.path.join(folder, "ROI_1.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": "ROI_1", "version": 2, "reference_size": [200, 100],
+                       "normalized_points": [[0.1, 0.1], [0.5, 0.1], [0.5, 0.5], [0.1, 0.5]]}, f)
+        legacy = [[10, 10], [50, 10], [50, 40], [10, 40]]
+        with open(os.path.join(folder, "ROI_2.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": "ROI_2", "points": legacy}, f)
+        original, ROI_CONFIG["roi_folder"] = ROI_CONFIG["roi_folder"], folder
+        try:
+            handler = ROIHandler()
+        finally:
+            ROI_CONFIG["roi_folder"] = original
+
+        points = [[40, 20], [120, 20], [120, 80], [40, 80]]
+        assert handler.update_roi_points("ROI_1", points)
+        assert handler.get_roi_points("ROI_1") == points
+        handler.writer.flush()
+        with open(os.path.join(folder, "ROI_1.json"), encoding="utf-8") as f:
+            saved = json.load(f)
+        assert "points" not in saved and saved["reference_size"] == [200, 100]
+        print("✓ 未打开视频源时按ROI参考分辨率保存编辑")
+
+        handler.set_frame_size((480, 640, 3))
+        assert handler.get_roi_points("ROI_2") == legacy
+        handler.writer.flush()
+        with open(os.path.join(folder, "ROI_2.json"), encoding="utf-8") as f:
+            assert json.load(f) == {"name": "ROI_2", "points": legacy}
+        print("✓ 未指定参考分辨率的旧版ROI保留原像素坐标")
+
+        return True
+    except Exception as e:
+        print(f"✗ ROI参考分辨率测试失败: {e}")
+        return False
+
+def test_metrics():
+    """测试指标注册与Prometheus文本输出"""
+    try:
+        from core.metrics import PipelineMetrics
+
+        metrics = PipelineMetrics()
+        metrics.observe_frame(0.002, 0.03, 0.04, "ROI_1", 2)
+        metrics.observe_frame(0.002, 2.0, 2.1, "ROI_1", 1)
+        text = metrics.registry.render()
+        assert 'yolo_detections_total{roi="ROI_1"} 3' in text
+        assert 'yolo_inference_seconds_bucket{le="0.05"} 1' in text
+        assert 'yolo_inference_seconds_bucket{le="+Inf"} 2' in text
+        assert "# TYPE yolo_process_cpu_seconds_total counter" in text
+        assert "yolo_dropped_frames_total 0" in text and "yolo_capture_fps" not in text
+        print("✓ 计数器与直方图输出正确")
+
+        return True
+    except Exception as e:
+        print(f"✗ 指标测试失败: {e}")
+        return False
+
+def test_alert_state_machine():
+    """测试报警状态机的滞回与冷却"""
+    try:
+        from core.alerts import AlertStateMachine
+
+        machine = AlertStateMachine(window_frames=5, trigger_frames=3, clear_frames=4, cooldown=10.0)
+        events = [machine.update("ROI_1", d, now=i) for i, d in enumerate([1, 0, 1, 1, 0, 0])]
+        assert events == [None] * 3 + ["raised", None, None]
+        assert machine.is_active("ROI_1")
+        print("✓ N/M帧滞回触发正确")
+
+        # 已连续2帧无目标，再有2帧无目标（共 clear_frames=4）时解除
+        events = [machine.update("ROI_1", False, now=6 + i) for i in range(2)]
+        assert events == [None, "cleared"] and not machine.is_active("ROI_1")
+        events = [machine.update("ROI_1", True, now=8 + i) for i in range(5)]
+        assert "raised" not in events
+        assert machine.update("ROI_1", True, now=30) == "raised"
+        print("✓ 解除与冷却时间正确")
+
+        return True
+    except Exception as e:
+        print(f"✗ 报警状态机测试失败: {e}")
+        return False
+
+def test_cpu_governor():
+    """测试CPU预算分配"""
+    try:
+        from core.cpu_governor import CPUGovernor
+
+        allocation = CPUGovernor({"total_cores": 4, "opencv": 1, "capture": 1, "encoder": 1}).plan()
+        assert allocation["inference"] == 1 and allocation["total"] == 4
+        allocation = CPUGovernor({"total_cores": 8, "inference": None, "opencv": 2}).plan()
+        assert allocation["inference"] == 4
+        print("✓ 推理线程取剩余核心")
+
+        return True
+    except Exception as e:
+        print(f"✗ CPU预算测试失败: {e}")
+        return False
+
+def test_frame_pool():
+    """测试帧缓冲区池复用"""
+    try:
+        import numpy as np
+        from core.frame_pool import FrameBufferPool
+
+        pool = FrameBufferPool(capture_slots=2, reuse=True)
+        pool.configure(64, 48)
+        first = pool.capture_buffer()
+        pool.commit_capture(first, first)
+        assert first.shape == (48, 64, 3) and pool.capture_buffer() is not first
+        pool.reset_stats()
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        for _ in range(10):
+            result = pool.copy("result", frame)
+            tint = pool.filled("tint", frame.shape, (0, 0, 255))
+        assert pool.get_stats()["allocations"] == 2 and tint[0, 0, 2] == 255
+        print("✓ 临时缓冲区只分配一次")
+
+        assert result.shape == frame.shape
+        unpooled = FrameBufferPool(reuse=False)
+        assert unpooled.copy("result", frame) is not unpooled.copy("result", frame)
+        assert unpooled.get_stats()["allocations"] == 2
+        print("✓ 关闭复用时每次分配新数组")
+
+        return True
+    except Exception as e:
+        print(f"✗ 帧缓冲区池测试失败: {e}")
+        return False
+
+def test_tracker():
+    """测试目标跟踪与不同目标计数"""
+    try:
+        import numpy as np
+        from core.tracker import ObjectTracker, TrackingManager
+
+        tracker = ObjectTracker(min_hits=2, max_age=2)
+        ids = []
+        for i in range(6):
+            dets = np.array([[10 + i, 10, 30 + i, 30, 0.9, 0], [100, 100, 120, 120, 0.9, 0]], dtype=np.float32)
+            ids.append(tracker.update(dets if i != 3 else dets[:1])[:, 6].tolist())
+        assert ids[0] == [-1, -1] and ids[1] == [1, 2] and ids[5] == [1, 2]
+        print("✓ 短暂漏检后ID保持不变")
+
+        for _ in range(4):
+            tracker.update(np.zeros((0, 6), dtype=np.float32))
+        assert len(tracker) == 0
+        print("✓ 过期轨迹被删除")
+
+        manager = TrackingManager(window_seconds=60)
+        for i in range(5):
+            manager.update("ROI_1", np.array([[0, 0, 10, 10, 0.9, 0]]), now=float(i))
+        assert manager.unique_count("ROI_1", now=10.0) == 1
+        assert manager.unique_count("ROI_1", now=100.0) == 0
+        print("✓ 停留的目标只计数一次")
+
+        return True
+    except Exception as e:
+        print(f"✗ 目标跟踪测试失败: {e}")
+        return False
+
+def test_heatmap():
+    """测试检测热力图累加与衰减"""
+    try:
+        import numpy as np
+        from core.heatmap import DetectionHeatmap
+
+        heatmap = DetectionHeatmap(cell_size=8)
+        dets = np.array([[0, 0, 16, 16, 0.9, 0], [8, 8, 24, 24, 0.8, 0]], dtype=np.float32)
+        heatmap.add(dets, (64, 64, 3), now=0.0)
+        heat = heatmap.get()
+        assert heat.shape == (8, 8) and heat.dtype == np.float32
+        assert heat[1, 1] == 2 and heat[0, 0] == 1 and heat[2, 2] == 1 and heat[3, 3] == 0
+        print("✓ 检测框覆盖区域正确累加")
+
+        live = DetectionHeatmap(cell_size=8, half_life=1.0)
+        live.add(dets, (64, 64, 3), now=0.0)
+        live.add(dets[:0], (64, 64, 3), now=2.0)
+        assert abs(live.get()[1, 1] - 0.5) < 1e-6
+        print("✓ 实时热力图按半衰期衰减")
+
+        return True
+    except Exception as e:
+        print(f"✗ 热力图测试失败: {e}")
+        return False
+
+def test_session_replay():
+    """测试检测会话录制与回放"""
+    try:
+        import tempfile
+        import numpy as np
+        from core.session_replay import SessionRecorder, RecordedROI, load_results, compare_results
+        from core.video_handler import VideoHandler
+
+        recorder = SessionRecorder(tempfile.mkdtemp())
+        success, _ = recorder.start((48, 64, 3), 30.0, {"confidence": 0.5, "roi": None})
+        assert success
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (48, 64, 3), dtype=np.uint8) for _ in range(10)]
+        for i, frame in enumerate(frames):
+            index = recorder.add_frame(frame, 100.0 + i / 30.0)
+            recorder.add_result(index, np.array([[1, 2, 3, 4, 0.9, 0]], dtype=np.float32), 0.01, confidence=0.5)
+        recorder.stop()
+
+        handler = VideoHandler()
+        assert handler.open_replay(recorder.path, "max_speed")
+        replayed = []
+        while True:
+            frame, ret = handler.get_frame()
+            if not ret:
+                break
+            replayed.append(frame.copy())
+        assert len(replayed) == 10 and all(np.array_equal(a, b) for a, b in zip(frames, replayed))
+        assert handler.is_playback_finished()
+        print("✓ 回放画面与录制画面逐像素一致")
+
+        recorded = RecordedROI({"name": "ROI_1", "points": [[1, 1], [40, 1], [40, 30], [1, 30]]})
+        assert recorded.is_roi_enabled() and recorded.get_compiled_roi("ROI_1", (48, 64, 3)).bbox == (1, 1, 40, 30)
+        assert recorded.differs_from([[1, 1], [50, 1], [50, 30], [1, 30]]) and not recorded.differs_from(
+            [[1, 1], [40, 1], [40, 30], [1, 30]])
+        assert not RecordedROI(None).is_roi_enabled()
+        print("✓ 回放使用录制时的ROI顶点")
+
+        results = load_results(recorder.path)
+        report = compare_results(results, results)
+        assert report["frames"] == 10 and report["agreement"] == 1.0 and not report["mismatched_frames"]
+        print("✓ 逐帧结果对比")
+
+        return True
+    except Exception as e:
+        print(f"✗ 会话回放测试失败: {e}")
+        return False
+
+def test_smart_capture():
+    """测试智能训练数据采集去重与标注输出"""
+    try:
+        import os
+        import tempfile
+        import numpy as np
+        from core.smart_capture import SmartCapture
+
+        capture = SmartCapture(tempfile.mkdtemp(), config={"min_interval": 0.0})
+        success, _ = capture.start(["chip"])
+        assert success
+        rng = np.random.default_rng(0)
+        scenes = [rng.integers(0, 255, (48, 64, 3), dtype=np.uint8) for _ in range(3)]
+        dets = np.array([[16, 12, 48, 36, 0.9, 0]], dtype=np.float32)
+        for i, scene in enumerate(scenes):
+            for j in range(5):
+                capture.offer(scene, lambda frame: dets, now=i * 5.0 + j)
+        capture.stop()
+        stats = capture.get_stats(now=15.0)
+        assert stats["kept"] == 3 and stats["skipped"] == 12 and stats["written"] == 3
+        assert stats["kept_per_minute"] == 3 and stats["skipped_per_minute"] == 12
+        print("✓ 近重复帧被跳过，只保留不同画面")
+
+        images = sorted(os.listdir(capture.image_dir))
+        labels = sorted(os.listdir(capture.label_dir))
+        assert len(images) == 3 and [name[:-4] for name in images] == [name[:-4] for name in labels]
+        with open(os.path.join(capture.label_dir, labels[0]), "r", encoding="utf-8") as f:
+            assert f.read() == "0 0.500000 0.500000 0.500000 0.500000\n"
+        print("✓ 图像与YOLO标注文件一一对应")
+
+        return True
+    except Exception as e:
+        print(f"✗ 智能采集测试失败: {e}")
+        return False
+
+def test_autolabel_resume():
+    """测试离线自动标注的断点续跑"""
+    try:
+        import os
+        import cv2
+        import tempfile
+        import numpy as np
+        from config import AUTOLABEL_CONFIG
+        from tools.autolabel import label_video, build_review_queues
+
+        root = tempfile.mkdtemp()
+        video = os.path.join(root, "v.avi")
+        writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+        for i in range(20):
+            writer.write(np.full((48, 64, 3), i * 12, dtype=np.uint8))
+        writer.release()
+        settings = dict(AUTOLABEL_CONFIG, frame_stride=2, dedup=False)
+
+        def detect(frame):
+            conf = 0.9 if frame[0, 0, 0] < 110 else 0.3
+            return np.array([[8, 8, 32, 24, conf, 0]], dtype=np.float32)
+
+        def interrupted(frame):
+            if frame[0, 0, 0] > 100:
+                raise KeyboardInterrupt
+            return detect(frame)
+
+        outputs = []
+        for name, first in (("full", None), ("resumed", interrupted)):
+            output = os.path.join(root, name)
+            for sub in ("images", "labels", "progress"):
+                os.makedirs(os.path.join(output, sub))
+            if first is not None:
+                try:
+                    label_video(video, "v", output, first, settings)
+                except KeyboardInterrupt:
+                    pass
+            summary = label_video(video, "v", output, detect, settings)
+            outputs.append((output, summary))
+        (full, full_summary), (resumed, resumed_summary) = outputs
+        assert full_summary["sampled"] == 10 and resumed_summary["resumed_from"] > 0
+        assert sorted(os.listdir(os.path.join(full, "labels"))) == sorted(os.listdir(os.path.join(resumed, "labels")))
+        assert label_video(video, "v", resumed, detect, settings)["status"] == "skipped"
+        print("✓ 中断后从断点继续，结果与一次跑完一致")
+
+        counts = build_review_queues(resumed)
+        assert counts == {"uncertain": 5, "confident": 5, "empty": 0}
+        print("✓ 按置信度生成复核队列")
+
+        # 去重时续跑的第一帧与中断前最后写入的帧比较，重复帧不再写入
+        still = os.path.join(root, "still.avi")
+        writer = cv2.VideoWriter(still, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+        for _ in range(10):
+            writer.write(np.full((48, 64, 3), 60, dtype=np.uint8))
+        writer.release()
+        output = os.path.join(root, "dedup")
+        for sub in ("images", "labels", "progress"):
+            os.makedirs(os.path.join(output, sub))
+        dedup_settings = dict(settings, dedup=True)
+        assert label_video(still, "s", output, detect, dedup_settings)["written"] == 1
+        progress = os.path.join(output, "progress", "s.jsonl")
+        with open(progress, encoding="utf-8") as f:
+            lines = f.readlines()
+        with open(progress, "w", encoding="utf-8") as f:
+            f.writelines(lines[:-1])  # 去掉完成记录，模拟写入第一帧后中断
+        summary = label_video(still, "s", output, detect, dedup_settings)
+        assert summary["resumed_from"] == 1 and summary["written"] == 0 and summary["sampled"] == 1
+        print("✓ 续跑时沿用中断前的去重哈希，只统计本次写入")
+
+        return True
+    except Exception as e:
+        print(f"✗ 自动标注测试失败: {e}")
+        return False
+
+def test_model_swap():
+    """测试模型热切换与回滚"""
+    try:
+        import numpy as np
+        from core.model_handler import ModelHandler, ModelState
+
+        class FakeResult:
+            boxes = None
+
+        class FakeModel:
+            overrides = {"imgsz": 64}
+
+            def __init__(self, names, healthy_calls=None):
+                self.names = names
+                self.healthy_calls = healthy_calls
+                self.calls = 0
+
+            def __call__(self, images, **kwargs):
+                self.calls += 1
+                if self.healthy_calls is not None and self.calls > self.healthy_calls:
+                    raise RuntimeError("推理失败")
+                return [FakeResult()]
+
+        models = {"a.pt": FakeModel({0: "chip"}), "b.pt": FakeModel({0: "chip"}),
+                  "wrong.pt": FakeModel({1: "other"}), "flaky.pt": FakeModel({0: "chip"}, healthy_calls=5)}
+        handler = ModelHandler()
+        handler.lean_inference = False
+        handler.registry = None
+        handler._load_state = lambda path: ModelState(models[path], path, path)
+
+        def swap(path):
+            handler.begin_model_swap(path)
+            handler._swap_thread.join()
+            return handler.poll_model_swap()
+
+        handler.load_model("a.pt")
+        assert swap("b.pt")[0] and handler.current_model_path == "b.pt"
+        print("✓ 后台预热后切换模型")
+
+        assert not swap("wrong.pt")[0] and handler.current_model_path == "b.pt"
+        print("✓ 未通过检查的模型不切换")
+
+        assert swap("flaky.pt")[0] and handler.current_model_path == "flaky.pt"
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        for _ in range(3):
+            handler.process_frame(frame)
+        assert handler.current_model_path == "b.pt" and not handler.poll_model_swap()[0]
+        print("✓ 切换后推理失败自动回滚")
+
+        return True
+    except Exception as e:
+        print(f"✗ 模型热切换测试失败: {e}")
+        return False
+
+def test_model_registry():
+    """测试常驻模型注册表的LRU淘汰"""
+    try:
+        import os
+        import tempfile
+        from core.model_handler import ModelState
+        from core.model_registry import ModelRegistry
+
+        class FakeModel:
+            pass
+
+        root = tempfile.mkdtemp()
+        states = {}
+        for name in ("day.pt", "night.pt", "alloy.pt"):
+            path = os.path.join(root, name)
+            with open(path, "wb") as f:
+                f.write(os.urandom(400 * 1024))
+            states[name] = ModelState(FakeModel(), path, name)
+
+        registry = ModelRegistry(memory_budget_mb=1.0, max_models=4)
+        registry.put(states["day.pt"])
+        registry.put(states["night.pt"], active=True)
+        assert registry.get(states["day.pt"].path, "day.pt", "fp32") is states["day.pt"]
+        evicted = registry.put(states["alloy.pt"], active=True)
+        assert [os.path.basename(key[0]) for key in evicted] == ["night.pt"]
+        assert [entry["name"] for entry in registry.entries()] == ["alloy.pt", "day.pt"]
+        assert registry.total_bytes() <= 1024 * 1024
+        print("✓ 超出内存预算时淘汰最久未使用的模型")
+
+        digest = registry.file_digest(states["day.pt"].path)
+        assert registry.file_digest(states["day.pt"].path) == digest
+        print("✓ 模型文件摘要缓存")
+
+        fallback = ModelState(FakeModel(), states["day.pt"].path, "day.pt", requested_precision="dynamic_int8")
+        registry.put(fallback)
+        assert registry.get(fallback.path, "day.pt", "dynamic_int8") is fallback
+        assert registry.entries()[0]["precision"] == "fp32"
+        print("✓ 低精度变体回退为FP32的模型按请求精度命中")
+
+        return True
+    except Exception as e:
+        print(f"✗ 模型注册表测试失败: {e}")
+        return False
+
+def test_cascade():
+    """测试两级级联检测的候选与裁剪"""
+    try:
+        import cv2
+        import numpy as np
+        from core.cascade import BlobProposer, CascadeDetector
+
+        rng = np.random.default_rng(0)
+        panel = (np.full((480, 640, 1), 130) + rng.normal(0, 3, (480, 640, 1))).repeat(3, 2)
+        panel = panel.clip(0, 255).astype(np.uint8)
+        frame = panel.copy()
+        cv2.circle(frame, (100, 100), 5, (40, 40, 40), -1)
+        cv2.circle(frame, (500, 380), 5, (40, 40, 40), -1)
+
+        batches = []
+
+        def run_crops(crops, imgsz):
+            batches.append(len(crops))
+            # 裁剪窗口中心返回一个检测框，检查坐标换算
+            return [np.array([[c.shape[1] / 2 - 5, c.shape[0] / 2 - 5, c.shape[1] / 2 + 5, c.shape[0] / 2 + 5,
+                               0.9, 0]], dtype=np.float32) for c in crops]
+
+        cascade = CascadeDetector(BlobProposer(), run_crops, {"crop_size": 128, "full_every": 0})
+        full = lambda: np.zeros((0, 6), dtype=np.float32)
+        assert len(cascade.detect(panel, (0, 0, 640, 480), full)) == 0 and not batches
+        print("✓ 无候选的帧不运行主模型")
+
+        dets = cascade.detect(frame, (0, 0, 640, 480), full)
+        assert batches == [2] and len(dets) == 2
+        centers = sorted(((d[0] + d[2]) / 2, (d[1] + d[3]) / 2) for d in dets)
+        assert all(abs(cx - x) <= 2 and abs(cy - y) <= 2 for (cx, cy), (x, y) in zip(centers, [(100, 100), (500, 380)]))
+        print("✓ 候选周围的裁剪窗口批量推理，坐标换算正确")
+
+        return True
+    except Exception as e:
+        print(f"✗ 级联检测测试失败: {e}")
+        return False
+
+def test_evaluation_metrics():
+    """测试评估工具的AP计算与帕累托排序"""
+    try:
+        import numpy as np
+        from core.detection_utils import detection_true_positives, average_precision
+        from tools.evaluate import pareto_ranks
+
+        gt = np.array([[0, 0, 0, 10, 10], [0, 20, 20, 30, 30]], dtype=np.float32)
+        dets = np.array([[0, 0, 10, 10, 0.9, 0], [50, 50, 60, 60, 0.8, 0], [20, 20, 30, 30, 0.7, 0]],
+                        dtype=np.float32)
+        ordered, tp = detection_true_positives(dets, gt)
+        assert tp[:, 0].tolist() == [True, False, True]
+        ap = average_precision(ordered[:, 4], tp, len(gt))[0]
+        assert abs(ap - (51 + 50 * 2 / 3) / 101) < 1e-6
+        print("✓ AP按101点插值计算正确")
+
+        ranks = pareto_ranks([[0.9, -10, 100], [0.8, -5, 200], [0.7, -12, 90], [0.9, -10, 100]])
+        assert ranks.tolist() == [0, 0, 1, 0]
+        print("✓ 帕累托前沿排序正确")
+
+        return True
+    except Exception as e:
+        print(f"✗ 评估指标测试失败: {e}")
+        return False
+
+def test_virtual_camera():
+    """测试虚拟摄像头的实时出帧、丢帧、断开恢复和多路并行"""
+    try:
+        import time
+        import tempfile
+        import cv2
+        import numpy as np
+        from core.video_handler import VideoHandler
+
+        folder = tempfile.mkdtemp()
+        for i in range(5):
+            cv2.imwrite(f"{folder}/{i}.png", np.full((48, 64, 3), i * 40, dtype=np.uint8))
+
+        handlers = [VideoHandler() for _ in range(2)]
+        for handler in handlers:
+            assert handler.open_virtual_camera(folder, fps=50, config={"read_timeout": 0.5})
+            assert handler.is_virtual_camera() and not handler.is_file_source()
+        start = time.perf_counter()
+        values = []
+        for _ in range(10):
+            for handler in handlers:
+                frame, ret = handler.get_frame()
+                assert ret and frame.shape == (48, 64, 3)
+            values.append(int(frame[0, 0, 0]))
+        elapsed = time.perf_counter() - start
+        assert elapsed >= 0.15, elapsed  # 按50fps实时出帧，读取阻塞到下一帧
+        assert values[0] == 0 and len(set(values)) >= 3 and set(values) <= {0, 40, 80, 120, 160}
+        print("✓ 两路虚拟摄像头按固定帧率实时出帧")
+
+        camera = handlers[0].cap
+        time.sleep(0.1)
+        handlers[0].get_frame()
+        assert camera.get_stats()["dropped"] >= 3
+        print("✓ 读取跟不上时覆盖旧帧并计为丢帧")
+
+        camera.disconnect(0.2)
+        assert not handlers[0].get_frame()[1]
+        time.sleep(0.25)
+        assert handlers[0].get_frame()[1]
+        assert camera.get_stats()["disconnects"] == 1 and camera.get_stats()["read_failures"] >= 1
+        print("✓ 断开期间读取失败，之后自动恢复")
+
+        for handler in handlers:
+            handler.release()
+        return True
+    except Exception as e:
+        print(f"✗ 虚拟摄像头测试失败: {e}")
+        return False
+
+def test_write_behind_writer():
+    """测试写回式持久化"""
+    try:
+        import os
+        import tempfile
+        from core.persistence import WriteBehindWriter
+
+        path = os.path.join(tempfile.mkdtemp(), "roi_config.json")
+        writer = WriteBehindWriter(debounce=10.0)
+        for i in range(20):
+            writer.schedule(path, f"{{\"value\": {i}}}")
+        assert not os.path.exists(path)
+        print("✓ 修改在防抖期内未写盘")
+
+        writer.close()
+        with open(path, 'r', encoding='utf-8') as f:
+            assert f.read() == '{"value": 19}'
+        stats = writer.get_stats()
+        assert stats["written"] == 1 and stats["saved"] == 19
+        print("✓ 关闭时合并写盘且内容为最新")
+
+        import threading
+        from core.roi_store import ROIStore
+        folder = tempfile.mkdtemp()
+        with open(os.path.join(folder, "ROI_0.json"), 'w', encoding='utf-8') as f:
+            f.write('{"name": "ROI_0"}')
+        writer = WriteBehindWriter(debounce=0.0)
+        store = ROIStore(folder, writer)
+        store.refresh()
+        store["ROI_1"] = {"name": "ROI_1"}
+        del store["ROI_1"]
+        store.mark_saved("ROI_1")
+        assert "ROI_1" not in store
+        print("✓ 删除后的写入完成回调不会把ROI加回索引")
+
+        errors = []
+        def on_writer_thread():
+            try:
+                for _ in range(500):
+                    store.mark_saved("ROI_0")
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=on_writer_thread)
+        thread.start()
+        for i in range(500):
+            store[f"ROI_{i + 2}"] = {"name": f"ROI_{i + 2}"}
+            del store[f"ROI_{i + 2}"]
+        thread.join()
+        writer.close()
+        assert not errors and list(store) == ["ROI_0"]
+        print("✓ 写回线程与GUI线程并发修改索引无异常")
+
+        return True
+    except Exception as e:
+        print(f"✗ 写回式持久化测试失败: {e}")
+        return False
+
 def test_config():
     """测试配置"""
     try:
@@ -95,6 +841,26 @@ def main():
         ("配置测试", test_config),
         ("模型处理器测试", test_model_handler),
         ("视频处理器测试", test_video_handler),
+        ("检测工具测试", test_detection_utils),
+        ("检测结果缓存测试", test_detection_cache),
+        ("检测缓存过滤测试", test_detection_cache_filtering),
+        ("ROI几何测试", test_roi_geometry),
+        ("ROI参考分辨率测试", test_roi_reference_size),
+        ("写回式持久化测试", test_write_behind_writer),
+        ("指标测试", test_metrics),
+        ("报警状态机测试", test_alert_state_machine),
+        ("CPU预算测试", test_cpu_governor),
+        ("帧缓冲区池测试", test_frame_pool),
+        ("目标跟踪测试", test_tracker),
+        ("热力图测试", test_heatmap),
+        ("会话回放测试", test_session_replay),
+        ("智能采集测试", test_smart_capture),
+        ("自动标注续跑测试", test_autolabel_resume),
+        ("模型热切换测试", test_model_swap),
+        ("模型注册表测试", test_model_registry),
+        ("级联检测测试", test_cascade),
+        ("评估指标测试", test_evaluation_metrics),
+        ("虚拟摄像头测试", test_virtual_camera),
     ]
     
     passed = 0
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+离线自动标注：用模型批量预标注录制的训练视频
+
+用法示例:
+    python -m tools.autolabel training_data --model best.pt --workers 4
+    python -m tools.autolabel training_data --output autolabel --stride 10 --review-threshold 0.7
+
+输出目录结构（YOLO格式）:
+    images/<视频>_<帧号>.jpg  labels/<视频>_<帧号>.txt
+    review/uncertain.txt      含低置信度检测框的帧（按最低置信度升序，优先人工检查）
+    review/confident.txt      所有检测框置信度都较高的帧
+    review/empty.txt          没有检测结果的帧（可抽查漏检）
+    progress/<视频>.jsonl     每个视频的处理记录，中断后重新运行同一命令从断点继续
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_SETTINGS, AUTOLABEL_CONFIG, SMART_CAPTURE_CONFIG, CPU_BUDGET_CONFIG
+from core.cpu_governor import detect_physical_cores
+from core.smart_capture import dhash, hamming_distances, yolo_label_lines
+from tools.benchmark import print_table
+
+BANDS = ("uncertain", "confident", "empty")
+
+_handler = None   # 工作进程内加载的模型
+_queue = None     # 工作进程向主进程汇报进度的队列
+
+
+def find_videos(folder, extensions=None):
+    """递归查找视频文件，返回 [(视频路径, 视频标识)]，标识由相对路径生成，用作输出文件名前缀"""
+    extensions = tuple(extensions or AUTOLABEL_CONFIG["video_extensions"])
+    videos = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                path = os.path.join(root, name)
+                key = os.path.splitext(os.path.relpath(path, folder))[0].replace(os.sep, "__")
+                videos.append((path, key))
+    return sorted(videos)
+
+
+def read_progress(path):
+    """读取视频的处理记录，返回 (已处理帧记录列表, 完成记录或None)；忽略中断时写了一半的行"""
+    records, done = [], None
+    if not os.path.exists(path):
+        return records, done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("done"):
+                done = record
+            else:
+                records.append(record)
+    return records, done
+
+
+def confidence_band(detections, review_threshold):
+    """按检测框置信度把帧分入复核队列"""
+    if len(detections) == 0:
+        return "empty"
+    return "confident" if float(detections[:, 4].min()) >= review_threshold else "uncertain"
+
+
+def resume_hash(output, record):
+    """断点续跑时恢复最近写入帧的感知哈希：优先读取处理记录中的哈希，旧记录没有时从已写入的图像重新计算"""
+    if record.get("hash"):
+        return np.frombuffer(bytes.fromhex(record["hash"]), dtype=np.uint8)
+    frame = cv2.imread(os.path.join(output, record["image"]))
+    return dhash(frame, SMART_CAPTURE_CONFIG["hash_size"]) if frame is not None else None
+
+
+def label_video(video_path, video_key, output, detect, settings, report=None):
+    """逐帧采样一个视频，写YOLO图像/标注对和处理记录，返回该视频的汇总
+
+    只对 帧号 % stride == 0 的帧解码推理，其余帧只 grab；处理记录每帧追加并刷新，
+    中断后从最后一条记录的下一帧继续，已完成的视频直接跳过。
+    """
+    progress_path = os.path.join(output, "progress", video_key + ".jsonl")
+    records, done = read_progress(progress_path)
+    summary = {"video": video_key, "status": "done", "resumed_from": 0, "frames": 0,
+               "sampled": len(records), "written": 0, "duplicates": 0, "seconds": 0.0,
+               "bands": {band: sum(1 for r in records if r["band"] == band) for band in BANDS}}
+    if done is not None:
+        summary.update(status="skipped", frames=done["frames"], duplicates=done.get("duplicates", 0))
+        return summary
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        summary["status"] = "error: 无法打开视频"
+        return summary
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    index = records[-1]["frame"] + 1 if records else 0
+    if index:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        summary["resumed_from"] = index
+
+    stride = max(1, settings["frame_stride"])
+    ext = settings["image_format"]
+    params = [cv2.IMWRITE_JPEG_QUALITY, settings["jpeg_quality"]] if ext == "jpg" else []
+    threshold = SMART_CAPTURE_CONFIG["hash_threshold"]
+    last_hash = resume_hash(output, records[-1]) if records and settings["dedup"] else None
+    start = last_report = time.perf_counter()
+    decoded = 0
+    with open(progress_path, "a", encoding="utf-8") as log:
+        while True:
+            if index % stride:
+                if not cap.grab():
+                    break
+                index += 1
+                decoded += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded += 1
+            signature = dhash(frame, SMART_CAPTURE_CONFIG["hash_size"]) if settings["dedup"] else None
+            if last_hash is not None and int(hamming_distances(last_hash[None], signature)[0]) <= threshold:
+                summary["duplicates"] += 1
+            else:
+                last_hash = signature
+                detections = detect(frame)
+                stem = f"{video_key}_{index:06d}"
+                image = os.path.join("images", f"{stem}.{ext}")
+                cv2.imwrite(os.path.join(output, image), frame, params)
+                with open(os.path.join(output, "labels", stem + ".txt"), "w", encoding="utf-8") as f:
+                    f.write(yolo_label_lines(detections, frame.shape))
+                band = confidence_band(detections, settings["review_threshold"])
+                summary["bands"][band] += 1
+                summary["sampled"] += 1
+                summary["written"] += 1
+                record = {"frame": index, "image": image, "band": band, "detections": len(detections),
+                          "min_conf": round(float(detections[:, 4].min()), 4) if len(detections) else None}
+                if signature is not None:
+                    record["hash"] = signature.tobytes().hex()
+                log.write(json.dumps(record) + "\n")
+                log.flush()
+            index += 1
+            now = time.perf_counter()
+            if report is not None and now - last_report >= settings["report_interval"]:
+                report(video_key, index, total, summary["sampled"], decoded / (now - start))
+                last_report = now
+        summary["frames"] = index
+        summary["seconds"] = time.perf_counter() - start
+        log.write(json.dumps({"done": True, "frames": index, "duplicates": summary["duplicates"]}) + "\n")
+    cap.release()
+    summary["decoded"] = decoded
+    return summary
+
+
+def build_review_queues(output):
+    """汇总所有视频的处理记录，生成复核队列文件，返回各队列帧数"""
+    queues = {band: [] for band in BANDS}
+    progress_dir = os.path.join(output, "progress")
+    for name in sorted(os.listdir(progress_dir)):
+        if name.endswith(".jsonl"):
+            for record in read_progress(os.path.join(progress_dir, name))[0]:
+                queues[record["band"]].append(record)
+    # 最低置信度越低越可能是误检，排在最前面
+    queues["uncertain"].sort(key=lambda r: r["min_conf"])
+    os.makedirs(os.path.join(output, "review"), exist_ok=True)
+    for band, records in queues.items():
+        with open(os.path.join(output, "review", band + ".txt"), "w", encoding="utf-8") as f:
+            f.writelines(record["image"] + "\n" for record in records)
+    return {band: len(records) for band, records in queues.items()}
+
+
+def _init_worker(model_path, confidence, threads, queue):
+    """工作进程初始化：限制推理线程数并加载一次模型"""
+    global _handler, _queue
+    from core.cpu_governor import CPUGovernor
+    from core.model_handler import ModelHandler
+
+    CPUGovernor(dict(CPU_BUDGET_CONFIG, total_cores=threads, inference=threads, affinity=False)).apply()
+    _handler = ModelHandler()
+    success, message = _handler.load_model(model_path)
+    if not success:
+        raise RuntimeError(message)
+    _handler.confidence_threshold = confidence
+    _queue = queue
+
+
+def _report(*progress):
+    _queue.put(progress)
+
+
+def _label_video_task(video_path, video_key, output, settings):
+    return label_video(video_path, video_key, output, _handler.detect, settings, _report)
+
+
+def run(args):
+    """按视频分配到进程池并行标注，定时打印各视频进度"""
+    settings = dict(AUTOLABEL_CONFIG)
+    for key in ("frame_stride", "review_threshold", "image_format"):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+    settings["dedup"] = settings["dedup"] and not args.no_dedup
+    confidence = args.confidence or settings["confidence"]
+    threads = args.threads or settings["threads_per_worker"]
+    workers = args.workers or settings["workers"] or max(1, detect_physical_cores() // threads)
+
+    videos = find_videos(args.folder, settings["video_extensions"])
+    if not videos:
+        raise SystemExit(f"未找到视频文件: {args.folder}")
+    for sub in ("images", "labels", "progress"):
+        os.makedirs(os.path.join(args.output, sub), exist_ok=True)
+    print(f"{len(videos)} 个视频，{workers} 个进程 x {threads} 推理线程，每 {settings['frame_stride']} 帧取一帧")
+
+    queue = multiprocessing.get_context().Queue()
+    model_path = args.model or DEFAULT_SETTINGS["default_model"]
+    results = []
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(model_path, confidence, threads, queue))
+    try:
+        pending = {executor.submit(_label_video_task, path, key, args.output, settings) for path, key in videos}
+        while pending:
+            finished, pending = wait(pending, timeout=settings["report_interval"], return_when=FIRST_COMPLETED)
+            while not queue.empty():
+                key, index, total, written, fps = queue.get()
+                percent = f"{index / total:.1%}" if total > 0 else "--"
+                print(f"  {key}: {index}/{total} 帧 ({percent})，已写入 {written} 张，{fps:.1f} 帧/秒")
+            for future in finished:
+                summary = future.result()
+                results.append(summary)
+                print(f"✓ {summary['video']}: {summary['status']}，写入 {summary['sampled']} 张")
+    except KeyboardInterrupt:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit("已中断，重新运行同一命令会从断点继续")
+    executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    rows = []
+    for s in sorted(results, key=lambda s: s["video"]):
+        fps = s.get("decoded", 0) / s["seconds"] if s["seconds"] else 0.0
+        rows.append([s["video"], s["status"], s["resumed_from"], s["frames"], s["sampled"], s["duplicates"],
+                     s["bands"]["uncertain"], s["bands"]["confident"], s["bands"]["empty"],
+                     f"{s['seconds']:.1f}", f"{fps:.1f}"])
+    print()
+    print_table(["视频", "状态", "续自帧", "总帧数", "写入", "重复跳过", "待复核", "高置信", "无目标", "耗时(s)", "帧/秒"], rows)
+
+    counts = build_review_queues(args.output)
+    decoded = sum(s.get("decoded", 0) for s in results)
+    written = sum(s["written"] for s in results)  # 只统计本次运行写入的帧，不含中断前已写入的
+    print(f"\n总耗时 {elapsed:.1f} s，解码 {decoded / elapsed:.1f} 帧/秒，写入 {written / elapsed:.2f} 张/秒")
+    print(f"复核队列: 待复核 {counts['uncertain']}，高置信 {counts['confident']}，无目标 {counts['empty']}"
+          f"（{os.path.join(args.output, 'review')}）")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI蒙皮铝屑观察助手 离线自动标注")
+    parser.add_argument("folder", help="训练视频所在文件夹（递归查找）")
+    parser.add_argument("--output", default=AUTOLABEL_CONFIG["output_dir"], help="输出目录")
+    parser.add_argument("--model", help="模型文件，默认使用默认模型")
+    parser.add_argument("--workers", type=int, help="进程数")
+    parser.add_argument("--threads", type=int, help="每个进程的推理线程数")
+    parser.add_argument("--confidence", type=float, help="写入标注的最低置信度")
+    parser.add_argument("--stride", dest="frame_stride", type=int, help="每隔多少帧取一帧")
+    parser.add_argument("--review-threshold", type=float, help="低于该置信度的帧进入待复核队列")
+    parser.add_argument("--format", dest="image_format", choices=["jpg", "png"])
+    parser.add_argument("--no-dedup", action="store_true", help="不跳过近似重复的帧")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
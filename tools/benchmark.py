@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+性能基准测试套件
+
+用法示例:
+    python -m tools.benchmark tiling --source training_data/xxx.mp4 --roi ROI_1
+    python -m tools.benchmark metrics
+    python -m tools.benchmark precision --source training_data/xxx.mp4
+    python -m tools.benchmark lean --source training_data/xxx.mp4
+    python -m tools.benchmark buffers --source training_data/xxx.mp4
+    python -m tools.benchmark tracking
+    python -m tools.benchmark heatmap
+    python -m tools.benchmark cascade --source training_data/xxx.mp4 --roi ROI_1
+    python -m tools.benchmark cameras --source training_data/xxx.mp4 --cameras 4 --jitter-ms 5 --disconnect-prob 0.001
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_SETTINGS
+from core.detection_utils import load_yolo_labels, match_detections, results_to_array
+from core.quantization import PRECISION_VARIANTS
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def iter_source_frames(source, max_frames=None):
+    """遍历视频文件或图像文件夹，产出 (帧名, 帧, 真值标注或None)
+
+    图像文件夹按YOLO格式查找标注：images/xxx.jpg 对应 labels/xxx.txt。
+    """
+    count = 0
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*"))
+                       if p.lower().endswith(IMAGE_EXTENSIONS))
+        label_dir = os.path.join(os.path.dirname(os.path.normpath(source)), "labels")
+        for path in paths:
+            if max_frames is not None and count >= max_frames:
+                return
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            stem = os.path.splitext(os.path.basename(path))[0]
+            label_path = os.path.join(label_dir, stem + ".txt")
+            gt = load_yolo_labels(label_path, frame.shape[1], frame.shape[0]) if os.path.isdir(label_dir) else None
+            count += 1
+            yield stem, frame, gt
+    else:
+        cap = cv2.VideoCapture(source)
+        try:
+            while max_frames is None or count < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                count += 1
+                yield f"frame_{count:06d}", frame, None
+        finally:
+            cap.release()
+
+
+def load_roi(roi_name):
+    """读取已保存的ROI，返回按帧尺寸投影编译ROI的函数"""
+    from core.roi_handler import ROIHandler
+    handler = ROIHandler()
+    compiled = handler.get_compiled_roi(roi_name)
+    if compiled is None or len(compiled) < 3:
+        raise SystemExit(f"ROI '{roi_name}' 不存在或点数不足")
+    return lambda frame: handler.get_compiled_roi(roi_name, frame.shape)
+
+
+def full_frame_roi(frame):
+    """没有指定ROI时使用整帧作为ROI"""
+    from core.roi_geometry import CompiledROI
+    h, w = frame.shape[:2]
+    return CompiledROI("full_frame", [[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]])
+
+
+def print_table(headers, rows):
+    """打印对齐的结果表格"""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def bench_tiling(args):
+    """对比单次推理与切片推理的召回率和吞吐量"""
+    from core.model_handler import ModelHandler
+
+    handler = ModelHandler()
+    success, message = handler.load_model(args.model)
+    if not success:
+        raise SystemExit(message)
+    handler.set_confidence(args.conf)
+    roi_for_frame = load_roi(args.roi) if args.roi else None
+
+    stats = {name: {"time": 0.0, "frames": 0, "detections": 0, "hits": 0, "tiles": 0}
+             for name in ("single", "tiled")}
+    gt_total = 0
+    agreement_hits = 0
+    agreement_total = 0
+
+    for _, frame, gt in iter_source_frames(args.source, args.frames):
+        points = roi_for_frame(frame) if roi_for_frame is not None else full_frame_roi(frame)
+        outputs = {}
+        for name, tiling in (("single", False), ("tiled", True)):
+            handler.set_tiling(tiling, tile_size=args.tile_size, overlap=args.overlap)
+            start = time.perf_counter()
+            dets = handler.detect_in_roi(frame, points)
+            stats[name]["time"] += time.perf_counter() - start
+            stats[name]["frames"] += 1
+            stats[name]["detections"] += len(dets)
+            stats[name]["tiles"] += handler.last_tile_count
+            outputs[name] = dets
+            if gt is not None:
+                stats[name]["hits"] += match_detections(dets, gt, args.iou)
+        if gt is not None:
+            gt_total += len(gt)
+        else:
+            # 无标注时以切片结果为参考，统计单次推理找回的比例
+            reference = outputs["tiled"]
+            agreement_total += len(reference)
+            agreement_hits += match_detections(outputs["single"], np.concatenate(
+                [reference[:, 5:6], reference[:, :4]], axis=1), args.iou)
+
+    rows = []
+    for name, s in stats.items():
+        if s["frames"] == 0:
+            raise SystemExit("没有读取到任何帧")
+        if gt_total:
+            recall = f"{s['hits'] / gt_total:.3f}"
+        elif name == "single" and agreement_total:
+            recall = f"{agreement_hits / agreement_total:.3f} (相对切片)"
+        else:
+            recall = "-"
+        rows.append([name, s["frames"], f"{s['tiles'] / s['frames']:.1f}",
+                     f"{1000 * s['time'] / s['frames']:.1f}", f"{s['frames'] / s['time']:.2f}",
+                     s["detections"], recall])
+    print_table(["模式", "帧数", "切片/帧", "耗时(ms/帧)", "吞吐(FPS)", "检测数", "召回率"], rows)
+
+
+def bench_precision(args):
+    """对比各精度模型的延迟、与FP32结果的一致率以及召回率"""
+    from core.model_handler import ModelHandler
+
+    handler = ModelHandler()
+    success, message = handler.load_model(args.model)
+    if not success:
+        raise SystemExit(message)
+    frames = list(iter_source_frames(args.source, args.frames))
+    if not frames:
+        raise SystemExit("没有读取到任何帧")
+
+    reference = None
+    reference_latency = None
+    rows = []
+    for variant in ["fp32"] + [v for v in args.variants if v != "fp32"]:
+        success, message = handler.set_precision(variant, args.calibration)
+        if not success:
+            rows.append([variant, "-", "-", "-", "-", "-", message])
+            continue
+        handler._run_model(frames[0][1], conf=args.conf)  # 预热
+        outputs, latencies = [], []
+        for _, frame, _ in frames:
+            start = time.perf_counter()
+            outputs.append(handler._run_model(frame, conf=args.conf)[0])
+            latencies.append(time.perf_counter() - start)
+        if reference is None:
+            reference = outputs
+
+        # 以FP32结果为伪标注统计一致率，有真值标注时同时统计召回率
+        agree_hits = agree_total = gt_hits = gt_total = 0
+        for (_, _, gt), dets, ref in zip(frames, outputs, reference):
+            agree_total += len(ref)
+            agree_hits += match_detections(dets, np.concatenate([ref[:, 5:6], ref[:, :4]], axis=1), args.iou)
+            if gt is not None:
+                gt_total += len(gt)
+                gt_hits += match_detections(dets, gt, args.iou)
+        latencies = np.array(latencies) * 1000
+        if reference_latency is None:
+            reference_latency = latencies.mean()
+        rows.append([
+            variant,
+            f"{latencies.mean():.1f}",
+            f"{np.percentile(latencies, 95):.1f}",
+            f"{reference_latency / latencies.mean():.2f}x",
+            f"{agree_hits / agree_total:.3f}" if agree_total else "-",
+            f"{gt_hits / gt_total:.3f}" if gt_total else "-",
+            message,
+        ])
+    print_table(["精度", "平均(ms)", "P95(ms)", "加速比", "与FP32一致率", "召回率", "说明"], rows)
+
+
+def bench_lean(args):
+    """对比ultralytics通用预测器与精简推理路径的单帧耗时"""
+    from core.model_handler import ModelHandler
+
+    handler = ModelHandler()
+    success, message = handler.load_model(args.model)
+    if not success:
+        raise SystemExit(message)
+    if handler._get_lean_predictor() is None:
+        raise SystemExit("当前模型不支持精简推理路径")
+    frames = [frame for _, frame, _ in iter_source_frames(args.source, args.frames)]
+    if not frames:
+        raise SystemExit("没有读取到任何帧")
+
+    classes = handler._lean_predictor.classes
+    classes = None if classes is None else classes.tolist()
+
+    def predictor_path(frame):
+        with handler._inference_context():
+            results = handler.model(frame, conf=args.conf, classes=classes, verbose=False)
+        return results_to_array(results[0]), results[0].plot()
+
+    def lean_path(frame):
+        dets = handler._run_model(frame, conf=args.conf)[0]
+        return dets, handler.draw_detections(frame.copy(), dets)
+
+    rows = []
+    outputs = {}
+    for name, func in (("ultralytics预测器+plot", predictor_path), ("精简路径+绘制", lean_path)):
+        func(frames[0])  # 预热
+        latencies = []
+        outputs[name] = []
+        for frame in frames:
+            start = time.perf_counter()
+            dets, _ = func(frame)
+            latencies.append(time.perf_counter() - start)
+            outputs[name].append(dets)
+        latencies = np.array(latencies) * 1000
+        rows.append([name, f"{latencies.mean():.2f}", f"{np.percentile(latencies, 95):.2f}",
+                     sum(len(d) for d in outputs[name])])
+
+    reference, lean = outputs.values()
+    total = sum(len(r) for r in reference)
+    hits = sum(match_detections(d, np.concatenate([r[:, 5:6], r[:, :4]], axis=1), args.iou)
+               for d, r in zip(lean, reference))
+    print_table(["路径", "平均(ms/帧)", "P95(ms)", "检测数"], rows)
+    saved = float(rows[0][1]) - float(rows[1][1])
+    print(f"\n每帧节省: {saved:.2f} ms，精简路径与预测器结果一致率: {hits / total if total else 1.0:.3f}")
+
+
+def bench_buffers(args):
+    """对比逐帧分配与缓冲区池复用：每帧分配次数、临时内存峰值和帧耗时（不含推理）"""
+    import tracemalloc
+    from core.video_handler import VideoHandler
+    from core.frame_pool import FrameBufferPool, shade_outside_roi
+    from core.roi_geometry import CompiledROI
+
+    rows = []
+    for name, reuse in (("逐帧分配", False), ("缓冲区池", True)):
+        handler = VideoHandler()
+        handler.buffer_pool = FrameBufferPool(reuse=reuse)
+        if not handler.open_video(args.source):
+            raise SystemExit(f"无法打开视频: {args.source}")
+        handler.set_playback_mode("max_speed", loop=True)
+        pool = handler.buffer_pool
+        frame, _ = handler.get_frame()
+        h, w = frame.shape[:2]
+        roi = CompiledROI(None, [[w // 4, h // 4], [w * 3 // 4, h // 4], [w * 3 // 4, h * 3 // 4], [w // 4, h * 3 // 4]])
+        roi.outside_mask(frame.shape)
+        pool.reset_stats()
+
+        tracemalloc.start()
+        peaks, latencies = [], []
+        for _ in range(args.frames):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            frame, ret = handler.get_frame()
+            if not ret:
+                break
+            # 与帧循环相同的合成步骤：结果帧、检测框、ROI外部着色、显示
+            result = pool.copy("result", frame)
+            cv2.rectangle(result, (w // 3, h // 3), (w // 2, h // 2), (0, 255, 0), 2)
+            shade_outside_roi(result, roi, (200, 200, 200), 0.18, pool)
+            if not reuse:
+                # 原流程显示前转换为RGB副本；复用模式直接以BGR格式构造QImage
+                cv2.cvtColor(result, cv2.COLOR_BGR2RGB, dst=pool.scratch("rgb", result.shape))
+            latencies.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        tracemalloc.stop()
+        handler.release()
+
+        stats = pool.get_stats()
+        rows.append([name, f"{stats['allocations_per_frame']:.2f}",
+                     f"{np.mean(peaks) / 1e6:.2f}", f"{np.mean(latencies) * 1000:.2f}", stats["frames"]])
+    print_table(["模式", "每帧分配次数", "每帧临时内存峰值(MB)", "平均(ms/帧)", "帧数"], rows)
+
+
+def bench_cascade(args):
+    """对比整块推理与两级级联检测的耗时，以及级联相对整块推理（和真值）的召回损失"""
+    from core.model_handler import ModelHandler
+
+    handler = ModelHandler()
+    success, message = handler.load_model(args.model)
+    if not success:
+        raise SystemExit(message)
+    handler.set_confidence(args.conf)
+    success, message = handler.set_cascade(True, args.proposer, args.proposal_model)
+    if not success:
+        raise SystemExit(message)
+    cascade = handler.cascade
+    overrides = {key: value for key, value in (("crop_size", args.crop_size), ("max_crops", args.max_crops),
+                                               ("blob_threshold", args.blob_threshold),
+                                               ("full_every", args.full_every)) if value is not None}
+    cascade.config.update(overrides)
+    cascade.proposer.config.update(overrides)
+    roi_for_frame = load_roi(args.roi) if args.roi else None
+    frames = list(iter_source_frames(args.source, args.frames))
+    if not frames:
+        raise SystemExit("没有读取到任何帧")
+
+    latencies = {"整块推理": [], "级联": []}
+    outputs = {name: [] for name in latencies}
+    for _, frame, _ in frames:
+        points = roi_for_frame(frame) if roi_for_frame is not None else full_frame_roi(frame)
+        for name, detector in (("整块推理", None), ("级联", cascade)):
+            handler.cascade = detector
+            start = time.perf_counter()
+            outputs[name].append(handler.detect_in_roi(frame, points))
+            latencies[name].append(time.perf_counter() - start)
+    stats = cascade.get_stats()
+
+    rows = []
+    baseline = np.mean(latencies["整块推理"][1:] or latencies["整块推理"]) * 1000
+    for name, values in latencies.items():
+        values = np.array(values[1:] or values) * 1000  # 去掉首帧预热
+        ref_hits = ref_total = gt_hits = gt_total = 0
+        for (_, _, gt), dets, ref in zip(frames, outputs[name], outputs["整块推理"]):
+            ref_total += len(ref)
+            ref_hits += match_detections(dets, np.concatenate([ref[:, 5:6], ref[:, :4]], axis=1), args.iou)
+            if gt is not None:
+                gt_total += len(gt)
+                gt_hits += match_detections(dets, gt, args.iou)
+        rows.append([name, f"{values.mean():.1f}", f"{np.percentile(values, 95):.1f}",
+                     f"{baseline / values.mean():.2f}x", sum(len(d) for d in outputs[name]),
+                     f"{ref_hits / ref_total:.3f}" if ref_total else "-",
+                     f"{gt_hits / gt_total:.3f}" if gt_total else "-"])
+    print_table(["模式", "平均(ms/帧)", "P95(ms)", "加速比", "检测数", "相对整块召回", "真值召回"], rows)
+    print(f"\n级联帧分布: 无候选 {stats['empty_ratio']:.1%}，裁剪推理 {stats['crop_ratio']:.1%}，"
+          f"整块推理 {stats['full_ratio']:.1%}，平均每帧 {stats['crops_per_frame']:.2f} 个裁剪窗口")
+
+
+def bench_cameras(args):
+    """多路虚拟摄像头压力测试：每路一个读取线程，统计实际帧率、丢帧、延迟和断开后的读取失败"""
+    import threading
+    from core.video_handler import VideoHandler
+
+    detector, lock = None, threading.Lock()
+    if args.model:
+        from core.model_handler import ModelHandler
+        detector = ModelHandler()
+        success, message = detector.load_model(args.model)
+        if not success:
+            raise SystemExit(message)
+
+    config = {"jitter_ms": args.jitter_ms, "stall_probability": args.stall_prob,
+              "disconnect_probability": args.disconnect_prob}
+    handlers = []
+    for index in range(args.cameras):
+        handler = VideoHandler()
+        if not handler.open_virtual_camera(args.source, args.fps, dict(config, seed=index)):
+            raise SystemExit(f"无法打开虚拟摄像头: {args.source}")
+        handlers.append(handler)
+
+    frame_times = [[] for _ in handlers]
+    deadline = time.perf_counter() + args.seconds
+
+    def consume(index, handler):
+        # 与帧循环相同：读取最新帧，再推理（多路共用一个模型时串行）或模拟处理耗时
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            frame, ret = handler.get_frame()
+            if not ret:
+                time.sleep(DEFAULT_SETTINGS["fps_update_interval"] / 1000.0)  # 与界面定时器相同，等待下次轮询
+                continue
+            if detector is not None:
+                with lock:
+                    detector.detect(frame)
+            elif args.work_ms:
+                time.sleep(args.work_ms / 1000.0)
+            frame_times[index].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=consume, args=item) for item in enumerate(handlers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = []
+    for index, handler in enumerate(handlers):
+        stats = handler.cap.get_stats()
+        times = np.array(frame_times[index] or [0.0]) * 1000
+        produced = max(1, stats["produced"])
+        rows.append([index, f"{stats['effective_fps']:.1f} / {stats['nominal_fps']:.1f}",
+                     f"{stats['dropped'] / produced:.1%}", stats["read_failures"], stats["stalls"],
+                     stats["disconnects"], f"{stats['latency_ms']:.1f}", f"{stats['latency_p95_ms']:.1f}",
+                     f"{np.percentile(times, 95):.1f}"])
+        handler.release()
+    print_table(["摄像头", "读取/标称帧率", "丢帧率", "读取失败", "卡顿", "断开", "帧延迟(ms)", "延迟P95",
+                 "帧处理P95(ms)"], rows)
+    total = sum(len(t) for t in frame_times)
+    print(f"\n{args.cameras} 路合计处理 {total / args.seconds:.1f} 帧/秒")
+
+
+def bench_tracking(args):
+    """测量不同并发轨迹数下跟踪器每帧耗时，并检查ID是否稳定"""
+    from core.tracker import ObjectTracker
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for count in args.tracks:
+        # 目标在网格上分布，每帧匀速移动并加入抖动，约5%的检测随机漏检
+        side = int(np.ceil(np.sqrt(count)))
+        grid = np.stack(np.meshgrid(np.arange(side), np.arange(side)), axis=-1).reshape(-1, 2)[:count]
+        origin = grid * 40.0
+        speed = rng.uniform(-1, 1, size=(count, 2))
+        tracker = ObjectTracker(max_tracks=max(count * 2, 10))
+        latencies = []
+        id_switches = 0
+        last_ids = np.full(count, -1)
+        for frame_index in range(args.frames):
+            centers = origin + 0.2 * speed * frame_index + rng.normal(0, 0.5, size=(count, 2))
+            dets = np.zeros((count, 6), dtype=np.float32)
+            dets[:, :2] = centers - 10
+            dets[:, 2:4] = centers + 10
+            dets[:, 4] = rng.uniform(0.3, 0.95, size=count)
+            visible = rng.random(count) > 0.05
+            start = time.perf_counter()
+            tracked = tracker.update(dets[visible])
+            latencies.append(time.perf_counter() - start)
+            ids = np.full(count, -1)
+            ids[visible] = tracked[:, 6]
+            both = (ids >= 0) & (last_ids >= 0)
+            id_switches += int(np.sum(ids[both] != last_ids[both]))
+            last_ids = np.where(ids >= 0, ids, last_ids)
+        latencies = np.array(latencies[5:]) * 1000
+        rows.append([count, f"{latencies.mean():.3f}", f"{np.percentile(latencies, 95):.3f}",
+                     tracker.next_id - 1, id_switches])
+    print_table(["轨迹数", "平均(ms/帧)", "P95(ms)", "分配ID数", "ID切换次数"], rows)
+
+
+def bench_heatmap(args):
+    """测量热力图累加和叠加显示的每帧耗时占帧时间的比例"""
+    from core.heatmap import DetectionHeatmap, HeatmapOverlay
+
+    rng = np.random.default_rng(0)
+    height, width = args.height, args.width
+    batches = []
+    for _ in range(args.frames):
+        count = rng.integers(0, args.boxes + 1)
+        xy = rng.uniform(0, [width, height], size=(count, 2))
+        dets = np.zeros((count, 6), dtype=np.float32)
+        dets[:, :2] = xy
+        dets[:, 2:4] = np.minimum(xy + rng.uniform(8, 80, size=(count, 2)), [width, height])
+        dets[:, 4] = rng.uniform(0.3, 1.0, size=count)
+        batches.append(dets)
+
+    session = DetectionHeatmap()
+    overlay = HeatmapOverlay(DetectionHeatmap(half_life=30.0))
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    timings = {"累加(整班+实时)": [], "叠加显示": []}
+    for index, dets in enumerate(batches):
+        start = time.perf_counter()
+        session.add(dets, frame.shape)
+        overlay.heatmap.add(dets, frame.shape, now=index / 30.0)
+        timings["累加(整班+实时)"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        overlay.apply(frame)
+        timings["叠加显示"].append(time.perf_counter() - start)
+
+    frame_budget = DEFAULT_SETTINGS["fps_update_interval"] / 1000.0
+    rows = []
+    for name, values in timings.items():
+        mean = float(np.mean(values))
+        rows.append([name, f"{mean * 1000:.3f}", f"{np.percentile(values, 95) * 1000:.3f}",
+                     f"{100 * mean / frame_budget:.2f}%"])
+    print_table(["步骤", "平均(ms/帧)", "P95(ms)", "占帧时间"], rows)
+    print(f"\n网格尺寸: {session.grid_shape}，累计检测框: {session.detections}")
+
+
+def bench_metrics(args):
+    """测量每帧记录指标的开销占帧时间的比例，并验证指标输出"""
+    import urllib.request
+    from core.metrics import PipelineMetrics, MetricsServer
+
+    metrics = PipelineMetrics()
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(0.001, 0.2, size=(args.iterations, 3))
+    start = time.perf_counter()
+    for capture, inference, total in samples:
+        metrics.observe_frame(capture, inference, total, "ROI_1", 3)
+    per_frame = (time.perf_counter() - start) / args.iterations
+
+    server = MetricsServer(metrics.registry, port=0)
+    success, message = server.start()
+    if not success:
+        raise SystemExit(message)
+    start = time.perf_counter()
+    body = urllib.request.urlopen(server.url, timeout=5).read().decode("utf-8")
+    scrape = time.perf_counter() - start
+    server.stop()
+
+    frame_budget = DEFAULT_SETTINGS["fps_update_interval"] / 1000.0
+    print_table(["项目", "数值"], [
+        ["单帧记录耗时(us)", f"{per_frame * 1e6:.2f}"],
+        ["占帧时间比例", f"{100 * per_frame / frame_budget:.4f}% (帧间隔 {frame_budget * 1000:.0f}ms)"],
+        ["单次抓取耗时(ms)", f"{scrape * 1000:.2f}"],
+        ["输出行数", len(body.splitlines())],
+    ])
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI蒙皮铝屑观察助手 性能基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tiling = subparsers.add_parser("tiling", help="单次推理 vs 切片推理")
+    tiling.add_argument("--model", default=DEFAULT_SETTINGS["default_model"])
+    tiling.add_argument("--source", required=True, help="视频文件或YOLO格式的images文件夹")
+    tiling.add_argument("--roi", help="使用的ROI名称，默认整帧")
+    tiling.add_argument("--frames", type=int, default=200)
+    tiling.add_argument("--conf", type=float, default=0.25)
+    tiling.add_argument("--iou", type=float, default=0.5, help="召回匹配的IoU阈值")
+    tiling.add_argument("--tile-size", type=int)
+    tiling.add_argument("--overlap", type=float)
+    tiling.set_defaults(func=bench_tiling)
+
+    precision = subparsers.add_parser("precision", help="FP32 / INT8 / BF16 精度对比")
+    precision.add_argument("--model", default=DEFAULT_SETTINGS["default_model"])
+    precision.add_argument("--source", required=True, help="视频文件或YOLO格式的images文件夹")
+    precision.add_argument("--variants", nargs="+", default=list(PRECISION_VARIANTS), choices=PRECISION_VARIANTS)
+    precision.add_argument("--calibration", help="静态INT8校准数据目录，默认训练数据目录")
+    precision.add_argument("--frames", type=int, default=100)
+    precision.add_argument("--conf", type=float, default=0.25)
+    precision.add_argument("--iou", type=float, default=0.5, help="一致率/召回匹配的IoU阈值")
+    precision.set_defaults(func=bench_precision)
+
+    lean = subparsers.add_parser("lean", help="通用预测器 vs 精简推理路径")
+    lean.add_argument("--model", default=DEFAULT_SETTINGS["default_model"])
+    lean.add_argument("--source", required=True, help="视频文件或图像文件夹")
+    lean.add_argument("--frames", type=int, default=200)
+    lean.add_argument("--conf", type=float, default=0.25)
+    lean.add_argument("--iou", type=float, default=0.5, help="一致率匹配的IoU阈值")
+    lean.set_defaults(func=bench_lean)
+
+    buffers = subparsers.add_parser("buffers", help="逐帧分配 vs 缓冲区池复用")
+    buffers.add_argument("--source", required=True, help="视频文件")
+    buffers.add_argument("--frames", type=int, default=300)
+    buffers.set_defaults(func=bench_buffers)
+
+    cascade = subparsers.add_parser("cascade", help="整块推理 vs 两级级联检测")
+    cascade.add_argument("--model", default=DEFAULT_SETTINGS["default_model"])
+    cascade.add_argument("--source", required=True, help="录制的视频文件或YOLO格式的images文件夹")
+    cascade.add_argument("--roi", help="使用的ROI名称，默认整帧")
+    cascade.add_argument("--frames", type=int, default=300)
+    cascade.add_argument("--conf", type=float, default=0.25)
+    cascade.add_argument("--iou", type=float, default=0.5, help="召回匹配的IoU阈值")
+    cascade.add_argument("--proposer", choices=["blob", "model"], help="候选方式，默认按配置")
+    cascade.add_argument("--proposal-model", help="轻量候选模型文件")
+    cascade.add_argument("--crop-size", type=int)
+    cascade.add_argument("--max-crops", type=int)
+    cascade.add_argument("--blob-threshold", type=int)
+    cascade.add_argument("--full-every", type=int, help="每隔多少帧强制整块推理（0 表示不强制）")
+    cascade.set_defaults(func=bench_cascade)
+
+    cameras = subparsers.add_parser("cameras", help="多路虚拟摄像头压力测试（无需摄像头）")
+    cameras.add_argument("--source", required=True, help="视频文件或图像文件夹")
+    cameras.add_argument("--cameras", type=int, default=4, help="同时运行的摄像头路数")
+    cameras.add_argument("--seconds", type=float, default=10.0)
+    cameras.add_argument("--fps", type=float, help="每路帧率，默认按配置")
+    cameras.add_argument("--model", help="每帧运行检测（多路共用一个模型）；不指定时按 --work-ms 模拟处理")
+    cameras.add_argument("--work-ms", type=float, default=0.0, help="模拟每帧处理耗时（毫秒）")
+    cameras.add_argument("--jitter-ms", type=float, default=0.0, help="出帧抖动标准差（毫秒）")
+    cameras.add_argument("--stall-prob", type=float, default=0.0, help="每帧卡顿概率")
+    cameras.add_argument("--disconnect-prob", type=float, default=0.0, help="每帧断开概率")
+    cameras.set_defaults(func=bench_cameras)
+
+    tracking = subparsers.add_parser("tracking", help="跟踪器每帧耗时")
+    tracking.add_argument("--tracks", type=int, nargs="+", default=[10, 100, 300, 1000])
+    tracking.add_argument("--frames", type=int, default=100)
+    tracking.set_defaults(func=bench_tracking)
+
+    heatmap = subparsers.add_parser("heatmap", help="热力图累加与叠加开销")
+    heatmap.add_argument("--frames", type=int, default=500)
+    heatmap.add_argument("--boxes", type=int, default=20, help="每帧最多检测框数")
+    heatmap.add_argument("--width", type=int, default=1920)
+    heatmap.add_argument("--height", type=int, default=1080)
+    heatmap.set_defaults(func=bench_heatmap)
+
+    metrics = subparsers.add_parser("metrics", help="指标记录开销")
+    metrics.add_argument("--iterations", type=int, default=100000)
+    metrics.set_defaults(func=bench_metrics)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
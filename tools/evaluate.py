@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+精度与速度评估：在YOLO格式标注集上按配置网格运行模型，输出按帕累托前沿排序的结果表
+
+用法示例:
+    python -m tools.evaluate --data dataset/images --imgsz 320 480 640 --batch 1 4 --threads 2 4
+    python -m tools.evaluate --data dataset/images --roi ROI_1 --crop off on --precisions fp32 dynamic_int8
+    python -m tools.evaluate --data dataset/images --output eval_station3.csv
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_SETTINGS
+from core.detection_utils import detection_true_positives, average_precision, filter_detections
+from core.quantization import PRECISION_VARIANTS
+from tools.benchmark import iter_source_frames, load_roi, print_table
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def set_threads(threads):
+    """设置推理线程数，返回实际生效的线程数"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        return torch.get_num_threads()
+    except ImportError:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        return threads
+
+
+def pareto_ranks(points):
+    """非支配排序：points 为 M x K 数组（每列越大越好），返回每行的前沿层级（0 为帕累托最优）"""
+    points = np.asarray(points, dtype=np.float64)
+    ranks = np.full(len(points), -1)
+    remaining = np.arange(len(points))
+    level = 0
+    while len(remaining):
+        sub = points[remaining]
+        # i 被支配: 存在 j 在所有目标上不差且至少一个目标更好
+        dominated = ((sub[None, :, :] >= sub[:, None, :]).all(axis=2)
+                     & (sub[None, :, :] > sub[:, None, :]).any(axis=2)).any(axis=1)
+        ranks[remaining[~dominated]] = level
+        remaining = remaining[dominated]
+        level += 1
+    return ranks
+
+
+def prepare_samples(frames, roi_for_frame=None):
+    """准备评估样本：按帧尺寸编译ROI，真值只保留中心点在ROI内的目标"""
+    samples = []
+    for name, frame, gt in frames:
+        compiled = None
+        if roi_for_frame is not None:
+            compiled = roi_for_frame(frame)
+            if gt is not None and len(gt):
+                centers = np.stack([(gt[:, 1] + gt[:, 3]) / 2, (gt[:, 2] + gt[:, 4]) / 2], axis=1)
+                gt = gt[compiled.contains(centers)]
+        samples.append((name, frame, gt, compiled))
+    return samples
+
+
+def run_config(handler, samples, imgsz, batch, crop, conf):
+    """按批推理全部样本，返回每张图像的检测结果和每批耗时"""
+    outputs, batch_times = [], []
+    for start in range(0, len(samples), batch):
+        chunk = samples[start:start + batch]
+        images, offsets = [], []
+        for _, frame, _, compiled in chunk:
+            if crop and compiled is not None:
+                x, y, w, h = compiled.bbox
+                x, y = max(0, x), max(0, y)
+                images.append(frame[y:y + h, x:x + w])
+                offsets.append((x, y))
+            else:
+                images.append(frame)
+                offsets.append((0, 0))
+        begin = time.perf_counter()
+        results = handler._run_model(images, imgsz=imgsz, conf=conf)
+        batch_times.append(time.perf_counter() - begin)
+        for (x, y), (_, _, _, compiled), dets in zip(offsets, chunk, results):
+            if x or y:
+                dets = dets.copy()
+                dets[:, [0, 2]] += x
+                dets[:, [1, 3]] += y
+            outputs.append(filter_detections(dets, region=compiled) if compiled is not None else dets)
+    return outputs, batch_times
+
+
+def score(samples, outputs, operating_conf, iou):
+    """mAP50、mAP50-95，以及工作阈值下的召回率和查准率"""
+    confidences, tps = [], []
+    num_gt = op_tp = op_det = 0
+    op_index = int(np.argmin(np.abs(IOU_THRESHOLDS - iou)))
+    for (_, _, gt, _), dets in zip(samples, outputs):
+        gt = gt if gt is not None else np.zeros((0, 5), dtype=np.float32)
+        num_gt += len(gt)
+        dets, tp = detection_true_positives(dets, gt, IOU_THRESHOLDS)
+        confidences.append(dets[:, 4])
+        tps.append(tp)
+        at_threshold = dets[:, 4] >= operating_conf
+        op_det += int(at_threshold.sum())
+        op_tp += int(tp[at_threshold, op_index].sum())
+    ap = average_precision(np.concatenate(confidences), np.concatenate(tps), num_gt)
+    return {
+        "map50": float(ap[0]),
+        "map50_95": float(ap.mean()),
+        "recall": op_tp / num_gt if num_gt else 0.0,
+        "precision": op_tp / op_det if op_det else 0.0,
+        "ground_truth": num_gt,
+    }
+
+
+def evaluate(args):
+    """遍历配置网格，统计精度、延迟分位数和吞吐量"""
+    from core.model_handler import ModelHandler
+
+    handler = ModelHandler()
+    handler.registry = None
+    success, message = handler.load_model(args.model)
+    if not success:
+        raise SystemExit(message)
+    frames = [item for item in iter_source_frames(args.data, args.images) if item[2] is not None]
+    if not frames:
+        raise SystemExit(f"没有找到带YOLO标注的图像: {args.data}")
+    roi_for_frame = load_roi(args.roi) if args.roi else None
+    samples = prepare_samples(frames, roi_for_frame)
+    crops = [c == "on" for c in args.crop] if roi_for_frame is not None else [False]
+    timing = samples[:args.timing_images] if args.timing_images else samples
+    print(f"{len(samples)} 张标注图像，工作阈值 {args.conf}，共 "
+          f"{len(args.precisions) * len(args.backends) * len(args.imgsz) * len(args.batch) * len(args.threads) * len(crops)} 组配置")
+
+    rows, seen = [], set()
+    for precision, backend in itertools.product(args.precisions, args.backends):
+        success, message = handler.set_precision(precision, args.calibration)
+        if not success:
+            print(f"跳过 {precision}: {message}")
+            continue
+        handler.lean_inference = backend == "lean"
+        handler._lean_predictor = None
+        actual = "lean" if handler._get_lean_predictor() is not None else "ultralytics"
+        for imgsz, batch, threads, crop in itertools.product(args.imgsz, args.batch, args.threads, crops):
+            key = (precision, actual, imgsz, batch, threads, crop)
+            if key in seen:
+                continue  # 模型不支持精简路径时两种后端相同
+            seen.add(key)
+            threads = set_threads(threads)
+            # 精度按低置信度下的全部检测计算mAP，耗时按工作阈值单独测量
+            outputs, _ = run_config(handler, samples, imgsz, batch, crop, args.eval_conf)
+            metrics = score(samples, outputs, args.conf, args.iou)
+            run_config(handler, timing[:batch], imgsz, batch, crop, args.conf)  # 预热
+            _, batch_times = run_config(handler, timing, imgsz, batch, crop, args.conf)
+            latency = np.array(batch_times) * 1000
+            rows.append(dict(metrics, variant=precision, backend=actual, imgsz=imgsz, batch=batch,
+                             threads=threads, crop="on" if crop else "off",
+                             p50=float(np.percentile(latency, 50)), p95=float(np.percentile(latency, 95)),
+                             p99=float(np.percentile(latency, 99)),
+                             throughput=len(timing) / latency.sum() * 1000))
+            print(f"  {precision}/{actual} imgsz={imgsz} batch={batch} threads={threads} crop={rows[-1]['crop']}: "
+                  f"mAP50 {metrics['map50']:.3f}，{rows[-1]['throughput']:.1f} 张/秒")
+    if not rows:
+        raise SystemExit("没有可运行的配置")
+
+    # 目标: 精度（mAP50）越高越好、P95延迟越低越好、吞吐量越高越好
+    ranks = pareto_ranks([[r["map50"], -r["p95"], r["throughput"]] for r in rows])
+    for row, rank in zip(rows, ranks):
+        row["pareto_rank"] = int(rank)
+    rows.sort(key=lambda r: (r["pareto_rank"], -r["map50"], -r["throughput"]))
+
+    print()
+    print_table(["前沿", "推理精度", "后端", "imgsz", "batch", "线程", "ROI裁剪", "mAP50", "mAP50-95",
+                 f"召回率@{args.conf}", f"查准率@{args.conf}", "P50(ms/批)", "P95", "P99", "吞吐(张/秒)"],
+                [["★" if r["pareto_rank"] == 0 else r["pareto_rank"], r["variant"], r["backend"], r["imgsz"],
+                  r["batch"], r["threads"], r["crop"], f"{r['map50']:.3f}", f"{r['map50_95']:.3f}",
+                  f"{r['recall']:.3f}", f"{r['precision']:.3f}", f"{r['p50']:.1f}", f"{r['p95']:.1f}",
+                  f"{r['p99']:.1f}", f"{r['throughput']:.1f}"] for r in rows])
+    print("\n★ 为帕累托最优配置（mAP50、P95延迟、吞吐量三者无法同时被其他配置超越）")
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"结果已保存到 {args.output}")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI蒙皮铝屑观察助手 精度与速度评估")
+    parser.add_argument("--data", required=True, help="YOLO格式的images文件夹（同级labels文件夹为标注）")
+    parser.add_argument("--model", default=DEFAULT_SETTINGS["default_model"])
+    parser.add_argument("--images", type=int, help="最多使用的图像数量")
+    parser.add_argument("--timing-images", type=int, default=100, help="测量耗时使用的图像数量（0 表示全部）")
+    parser.add_argument("--conf", type=float, default=DEFAULT_SETTINGS["confidence"], help="工作置信度阈值")
+    parser.add_argument("--eval-conf", type=float, default=0.01, help="计算mAP时的置信度下限")
+    parser.add_argument("--iou", type=float, default=0.5, help="召回率/精度的IoU阈值")
+    parser.add_argument("--precisions", nargs="+", default=["fp32"], choices=PRECISION_VARIANTS)
+    parser.add_argument("--calibration", help="静态INT8校准数据目录")
+    parser.add_argument("--backends", nargs="+", default=["lean", "ultralytics"], choices=["lean", "ultralytics"])
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640])
+    parser.add_argument("--batch", type=int, nargs="+", default=[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--roi", help="ROI名称：只评估ROI内的目标")
+    parser.add_argument("--crop", nargs="+", default=["off", "on"], choices=["off", "on"],
+                        help="是否只对ROI外接矩形推理（需要 --roi）")
+    parser.add_argument("--output", help="结果CSV文件")
+    evaluate(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
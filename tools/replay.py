@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+检测会话回放与对比
+
+用法示例:
+    python -m tools.replay run sessions/session_20250101_080000 --mode max_speed
+    python -m tools.replay compare sessions/session_20250101_080000 results_new.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULT_SETTINGS
+from core.roi_geometry import CompiledROI
+from core.session_replay import RESULT_FILE, ReplaySource, load_results, compare_results
+
+
+def print_comparison(reference_path, candidate_path, iou):
+    """打印两次运行的逐帧对比结果"""
+    report = compare_results(load_results(reference_path), load_results(candidate_path), iou)
+    ref_mean, ref_p95 = report["reference_latency"]
+    cand_mean, cand_p95 = report["candidate_latency"]
+    print(f"对比帧数: {report['frames']}（缺失 {report['missing']} 帧）")
+    print(f"检测结果一致率: {report['agreement']:.4f}，结果不同的帧: {len(report['mismatched_frames'])}")
+    if report["mismatched_frames"]:
+        print(f"  前20帧: {report['mismatched_frames'][:20]}")
+    print(f"单帧耗时  参考: 平均 {ref_mean:.2f} ms / P95 {ref_p95:.2f} ms")
+    print(f"          本次: 平均 {cand_mean:.2f} ms / P95 {cand_p95:.2f} ms")
+
+
+def run_session(args):
+    """用当前版本的推理流程重跑会话，逐帧记录检测结果和耗时，并与录制时的结果对比"""
+    from core.model_handler import ModelHandler
+
+    replay = ReplaySource(args.session, args.mode)
+    if not replay.is_opened():
+        raise SystemExit(f"无法打开会话: {args.session}")
+    settings = replay.settings
+    handler = ModelHandler()
+    success, message = handler.load_model(args.model or settings.get("model_path") or DEFAULT_SETTINGS["default_model"])
+    if not success:
+        raise SystemExit(message)
+    if settings.get("precision", "fp32") != "fp32":
+        handler.set_precision(settings["precision"])
+
+    recorded = {}
+    if os.path.exists(os.path.join(args.session, RESULT_FILE)):
+        recorded = load_results(args.session)
+    roi = settings.get("roi")
+    compiled = CompiledROI(roi["name"], roi["points"]) if roi else None
+    output = args.output or os.path.join(args.session, "replay_results.jsonl")
+
+    count = 0
+    with open(output, "w", encoding="utf-8") as f:
+        while True:
+            frame, ret = replay.read()
+            if not ret:
+                break
+            # 使用录制时该帧生效的置信度，保证对比条件一致
+            record = recorded.get(replay.last_index, {})
+            handler.confidence_threshold = record.get("confidence", settings.get("confidence", 0.5))
+            start = time.perf_counter()
+            if compiled is not None and record.get("roi", compiled.name) is not None:
+                detections = handler.detect_in_roi(frame, compiled, compiled.name)
+            else:
+                detections = handler._run_model(frame)[0]
+            latency = time.perf_counter() - start
+            f.write(json.dumps({"index": replay.last_index, "latency_ms": round(latency * 1000, 3),
+                                "detections": np.round(detections[:, :6], 2).tolist()}) + "\n")
+            count += 1
+    replay.release()
+    print(f"回放完成: {count} 帧，结果已保存到 {output}\n")
+    if recorded:
+        print_comparison(args.session, output, args.iou)
+
+
+def compare_runs(args):
+    """对比两个结果文件（或会话目录中的结果）"""
+    print_comparison(args.reference, args.candidate, args.iou)
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI蒙皮铝屑观察助手 检测会话回放")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="用当前版本重跑录制的会话")
+    run.add_argument("session", help="会话目录")
+    run.add_argument("--mode", choices=["original", "max_speed"], default="max_speed",
+                     help="original: 按录制时的帧间隔; max_speed: 尽可能快")
+    run.add_argument("--model", help="模型文件，默认使用会话录制时的模型")
+    run.add_argument("--output", help="结果文件，默认保存到会话目录")
+    run.add_argument("--iou", type=float, default=0.5, help="结果匹配的IoU阈值")
+    run.set_defaults(func=run_session)
+
+    compare = subparsers.add_parser("compare", help="逐帧对比两次运行的结果")
+    compare.add_argument("reference", help="参考结果文件或会话目录")
+    compare.add_argument("candidate", help="待对比的结果文件或会话目录")
+    compare.add_argument("--iou", type=float, default=0.5)
+    compare.set_defaults(func=compare_runs)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,19 @@ from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtCore import Qt, QTimer
 
 from config import (APP_VERSION, APP_TITLE, DEFAULT_SETTINGS, STYLES, 
-                   FUNCTION_BUTTONS, FILE_FILTERS, VIDEO_CODECS)
+                   FUNCTION_BUTTONS, FILE_FILTERS, VIDEO_CODECS, METRICS_CONFIG,
+                   ALERT_CONFIG, TRACKING_CONFIG, HEATMAP_CONFIG, SESSION_CONFIG, MODEL_SWAP_CONFIG)
 from core.model_handler import ModelHandler
 from core.video_handler import VideoHandler
 from core.roi_handler import ROIHandler
+from core.roi_geometry import CompiledROI
+from core.metrics import PipelineMetrics, MetricsServer
+from core.alerts import AlertManager
+from core.frame_pool import shade_outside_roi
+from core.heatmap import DetectionHeatmap, HeatmapOverlay
+from core.session_replay import SessionRecorder, RecordedROI
+from core.smart_capture import SmartCapture
+from core.cpu_governor import CPUGovernor
 from ui.roi_panel import ROIPanel
 
 
@@ -30,27 +39,54 @@ class UIState(Enum):
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
+        # 在打开视频源和加载模型之前按CPU预算分配线程
+        self.cpu_governor = CPUGovernor()
+        self.cpu_governor.apply()
+        
         # 初始化处理器
         self.model_handler = ModelHandler()
         self.video_handler = VideoHandler()
+        self.model_handler.buffer_pool = self.video_handler.buffer_pool
         self.roi_handler = ROIHandler()
         
+        # 可选的本地指标服务
+        self.metrics = None
+        self.metrics_server = None
+        if METRICS_CONFIG["enabled"]:
+            self.metrics = PipelineMetrics(self.video_handler, self.model_handler, self.roi_handler)
+            self.metrics_server = MetricsServer(self.metrics.registry)
+
+        # 检测会话录制（原始画面+时间戳+设置，用于在开发机上回放复现）
+        self.session_recorder = None
+        self.replay_roi = None  # 会话回放时使用录制时的ROI顶点
+
+        # 可选的检测热力图：整班累计（用于导出）+ 带衰减的实时热力图（用于叠加显示）
+        self.session_heatmap = None
+        self.heatmap_overlay = None
+        self.show_heatmap = False
+        if HEATMAP_CONFIG["enabled"]:
+            self.session_heatmap = DetectionHeatmap()
+            self.heatmap_overlay = HeatmapOverlay(DetectionHeatmap(half_life=HEATMAP_CONFIG["live_half_life"]))
+        
         # 初始化UI状态
         self.timer = QTimer(self)
         self.pulse_timer = QTimer(self)
         self.record_timer = QTimer(self)
+        self.swap_timer = QTimer(self)  # 检查后台模型加载结果
         self.pulse_phase = 0
         self.recording_mode = False
+        self.smart_capture = None  # 录制模式下的智能采集（只保存画面有变化的帧）
         self.roi_mode = False
         self.ui_state = UIState.IDLE  # 初始化UI状态
         self.is_editing_roi = False
         self.unscaled_pixmap = None
         self.confidence_threshold = 0.5
         self.last_frame_time = time.time()
-        # ROI警告闪烁相关
+        # ROI报警：滞回状态机 + 异步输出，闪烁只切换颜色标志，由下一帧绘制
+        self.alert_manager = AlertManager()
         self.roi_alert_flash = False
         self.roi_alert_timer = QTimer(self)
-        self.roi_alert_timer.setInterval(200)
+        self.roi_alert_timer.setInterval(ALERT_CONFIG["flash_interval"])
         self.roi_alert_timer.timeout.connect(self._toggle_roi_alert_flash)
         
         # 添加检测控制标志
@@ -61,6 +97,11 @@ class MainWindow(QMainWindow):
         self.load_default_model()
         self.setup_roi_connections()
         self._set_ui_state(UIState.IDLE)  # 设置初始UI状态
+        if self.roi_handler.has_recoverable_drawing():
+            self.statusBar().showMessage("检测到上次未完成的ROI，点击\"创建新的ROI\"可恢复", 5000)
+        if self.metrics_server:
+            _, message = self.metrics_server.start()
+            self.statusBar().showMessage(message, 5000)
 
     def init_ui(self):
         """初始化用户界面"""
@@ -84,6 +125,7 @@ class MainWindow(QMainWindow):
         self.timer.timeout.connect(self.update_frame)
         self.pulse_timer.timeout.connect(self.update_pulse_effect)
         self.record_timer.timeout.connect(self.update_record_button)
+        self.swap_timer.timeout.connect(self.poll_model_swap)
         # roi_alert_timer已在__init__中连接
 
     def create_styled_frame(self, shape=QFrame.Shape.StyledPanel):
@@ -105,13 +147,17 @@ class MainWindow(QMainWindow):
         self.add_separator(sidebar_layout, Qt.Orientation.Horizontal)
 
         # 创建功能按钮
+        self.function_buttons = {}
         for text, method_name in FUNCTION_BUTTONS:
             btn = QPushButton(text)
             btn.setStyleSheet(STYLES["BUTTON"])
             btn.clicked.connect(getattr(self, method_name))
             sidebar_layout.addWidget(btn)
+            self.function_buttons[method_name] = btn
 
         self.add_confidence_slider(sidebar_layout)
+        if self.session_heatmap is not None:
+            self.add_heatmap_buttons(sidebar_layout)
         sidebar_layout.addStretch()
         self.add_separator(sidebar_layout, Qt.Orientation.Horizontal)
 
@@ -175,8 +221,14 @@ class MainWindow(QMainWindow):
         self.record_btn.setMinimumSize(150, 40)
         self.record_btn.clicked.connect(self.toggle_recording)
 
+        self.smart_capture_btn = QPushButton("智能采集")
+        self.smart_capture_btn.setStyleSheet(STYLES["LARGE_BUTTON"])
+        self.smart_capture_btn.setMinimumSize(150, 40)
+        self.smart_capture_btn.clicked.connect(self.toggle_smart_capture)
+
         record_panel_layout.addWidget(self.select_path_btn)
         record_panel_layout.addWidget(self.record_btn)
+        record_panel_layout.addWidget(self.smart_capture_btn)
         record_panel_layout.addStretch()
 
         video_layout.addWidget(self.record_panel)
@@ -193,6 +245,22 @@ class MainWindow(QMainWindow):
         
         self.add_separator_to_status_bar()
         
+        self.cpu_info_label = QLabel(f"<b>CPU:</b> {self.cpu_governor.describe()}")
+        self.cpu_info_label.setStyleSheet("font-weight: bold;")
+        self.cpu_info_label.setToolTip(self.cpu_governor.get_details())
+        self.statusBar().addPermanentWidget(self.cpu_info_label)
+
+        # 启用目标跟踪时显示时间窗口内出现的不同铝屑数量
+        if self.model_handler.tracking is not None:
+            self.add_separator_to_status_bar()
+            self.unique_count_label = QLabel()
+            self.unique_count_label.setStyleSheet("font-weight: bold;")
+            self.unique_count_label.setToolTip(f"最近 {TRACKING_CONFIG['count_window_seconds']} 秒内新出现的不同铝屑数量")
+            self.statusBar().addPermanentWidget(self.unique_count_label)
+            self._update_unique_count(None)
+        
+        self.add_separator_to_status_bar()
+        
         self.version_label = QLabel(f"<b>版本:</b> {APP_VERSION}")
         self.version_label.setStyleSheet("font-weight: bold;")
         self.statusBar().addPermanentWidget(self.version_label)
@@ -321,6 +389,7 @@ class MainWindow(QMainWindow):
                                                                Qt.AspectRatioMode.KeepAspectRatio,
                                                                Qt.TransformationMode.SmoothTransformation))
             return
+        self.roi_handler.set_frame_size(frame.shape)
 
         points = self.roi_handler.get_current_points()
         
@@ -341,18 +410,7 @@ class MainWindow(QMainWindow):
             else:
                 # 非编辑（保存/预览）模式: 半透明灰色线条
                 if len(points) > 2:
-                    overlay = np.full_like(frame, (200, 200, 200), dtype=np.uint8)
-                    cv2.fillPoly(overlay, [np_points], (0, 0, 0))
-                    alpha = 0.18
-                    mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-                    cv2.fillPoly(mask, [np_points], 255)
-                    inv_mask = cv2.bitwise_not(mask)
-                    for c in range(3):
-                        frame[..., c] = np.where(
-                            inv_mask == 255,
-                            cv2.addWeighted(overlay[..., c], alpha, frame[..., c], 1 - alpha, 0),
-                            frame[..., c]
-                        )
+                    self._shade_outside_roi(frame, CompiledROI(None, np_points), (200, 200, 200), 0.18)
                     cv2.polylines(frame, [np_points], isClosed=True, color=(150, 150, 150), thickness=2)
 
         self.display_frame(frame)
@@ -361,11 +419,22 @@ class MainWindow(QMainWindow):
         if self.is_editing_roi and len(points) > 0:
             self.roi_panel.update_coordinates(points)
 
+    def _shade_outside_roi(self, frame, compiled, color, alpha):
+        """对ROI外部区域叠加半透明颜色（原地修改），使用编译ROI缓存的整帧掩码"""
+        shade_outside_roi(frame, compiled, color, alpha, self.video_handler.buffer_pool)
+
+    def _update_unique_count(self, roi_name):
+        """刷新不同铝屑数量显示"""
+        count = self.model_handler.get_unique_count(roi_name)
+        text = f"<b>铝屑:</b> {count or 0} / {TRACKING_CONFIG['count_window_seconds']}s"
+        if self.unique_count_label.text() != text:
+            self.unique_count_label.setText(text)
+
     def display_frame(self, frame):
         """显示帧"""
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        qt_image = QImage(rgb_image.data, w, h, ch * w, QImage.Format.Format_RGB888)
+        # 直接按BGR格式构造QImage，省去每帧的RGB转换副本（QPixmap.fromImage会复制数据）
+        h, w = frame.shape[:2]
+        qt_image = QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_BGR888)
         
         # 存储原始的、未缩放的pixmap
         self.unscaled_pixmap = QPixmap.fromImage(qt_image)
@@ -386,6 +455,7 @@ class MainWindow(QMainWindow):
         """处理当前活动ROI变化的槽函数"""
         if roi_name:  # 只有当选择了有效的ROI名称时才处理
             self.roi_handler.set_active_roi(roi_name)
+            self._set_alert_flash(self.alert_manager.is_active(roi_name))
             self.is_editing_roi = False  # 切换ROI时，默认为非编辑状态
             self.update_roi_display()
             self.statusBar().showMessage(f"已切换到ROI: {roi_name}", 2000)
@@ -398,6 +468,9 @@ class MainWindow(QMainWindow):
         current_name = self.roi_handler.get_active_roi_name()
         if current_name and name and current_name != name:
             self.roi_handler.rename_roi(current_name, name)
+            self.model_handler.invalidate_roi_cache(current_name)
+            self.model_handler.reset_tracking(current_name)
+            self.alert_manager.reset(current_name)
             # 更新ROI选择器以反映名称变化
             self.update_roi_panel()
 
@@ -405,11 +478,15 @@ class MainWindow(QMainWindow):
         """处理坐标变化的槽函数"""
         active_roi = self.roi_handler.get_active_roi_name()
         if active_roi:
-            points = self.roi_handler.get_roi_points(active_roi)
+            # 在副本上修改，校验失败时保持原ROI不变
+            points = [list(p) for p in self.roi_handler.get_roi_points(active_roi)]
             if 0 <= index < len(points):
                 points[index] = [x, y]
                 if self.roi_handler.update_roi_points(active_roi, points):
+                    self.model_handler.invalidate_roi_cache(active_roi)
                     self.update_roi_display()
+                else:
+                    self.statusBar().showMessage("坐标无效：ROI多边形不能自相交", 3000)
 
     def on_clear_roi_requested(self):
         """处理清除ROI请求的槽函数"""
@@ -447,6 +524,9 @@ class MainWindow(QMainWindow):
                     deleted_index = -1
 
                 if self.roi_handler.clear_current_roi():
+                    self.model_handler.invalidate_roi_cache(active_roi_name)
+                    self.model_handler.reset_tracking(active_roi_name)
+                    self.alert_manager.reset(active_roi_name)
                     self.statusBar().showMessage(f"已删除ROI: {active_roi_name}", 3000)
 
                     # 确定下一个要选中的ROI
@@ -510,7 +590,7 @@ class MainWindow(QMainWindow):
             self.start_stop_btn.setText("开始检测")
             self.start_stop_btn.setStyleSheet(STYLES["START_BUTTON"])
         else:
-            self.statusBar().showMessage("保存失败，请确保ROI至少包含3个点", 3000)
+            self.statusBar().showMessage("保存失败，请确保ROI至少包含3个点且边线不自相交", 3000)
 
     def on_create_new_roi_requested(self):
         """处理创建新ROI的请求"""
@@ -525,12 +605,24 @@ class MainWindow(QMainWindow):
         if self.timer.isActive():
             self.toggle_video()
         
-        # 清除之前的绘制点和活动ROI
-        self.roi_handler.clear_drawing_points()
-        self.roi_handler.set_active_roi(None)
+        # 上次异常退出时有未完成的ROI，询问是否恢复
+        recover = False
+        if self.roi_handler.has_recoverable_drawing():
+            point_count = len(self.roi_handler.get_recoverable_points())
+            reply = QMessageBox.question(self, '恢复ROI',
+                                         f"检测到上次未完成的ROI（{point_count}个顶点），是否恢复？",
+                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                         QMessageBox.StandardButton.Yes)
+            recover = reply == QMessageBox.StandardButton.Yes
         
-        # 开始绘制新ROI
-        self.roi_handler.start_drawing()
+        self.roi_handler.set_active_roi(None)
+        if recover:
+            # 恢复未完成的ROI，继续绘制
+            self.roi_handler.recover_drawing()
+        else:
+            # 清除之前的绘制点，开始绘制新ROI
+            self.roi_handler.clear_drawing_points()
+            self.roi_handler.start_drawing()
         self.is_editing_roi = True
         
         # 生成唯一的ROI名称并设置
@@ -671,6 +763,36 @@ class MainWindow(QMainWindow):
             lambda value: self.update_slider_style(value, confidence_label))
         layout.addWidget(self.confidence_slider)
 
+    def add_heatmap_buttons(self, layout):
+        """添加热力图显示和导出按钮"""
+        self.heatmap_btn = QPushButton("显示热力图")
+        self.heatmap_btn.setCheckable(True)
+        self.heatmap_btn.setStyleSheet(STYLES["BUTTON"])
+        self.heatmap_btn.toggled.connect(self.toggle_heatmap)
+        layout.addWidget(self.heatmap_btn)
+
+        export_btn = QPushButton("导出热力图")
+        export_btn.setStyleSheet(STYLES["BUTTON"])
+        export_btn.clicked.connect(self.export_heatmap)
+        layout.addWidget(export_btn)
+
+    def toggle_heatmap(self, checked):
+        """切换热力图叠加显示"""
+        self.show_heatmap = checked
+        self.heatmap_btn.setText("隐藏热力图" if checked else "显示热力图")
+
+    def export_heatmap(self):
+        """导出整班累计热力图（PNG图像和NPZ原始数组）"""
+        if self.session_heatmap.frames == 0:
+            self.statusBar().showMessage("热力图暂无数据", 3000)
+            return
+        try:
+            image_path, array_path = self.session_heatmap.export()
+        except OSError as e:
+            QMessageBox.warning(self, "导出失败", f"导出热力图失败: {e}")
+            return
+        self.statusBar().showMessage(f"热力图已导出: {image_path}, {array_path}", 5000)
+
     def hsv_to_hex(self, h, s, v):
         """HSV转十六进制颜色"""
         r, g, b = colorsys.hsv_to_rgb(h, s, v)
@@ -728,11 +850,30 @@ class MainWindow(QMainWindow):
         self.exit_roi_mode()
         model_path, _ = QFileDialog.getOpenFileName(
             self, "选择YOLO模型文件", "", FILE_FILTERS["model"])
-        if model_path:
-            success, message = self.model_handler.load_model(model_path)
-            self.update_model_info()
+        if not model_path:
+            return
+        if self.model_handler.is_model_loaded():
+            # 已有模型时在后台加载预热，当前模型继续检测，完成后在两帧之间切换
+            success, message = self.model_handler.begin_model_swap(model_path)
+            if success:
+                self.swap_timer.start(MODEL_SWAP_CONFIG["poll_interval"])
             self.statusBar().showMessage(message, 3000)
+            return
+        success, message = self.model_handler.load_model(model_path)
+        self.update_model_info()
+        self.statusBar().showMessage(message, 3000)
+        self.check_ready_state()
+
+    def poll_model_swap(self):
+        """定时检查后台模型加载，完成后切换模型并显示结果；试用期结束后停止检查"""
+        result = self.model_handler.poll_model_swap()
+        if result is not None:
+            success, message = result
+            self.update_model_info()
+            self.statusBar().showMessage(message, 5000)
             self.check_ready_state()
+        if not self.model_handler.is_swapping():
+            self.swap_timer.stop()
 
     def load_default_model(self):
         """加载默认模型"""
@@ -751,6 +892,7 @@ class MainWindow(QMainWindow):
         """打开USB摄像头"""
         self.exit_recording_mode()
         self.exit_roi_mode()
+        self._stop_session_recording()
         if self.video_handler.open_camera(0):
             self.statusBar().showMessage("摄像头已打开", 3000)
             self.check_ready_state()
@@ -763,6 +905,7 @@ class MainWindow(QMainWindow):
         """打开视频文件"""
         self.exit_recording_mode()
         self.exit_roi_mode()
+        self._stop_session_recording()
         video_path, _ = QFileDialog.getOpenFileName(
             self, "选择视频文件", "", FILE_FILTERS["video"])
         if video_path and self.video_handler.open_video(video_path):
@@ -771,7 +914,75 @@ class MainWindow(QMainWindow):
             frame, ret = self.video_handler.get_frame()
             if ret:
                 self.display_frame(frame)
-                self.video_handler.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self.video_handler.rewind()
+
+    def open_session_replay(self):
+        """打开录制的检测会话回放"""
+        self.exit_recording_mode()
+        self.exit_roi_mode()
+        self._stop_session_recording()
+        session_dir = QFileDialog.getExistingDirectory(self, "选择会话目录", SESSION_CONFIG["dir"])
+        if not session_dir:
+            return
+        if not self.video_handler.open_replay(session_dir):
+            self.statusBar().showMessage(f"无法打开会话: {session_dir}", 3000)
+            return
+        # 恢复录制时的置信度设置；ROI按录制的顶点重建，不受录制后的编辑或删除影响
+        settings = self.video_handler.replay.settings
+        self.confidence_slider.setValue(int(round(settings.get("confidence", self.confidence_threshold) * 100)))
+        roi = settings.get("roi")
+        self.replay_roi = RecordedROI(roi)
+        message = f"会话回放已加载: {session_dir}"
+        if roi:
+            current = []
+            if roi["name"] in self.roi_handler.get_roi_names():
+                self.roi_handler.set_active_roi(roi["name"])
+                width, height = self.video_handler.replay.session["frame_size"]
+                current = self.roi_handler.get_compiled_roi(roi["name"], (height, width)).to_list()
+            if self.replay_roi.differs_from(current):
+                message += f"（ROI '{roi['name']}' 已修改或删除，按录制时的顶点回放）"
+        self.statusBar().showMessage(message, 5000)
+        self.check_ready_state()
+
+    def _session_settings(self):
+        """会话录制时记录的设置"""
+        active_roi = self.roi_handler.get_active_roi_name() if self.roi_handler.is_roi_enabled() else None
+        return {
+            "confidence": self.confidence_threshold,
+            "roi": {"name": active_roi, "points": self.roi_handler.get_roi_points(active_roi)} if active_roi else None,
+            "model_path": self.model_handler.current_model_path,
+            "model_hash": self.model_handler.model_hash,
+            "precision": self.model_handler.precision,
+            "tiling": self.model_handler.tiling_enabled,
+            "auto_imgsz": self.model_handler.auto_imgsz,
+            "app_version": APP_VERSION,
+        }
+
+    def toggle_session_recording(self):
+        """开始或停止录制检测会话"""
+        if self.session_recorder is not None:
+            self._stop_session_recording()
+            return
+        if not self.video_handler.is_video_ready() or self.video_handler.is_replay():
+            self.statusBar().showMessage("请先打开摄像头或视频文件", 3000)
+            return
+        cap = self.video_handler.cap
+        shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
+        recorder = SessionRecorder()
+        success, message = recorder.start(shape, cap.get(cv2.CAP_PROP_FPS), self._session_settings())
+        self.statusBar().showMessage(message, 3000)
+        if success:
+            self.session_recorder = recorder
+            self.function_buttons["toggle_session_recording"].setText("停止录制会话")
+
+    def _stop_session_recording(self):
+        """停止会话录制（写完剩余帧）"""
+        if self.session_recorder is None:
+            return
+        _, message = self.session_recorder.stop()
+        self.session_recorder = None
+        self.function_buttons["toggle_session_recording"].setText("录制检测会话")
+        self.statusBar().showMessage(message, 5000)
 
     def check_ready_state(self):
         """检查就绪状态"""
@@ -803,12 +1014,15 @@ class MainWindow(QMainWindow):
             self.start_stop_btn.setStyleSheet(STYLES["START_BUTTON"])
             self.statusBar().showMessage("检测已停止", 2000)
             self.fps_label.setText("FPS: --")
+            self._set_alert_flash(False)
+            self.alert_manager.reset()
+            self.model_handler.reset_tracking()
         else:
             # 重置停止标志
             self.should_stop_detection = False
             self.video_handler.frame_count = 0
             self.video_handler.last_time = time.time()
-            self.timer.start(DEFAULT_SETTINGS["fps_update_interval"])
+            self.timer.start(self.video_handler.get_timer_interval(DEFAULT_SETTINGS["fps_update_interval"]))
             self.pulse_timer.start(50)
             self.start_stop_btn.setText("停止检测")
             self.start_stop_btn.setStyleSheet(STYLES["STOP_BUTTON"])
@@ -826,7 +1040,17 @@ class MainWindow(QMainWindow):
         start_time = time.time()
         
         frame, ret = self.video_handler.get_frame()
+        capture_time = time.time()
+        if ret:
+            self.roi_handler.set_frame_size(frame.shape)
         if not ret:
+            if self.video_handler.is_playback_finished():
+                # 单次播放模式：视频结束后停止检测
+                self.toggle_video()
+                self.statusBar().showMessage("视频播放结束", 3000)
+                return
+            if self.metrics:
+                self.metrics.read_failures.inc()
             self.statusBar().showMessage("无法读取视频帧", 2000)
             return
 
@@ -834,60 +1058,92 @@ class MainWindow(QMainWindow):
         if self.recording_mode:
             self.display_frame(frame)
             if self.video_handler.is_recording():
+                record_start = time.time()
                 self.video_handler.write_frame(frame)
+                if self.metrics:
+                    self.metrics.observe_record(time.time() - record_start)
+            if self.smart_capture is not None:
+                detect = self.model_handler.detect if self.model_handler.is_model_loaded() else None
+                self.smart_capture.offer(frame, detect)
             # 使用video_handler的FPS计算方法获取真实FPS
             fps = self.video_handler.update_fps_counter()
             if fps is not None:
                 self.fps_label.setText(f"FPS: {fps:.2f}")
+                if self.smart_capture is not None:
+                    stats = self.smart_capture.get_stats()
+                    self.statusBar().showMessage(
+                        f"智能采集: 已保留 {stats['kept']} 帧 | 每分钟保留 {stats['kept_per_minute']:.0f} / "
+                        f"跳过 {stats['skipped_per_minute']:.0f}")
             return
 
-        # 非ROI模式下，进行目标检测
-        active_roi = self.roi_handler.get_active_roi_name() if self.roi_handler.is_roi_enabled() else None
+        session_index = None
+        if self.session_recorder is not None:
+            session_index = self.session_recorder.add_frame(frame, capture_time)
+
+        # 非ROI模式下，进行目标检测；会话回放使用录制时的ROI
+        replaying = self.video_handler.is_replay() and self.replay_roi is not None
+        roi_source = self.replay_roi if replaying else self.roi_handler
+        active_roi = roi_source.get_active_roi_name() if roi_source.is_roi_enabled() else None
         
         # 首先对原始帧进行处理
         processed_frame, detected_class0 = self.model_handler.process_frame(
             frame,
             confidence_threshold=self.confidence_threshold,
-            roi=self.roi_handler if active_roi else None
+            roi=roi_source if active_roi else None,
+            frame_id=self.video_handler.get_frame_id()
         )
+        inference_time = time.time()
+        if session_index is not None:
+            self.session_recorder.add_result(session_index, self.model_handler.last_detections,
+                                             inference_time - capture_time,
+                                             confidence=self.confidence_threshold, roi=active_roi)
+
+        if self.session_heatmap is not None:
+            detections = self.model_handler.last_detections
+            self.session_heatmap.add(detections, processed_frame.shape)
+            self.heatmap_overlay.heatmap.add(detections, processed_frame.shape)
+            if self.show_heatmap:
+                self.heatmap_overlay.apply(processed_frame)
 
         # ROI外部颜色逻辑
         if active_roi:
-            points = self.roi_handler.get_roi_points(active_roi)
-            if len(points) > 2:
-                np_points = np.array(points, np.int32)
-                # 检查是否需要红色闪烁
-                if detected_class0:
-                    if not self.roi_alert_timer.isActive():
-                        self.roi_alert_flash = True
-                        self.roi_alert_timer.start()
-                    color = (0, 0, 255) if self.roi_alert_flash else (200, 200, 200)
-                    alpha = 0.28 if self.roi_alert_flash else 0.18
-                else:
-                    if self.roi_alert_timer.isActive():
-                        self.roi_alert_timer.stop()
-                        self.roi_alert_flash = False
-                    color = (200, 200, 200)
-                    alpha = 0.18
-                overlay = np.full_like(processed_frame, color, dtype=np.uint8)
-                cv2.fillPoly(overlay, [np_points], (0, 0, 0))
-                mask = np.zeros(processed_frame.shape[:2], dtype=np.uint8)
-                cv2.fillPoly(mask, [np_points], 255)
-                inv_mask = cv2.bitwise_not(mask)
-                for c in range(3):
-                    processed_frame[..., c] = np.where(
-                        inv_mask == 255,
-                        cv2.addWeighted(overlay[..., c], alpha, processed_frame[..., c], 1 - alpha, 0),
-                        processed_frame[..., c]
-                    )
-                cv2.polylines(processed_frame, [np_points], isClosed=True, color=(150, 150, 150), thickness=1)
+            compiled = roi_source.get_compiled_roi(active_roi, processed_frame.shape)
+            if compiled is not None and len(compiled) > 2:
+                # 报警状态只在触发/解除时变化，闪烁由定时器切换颜色标志
+                change = self.alert_manager.update(active_roi, detected_class0)
+                if change == "raised":
+                    self._set_alert_flash(True)
+                elif change == "cleared":
+                    self._set_alert_flash(False)
+                color = (0, 0, 255) if self.roi_alert_flash else (200, 200, 200)
+                alpha = 0.28 if self.roi_alert_flash else 0.18
+                self._shade_outside_roi(processed_frame, compiled, color, alpha)
+                cv2.polylines(processed_frame, [compiled.points], isClosed=True, color=(150, 150, 150), thickness=1)
 
         self.display_frame(processed_frame)
-        
+        if self.model_handler.tracking is not None:
+            self._update_unique_count(active_roi)
+
         # ... 计算并显示FPS ...
         self.last_frame_time = time.time()
         fps = 1.0 / (self.last_frame_time - start_time) if (self.last_frame_time - start_time) > 0 else 0
-        self.fps_label.setText(f"FPS: {fps:.2f}")
+        if self.metrics:
+            self.metrics.observe_frame(capture_time - start_time, inference_time - capture_time,
+                                       self.last_frame_time - start_time, active_roi,
+                                       self.model_handler.last_detection_count)
+        if self.video_handler.is_file_source():
+            # 视频文件：显示有效帧率/标称帧率及丢帧数
+            stats = self.video_handler.get_playback_stats()
+            self.fps_label.setText(f"FPS: {stats['effective_fps']:.2f} / {stats['nominal_fps']:.2f}")
+            self.fps_label.setToolTip(f"处理帧率: {fps:.2f}\n已丢帧: {stats['dropped_frames']}")
+        elif self.video_handler.is_virtual_camera():
+            # 虚拟摄像头：显示处理帧率，提示中给出丢帧、读取失败和断开次数
+            stats = self.video_handler.cap.get_stats()
+            self.fps_label.setText(f"FPS: {fps:.2f}")
+            self.fps_label.setToolTip(f"虚拟摄像头 {stats['nominal_fps']:.0f} fps\n已丢帧: {stats['dropped']}\n"
+                                      f"读取失败: {stats['read_failures']}\n断开: {stats['disconnects']}")
+        else:
+            self.fps_label.setText(f"FPS: {fps:.2f}")
 
     def update_pulse_effect(self):
         """更新脉冲效果"""
@@ -947,6 +1203,7 @@ class MainWindow(QMainWindow):
         if self.recording_mode:
             if self.video_handler.is_recording():
                 self.stop_recording()
+            self._stop_smart_capture()
             # 设置停止标志并停止定时器
             self.should_stop_detection = True
             if self.timer.isActive():
@@ -1014,6 +1271,33 @@ class MainWindow(QMainWindow):
         self.record_timer.stop()
         self.statusBar().showMessage(message, 5000)
 
+    def toggle_smart_capture(self):
+        """切换智能采集：只保存与最近保留帧不同的画面，已加载模型时同时预写YOLO标注"""
+        if self.smart_capture is not None:
+            self._stop_smart_capture()
+            return
+        capture = SmartCapture(os.path.join(os.getcwd(), DEFAULT_SETTINGS["training_data_dir"]))
+        names = None
+        if self.model_handler.is_model_loaded():
+            model_names = self.model_handler.model.names
+            names = [model_names[i] for i in sorted(model_names)]
+        success, message = capture.start(names)
+        if success:
+            self.smart_capture = capture
+            self.smart_capture_btn.setText("停止智能采集")
+            self.smart_capture_btn.setStyleSheet(STYLES["RECORD_BUTTON"])
+        self.statusBar().showMessage(message, 3000)
+
+    def _stop_smart_capture(self):
+        """停止智能采集（等待剩余图像写完）"""
+        if self.smart_capture is None:
+            return
+        _, message = self.smart_capture.stop()
+        self.smart_capture = None
+        self.smart_capture_btn.setText("智能采集")
+        self.smart_capture_btn.setStyleSheet(STYLES["LARGE_BUTTON"])
+        self.statusBar().showMessage(message, 5000)
+
     def update_record_button(self):
         """更新录制按钮样式"""
         if self.record_btn.styleSheet() == STYLES["RECORD_BUTTON"]:
@@ -1034,6 +1318,8 @@ class MainWindow(QMainWindow):
             self.pulse_timer.stop()
         if self.record_timer.isActive():
             self.record_timer.stop()
+        if self.swap_timer.isActive():
+            self.swap_timer.stop()
         
         # 退出录制模式
         if self.recording_mode:
@@ -1044,12 +1330,24 @@ class MainWindow(QMainWindow):
             self.exit_roi_mode()
 
         # 释放资源
+        self._stop_session_recording()
         self.video_handler.release()
+        self.roi_handler.shutdown()
+        self.alert_manager.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
         
         event.accept()
 
+    def _set_alert_flash(self, active):
+        """报警触发时开始闪烁，解除时停止"""
+        if active:
+            self.roi_alert_flash = True
+            self.roi_alert_timer.start()
+        else:
+            self.roi_alert_timer.stop()
+            self.roi_alert_flash = False
+
     def _toggle_roi_alert_flash(self):
-        self.roi_alert_flash = not self.roi_alert_flash
-        # 只有在没有停止标志时才强制刷新帧
-        if not self.should_stop_detection:
-            self.update_frame() 
\ No newline at end of file
+        """切换闪烁颜色，下一帧绘制时生效，不再强制刷新帧"""
+        self.roi_alert_flash = not self.roi_alert_flash 
\ No newline at end of file